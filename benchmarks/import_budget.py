@@ -0,0 +1,90 @@
+"""
+Presupuesto de tiempo de import para los entry points (`wasi`, workers).
+
+Mide con `python -X importtime` el tiempo acumulado de importar cada módulo
+(mejor de N corridas, en procesos nuevos) y verifica que no arrastre
+dependencias pesadas que deberían cargarse recién al usarse.
+
+Uso:
+    python benchmarks/import_budget.py                 # budgets por defecto
+    python benchmarks/import_budget.py --budget-ms 80 --repeat 5
+
+Sale con código 1 si algún módulo excede su budget o importa algo prohibido.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# módulo -> budget en ms (tiempo acumulado de su import, incluye dependencias)
+BUDGETS_MS: Dict[str, float] = {
+    "wasi_analyst.app.cli": 100.0,
+    "wasi_analyst.app.run": 60.0,
+    "wasi_analyst.util.settings": 50.0,
+    "wasi_analyst.providers.llm": 50.0,
+}
+
+# nunca deberían cargarse solo por importar los entry points
+HEAVY = ("pandas", "pyarrow", "duckdb", "openai", "yfinance", "streamlit", "dotenv")
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = _SRC + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    return env
+
+
+def import_time_ms(module: str) -> float:
+    """Tiempo acumulado (ms) del import de `module` según -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    for line in reversed(proc.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"no encontré {module} en la salida de -X importtime")
+
+
+def heavy_modules_loaded(module: str) -> List[str]:
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_env(), check=True)
+    loaded = set(json.loads(proc.stdout))
+    return [h for h in HEAVY if h in loaded]
+
+
+def check(budgets: Dict[str, float], repeat: int) -> Tuple[bool, List[str]]:
+    ok, lines = True, []
+    for module, budget in budgets.items():
+        ms = min(import_time_ms(module) for _ in range(repeat))
+        heavy = heavy_modules_loaded(module)
+        status = "OK"
+        if ms > budget:
+            status, ok = "LENTO", False
+        if heavy:
+            status, ok = f"IMPORTA {','.join(heavy)}", False
+        lines.append(f"{module:<32} {ms:8.1f} ms  (budget {budget:.0f} ms)  {status}")
+    return ok, lines
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Budget de tiempo de import")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--budget-ms", type=float, default=None, help="budget único para todos los módulos")
+    args = ap.parse_args(argv)
+
+    budgets = {m: (args.budget_ms if args.budget_ms is not None else b) for m, b in BUDGETS_MS.items()}
+    ok, lines = check(budgets, args.repeat)
+    print("\n".join(lines))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
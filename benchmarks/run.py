@@ -0,0 +1,327 @@
+"""
+Suite de benchmarks de Wasi Analyst (offline: RandomWalkProvider + backend LLM mock).
+
+Uso:
+    python benchmarks/run.py                          # corre y muestra resultados
+    python benchmarks/run.py --scale medium --save benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json --threshold 0.15
+    python benchmarks/run.py --only orderbook,features
+    python benchmarks/run.py --only coordinator.run.llm --scale large --llm-latency-ms 5
+
+Con --compare el proceso termina con código 1 si algún benchmark es más lento
+que el baseline por encima del umbral. Se compara el mejor tiempo de las
+repeticiones (min), que es mucho menos ruidoso que la mediana.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Permite correr desde el repo sin instalar el paquete
+_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if _SRC not in sys.path:
+    sys.path.insert(0, _SRC)
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small":  {"symbols": 5,   "days": 60,   "orders": 50,   "curve": 2_000},
+    "medium": {"symbols": 50,  "days": 250,  "orders": 500,  "curve": 20_000},
+    "large":  {"symbols": 300, "days": 1000, "orders": 2000, "curve": 200_000},
+}
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def bench(name: str):
+    def deco(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return deco
+
+
+def _symbols(n: int) -> List[str]:
+    return [f"S{i:04d}" for i in range(n)]
+
+
+def _cfg(p: Dict[str, int], **kw):
+    from wasi_analyst.util.config import WasiConfig
+    return WasiConfig(symbols=_symbols(p["symbols"]), days=p["days"], seed=7, **kw)
+
+
+# ---------- LLM mock (sin red) ----------
+
+def use_mock_backend() -> None:
+    """
+    Apunta los agentes al backend LLM local y determinista (providers/backends.MockBackend):
+    mide el costo del pipeline LLM sin red. La demora simulada del modelo sale de
+    WASI_LLM_MOCK_LATENCY_MS (ver --llm-latency-ms).
+    """
+    os.environ["WASI_LLM_BACKEND"] = "mock"
+    os.environ.setdefault("WASI_LLM_MOCK_LATENCY_MS", "0")
+
+
+# ---------- benchmarks ----------
+# Cada benchmark recibe la escala y devuelve una función sin argumentos a cronometrar.
+
+@bench("orderbook.insert_match")
+def _orderbook(p):
+    from wasi_analyst.core.orderbook import Book, Order
+    rng = random.Random(1)
+    days = []
+    for _ in range(max(1, p["days"] // 10)):
+        days.append([
+            Order(side=rng.choice(("buy", "sell")), symbol="X", qty=rng.randint(1, 50),
+                  price=round(100 + rng.gauss(0, 1), 2), agent_id=f"a{rng.randint(0, 99)}")
+            for _ in range(p["orders"])
+        ])
+
+    def run():
+        book = Book(symbol="X")
+        for orders in days:
+            for o in orders:
+                book.add(Order(o.side, o.symbol, o.qty, o.price, o.agent_id))
+            book.match()
+    return run
+
+
+@bench("features.matrix")
+def _features(p):
+    import numpy as np
+    from wasi_analyst.agents.coordinator import Coordinator
+    from wasi_analyst.core.history import PriceRing, ring_capacity
+    cfg = _cfg(p)
+    coord = Coordinator(cfg=cfg, market=None, store=None)
+    rng = np.random.default_rng(1)
+    rows = 100 * np.cumprod(1 + rng.normal(0, 0.02, (p["days"], p["symbols"])), axis=0)
+
+    def run():
+        ring = PriceRing(p["symbols"], ring_capacity(cfg))
+        for row in rows:
+            ring.push(row)
+            coord._obs_from_ring(ring, cfg.symbols)
+    return run
+
+
+@bench("risk.enforce")
+def _risk(p):
+    from wasi_analyst.agents.base import AgentState
+    from wasi_analyst.agents.risk_manager import RiskManager
+    cfg = _cfg(p)
+    rng = random.Random(3)
+    state = AgentState(cash=cfg.cash0, positions={s: rng.randint(0, 50) for s in cfg.symbols})
+    rm = RiskManager("risk", cfg, state)
+    obs = {"symbols": {s: {"price": 100 + rng.random()} for s in cfg.symbols}}
+    acts = [{"action": rng.choice(("buy", "sell", "hold")), "symbol": s, "qty": 10, "price": None}
+            for s in cfg.symbols]
+
+    def run():
+        for _ in range(max(1, p["days"] // 10)):
+            rm.enforce(acts, obs)
+    return run
+
+
+@bench("risk.var_engine")
+def _var_engine(p):
+    # costo por día del motor VaR/ES (covarianza propia + ventana ordenada) sobre la corrida
+    import numpy as np
+    from wasi_analyst.core.riskengine import RiskEngine
+    cfg = _cfg(p)
+    rng = np.random.default_rng(4)
+    rows = 100 * np.cumprod(1 + rng.normal(0, 0.02, (p["days"], p["symbols"])), axis=0)
+    pos = rng.integers(0, 50, p["symbols"]).astype(float)
+
+    def run():
+        eng = RiskEngine.from_config(cfg, cfg.symbols)
+        for row in rows:
+            eng.update_prices(row)
+            eng.record(cfg.cash0 + float(pos @ row), pos * row)
+    return run
+
+
+@bench("risk.enforce_var")
+def _risk_var(p):
+    import numpy as np
+    from wasi_analyst.agents.base import AgentState
+    from wasi_analyst.agents.risk_manager import RiskManager
+    from wasi_analyst.core.riskengine import RiskEngine
+    cfg = _cfg(p, var_budget=0.01)
+    rng = random.Random(3)
+    state = AgentState(cash=cfg.cash0, positions={s: rng.randint(0, 50) for s in cfg.symbols})
+    rm = RiskManager("risk", cfg, state)
+    eng = RiskEngine.from_config(cfg, cfg.symbols)
+    nrng = np.random.default_rng(5)
+    for row in 100 * np.cumprod(1 + nrng.normal(0, 0.02, (60, p["symbols"])), axis=0):
+        eng.update_prices(row)
+    obs = {"symbols": {s: {"price": 100 + rng.random()} for s in cfg.symbols}, "risk": eng}
+    acts = [{"action": rng.choice(("buy", "sell", "hold")), "symbol": s, "qty": 10, "price": None}
+            for s in cfg.symbols]
+
+    def run():
+        for _ in range(max(1, p["days"] // 10)):
+            rm.enforce(acts, obs)
+    return run
+
+
+def _coordinator_run(p, **kw):
+    from wasi_analyst.agents.coordinator import Coordinator
+    from wasi_analyst.core.market import Market
+    from wasi_analyst.data.providers import RandomWalkProvider
+    from wasi_analyst.util.store import DuckDBStore
+    cfg = _cfg(p, **kw)
+
+    def run():
+        market = Market(cfg, price_provider=RandomWalkProvider(seed=cfg.seed))
+        Coordinator(cfg=cfg, market=market, store=DuckDBStore(":memory:")).run(return_dataframes=True)
+    return run
+
+
+@bench("coordinator.run.rule")
+def _coord_rule(p):
+    return _coordinator_run(p)
+
+
+@bench("coordinator.run.llm_mock")
+def _coord_llm(p):
+    use_mock_backend()
+    q = {**p, "days": max(5, p["days"] // 5)}
+    return _coordinator_run(q, fundamental_mode="llm", macro_mode="llm", sentiment_mode="llm")
+
+
+@bench("metrics.equity")
+def _metrics(p):
+    import numpy as np
+    import pandas as pd
+    from wasi_analyst.util.metrics import equity_metrics, price_metrics_table
+    rng = np.random.default_rng(2)
+    n = p["curve"]
+    eq = pd.Series(100_000 * np.cumprod(1 + rng.normal(0.0002, 0.01, n)))
+    hist = pd.DataFrame({f"px_S{j}": 100 * np.cumprod(1 + rng.normal(0, 0.02, n)) for j in range(10)})
+
+    def run():
+        equity_metrics(eq)
+        price_metrics_table(hist)
+    return run
+
+
+@bench("providers.step")
+def _providers(p):
+    from wasi_analyst.core.market import Market
+    from wasi_analyst.data.providers import RandomWalkProvider
+    cfg = _cfg(p)
+
+    def run():
+        market = Market(cfg, price_provider=RandomWalkProvider(seed=1))
+        for _ in range(p["days"]):
+            market.step_prices()
+    return run
+
+
+@bench("market.abm")
+def _market_abm(p):
+    from wasi_analyst.core.market import Market
+    from wasi_analyst.data.providers import RandomWalkProvider
+    # población x20 las órdenes de la escala: 1k / 10k / 40k agentes
+    cfg = _cfg(p, market_mode="abm", abm_agents=20 * p["orders"])
+
+    def run():
+        market = Market(cfg, price_provider=RandomWalkProvider(seed=1))
+        for _ in range(p["days"]):
+            market.step_prices()
+            market.match_all()
+    return run
+
+
+# ---------- runner ----------
+
+def time_it(fn: Callable[[], None], repeat: int) -> Tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), min(samples)
+
+
+def run_suite(scale: str, repeat: int, only: List[str] | None = None) -> Dict:
+    p = SCALES[scale]
+    results: Dict[str, Dict] = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # Coordinator.run escribe ./artifacts
+        try:
+            for name, factory in BENCHMARKS.items():
+                if only and not any(name.startswith(o) for o in only):
+                    continue
+                fn = factory(p)
+                fn()  # warm-up (imports, caches)
+                med, best = time_it(fn, repeat)
+                results[name] = {"median_s": med, "min_s": best}
+                print(f"{name:<28} median={med * 1e3:10.2f} ms   min={best * 1e3:10.2f} ms", flush=True)
+        finally:
+            os.chdir(cwd)
+    return {
+        "scale": scale, "params": p, "repeat": repeat,
+        "python": platform.python_version(), "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Devuelve los benchmarks que empeoraron más de `threshold` (fracción)."""
+    if current.get("scale") != baseline.get("scale"):
+        print(f"[WARN] escala distinta: actual={current.get('scale')} baseline={baseline.get('scale')}")
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline':>12} {'actual':>12} {'delta':>9}")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<28} {'-':>12} {cur['min_s'] * 1e3:>10.2f}ms {'nuevo':>9}")
+            continue
+        delta = cur["min_s"] / base["min_s"] - 1.0 if base["min_s"] > 0 else 0.0
+        flag = "  <-- REGRESIÓN" if delta > threshold else ""
+        print(f"{name:<28} {base['min_s'] * 1e3:>10.2f}ms {cur['min_s'] * 1e3:>10.2f}ms {delta:>+8.1%}{flag}")
+        if delta > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmarks de Wasi Analyst")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="small")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", default="", help="prefijos separados por coma (p.ej. orderbook,features)")
+    ap.add_argument("--save", default="", help="guardar resultados como baseline JSON")
+    ap.add_argument("--compare", default="", help="baseline JSON contra el cual comparar")
+    ap.add_argument("--threshold", type=float, default=0.15, help="regresión tolerada (0.15 = +15%%)")
+    ap.add_argument("--llm-latency-ms", type=float, default=None, help="latencia simulada del backend LLM mock")
+    args = ap.parse_args(argv)
+
+    if args.llm_latency_ms is not None:
+        os.environ["WASI_LLM_MOCK_LATENCY_MS"] = str(args.llm_latency_ms)
+    only = [o.strip() for o in args.only.split(",") if o.strip()] or None
+    res = run_suite(args.scale, args.repeat, only)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(res, fh, indent=2)
+        print(f"\nBaseline guardado en {args.save}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(res, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresión(es) > {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nSin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
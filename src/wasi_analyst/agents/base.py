@@ -1,6 +1,10 @@
-from dataclasses import dataclass
-from typing import Dict, Literal
+from dataclasses import dataclass, field
+from typing import Dict, Literal, Optional
 from wasi_analyst.util.config import WasiConfig
+from wasi_analyst.util.profiling import get_profiler
+from .gating import LLMGate
+from .llm_mixins import llm_actions
+from .prompting import PromptEncoder
 
 AgentMode = Literal["rule", "llm"]
 
@@ -15,6 +19,26 @@ class BaseAgent:
     cfg: WasiConfig
     state: AgentState
     mode: AgentMode = "rule"  # "llm" para usar LLM
+    encoder: Optional[PromptEncoder] = field(default=None, repr=False)
+    gate: Optional[LLMGate] = field(default=None, repr=False)
+
+    def prompt_encoder(self, role: str) -> PromptEncoder:
+        # con estado entre días: recuerda lo último enviado al LLM
+        if self.encoder is None:
+            self.encoder = PromptEncoder.from_config(self.cfg, role)
+        return self.encoder
+
+    def llm_decide(self, role: str, obs: Dict, user_goal: str = "") -> Dict:
+        """llm_actions detrás del gate: si el mercado casi no se movió, se repite la última decisión."""
+        if self.gate is None:
+            self.gate = LLMGate.from_config(self.cfg)
+        call, info = self.gate.check(obs)
+        if not call:
+            get_profiler().count("llm_cache_hits")
+            return {**self.gate.reuse(), "gate": info}
+        out = llm_actions(role, obs, user_goal, encoder=self.prompt_encoder(role))
+        self.gate.remember(obs, out)
+        return {**out, "gate": info}
 
     def decide(self, obs: Dict) -> Dict:
         raise NotImplementedError
@@ -1,12 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Callable
 import os
-import statistics as stats
-import pandas as pd
-
-from wasi_analyst.core.market import Market
-from wasi_analyst.core.orderbook import Trade
+import numpy as np
+
+from wasi_analyst.core.market import Market, FillBatch
+from wasi_analyst.core.ledger import Ledger
+from wasi_analyst.core.history import PriceRing, ring_capacity
+from wasi_analyst.core.crosssection import CrossSection
+from wasi_analyst.core.journal import Journal
+from wasi_analyst.core.riskengine import RiskEngine
+from wasi_analyst.data.features import feature_windows
 from wasi_analyst.agents.base import AgentState
 from wasi_analyst.agents.fundamental_agent import FundamentalAgent
 from wasi_analyst.agents.macro_agent import MacroAgent
@@ -15,6 +19,15 @@ from wasi_analyst.agents.risk_manager import RiskManager
 from wasi_analyst.agents.execution_agent import ExecutionAgent
 from wasi_analyst.util.config import WasiConfig
 from wasi_analyst.util.store import DuckDBStore
+from wasi_analyst.util import profiling
+from wasi_analyst.util.logging import NULL_EVENTS, EventLog, get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+AGENTS = ("fundamental", "macro", "sentiment")
+TRADE_COLUMNS = ("day", "symbol", "price", "qty", "buy_agent", "sell_agent")
 
 
 @dataclass
@@ -22,6 +35,15 @@ class Coordinator:
     cfg: WasiConfig
     market: Market
     store: DuckDBStore
+    # (FeatureCube, columnas) si el provider ofrece features precalculadas (ver run())
+    _cube: Optional[tuple] = field(default=None, init=False, repr=False)
+    # covarianza EWMA + ranks/z-scores del universo (None si cs_halflife <= 0)
+    _xs: Optional[CrossSection] = field(default=None, init=False, repr=False)
+    # VaR/ES histórico y paramétrico incremental (None si var_window <= 0)
+    _var: Optional[RiskEngine] = field(default=None, init=False, repr=False)
+    # precios de cierre de la corrida en curso (días x símbolos; NaN en los días que faltan)
+    _px_hist: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _px_days: int = field(default=0, init=False, repr=False)
 
     # ---------- helpers ----------
 
@@ -30,28 +52,86 @@ class Coordinator:
         Calcula features con ventanas definidas en config.
         Retorna: dict con price, sma, mom, vol, hi, lo.
         """
-        w_sma = max(1, self.cfg.fundamental_sma_window)
-        w_mom = max(1, self.cfg.macro_mom_window)
-        w_vol = max(2, self.cfg.sentiment_break_window)  # proxy
-        w_brk = max(2, self.cfg.sentiment_break_window)
-
-        p = float(prices[-1])
-        sma = float(sum(prices[-w_sma:]) / min(len(prices), w_sma))
-        mom = float(p / prices[-w_mom] - 1.0) if len(prices) > w_mom else 0.0
-
-        rets: List[float] = []
-        if len(prices) > 1:
-            win = min(len(prices) - 1, w_vol)
-            for a, b in zip(prices[-win-1:-1], prices[-win:]):
-                if a > 0:
-                    rets.append(b / a - 1.0)
-        vol = float(stats.pstdev(rets)) if len(rets) >= 2 else 0.0
-
-        hi = float(max(prices[-w_brk:])) if prices else p
-        lo = float(min(prices[-w_brk:])) if prices else p
+        feats = self._features_matrix(np.asarray(prices, dtype=float)[:, None])
+        return {k: float(v[0]) for k, v in feats.items()}
+
+    def _features_matrix(self, P: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Versión vectorizada para todo el universo: P es (días x símbolos) en orden
+        cronológico (p.ej. PriceRing.window()). Retorna un array por feature.
+        """
+        w = feature_windows(self.cfg)
+        w_sma, w_mom, w_vol, w_brk = w["sma"], w["mom"], w["vol"], w["hi"]
+        n = len(P)
+
+        p = P[-1]
+        sma = P[-w_sma:].mean(axis=0)
+        mom = p / P[-w_mom] - 1.0 if n > w_mom else np.zeros_like(p)
+
+        win = min(n - 1, w_vol)
+        if win >= 2:
+            a, b = P[-win - 1:-1], P[-win:]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rets = np.where(a > 0, b / a - 1.0, np.nan)
+            vol = np.nanstd(rets, axis=0) if np.isnan(rets).any() else rets.std(axis=0)
+            vol = np.where((~np.isnan(rets)).sum(axis=0) >= 2, vol, 0.0)
+        else:
+            vol = np.zeros_like(p)
+
+        hi = P[-w_brk:].max(axis=0)
+        lo = P[-w_brk:].min(axis=0)
 
         return {"price": p, "sma": sma, "mom": mom, "vol": vol, "hi": hi, "lo": lo}
 
+    def _feature_cube(self) -> Optional[tuple]:
+        """Cubo de features del provider (data/features.py) si cubre toda la corrida."""
+        src = getattr(self.market.price_provider, "feature_cube", None) if self.market is not None else None
+        # en modo abm el provider es el valor fundamental (oculto): las features salen de la subasta
+        if not self.cfg.feature_cube or src is None or self.market.population is not None:
+            return None
+        hit = src(self.market.table.symbols, feature_windows(self.cfg))
+        return hit if hit is not None and hit[0].days >= self.cfg.days else None
+
+    def _obs_from_ring(self, ring: PriceRing, symbols: List[str], day: Optional[int] = None) -> Dict:
+        if self._cube is not None and day is not None:
+            cube, cols = self._cube
+            feats = cube.features(day, feature_windows(self.cfg), cols)
+        else:
+            feats = self._features_matrix(ring.window())
+        abm = self.market is not None and self.market.population is not None
+        if abm and not np.array_equal(feats["price"], self.market.table.price):
+            raise RuntimeError("modo abm: el precio observado no coincide con el de la subasta")
+        # providers con OHLCV (p.ej. ColumnarReplay) suman open/high/low/volume de la barra
+        # (no en modo abm: la barra sería del valor fundamental, no del mercado)
+        bar = getattr(self.market.price_provider, "current_bar", None) if self.market is not None and not abm else None
+        if bar is not None:
+            ohlcv = bar(symbols)
+            feats.update({f"bar_{k}": v for k, v in ohlcv.items() if k != "close"})
+        if self._xs is not None:
+            feats.update(self._xs.features(feats))
+        cols = {k: v.tolist() for k, v in feats.items()}
+        keys = list(cols)
+        obs = {"symbols": {
+            sym: dict(zip(keys, vals)) for sym, vals in zip(symbols, zip(*cols.values()))
+        }}
+        if self._xs is not None:
+            obs["cross"] = self._xs  # correlaciones a pedido (RiskManager)
+        if self._var is not None:
+            obs["risk"] = self._var  # presupuesto de VaR (RiskManager)
+        return obs
+
+    def price_history(self, symbol: str) -> Optional[pd.Series]:
+        """
+        Historial largo de un símbolo en la corrida actual (o la última), hasta el
+        día en curso. La tabla `history` del store acumula todas las corridas.
+        """
+        import pandas as pd
+        j = self.market.table.index.get(symbol)
+        if self._px_hist is None or j is None:
+            return None
+        col = self._px_hist[:self._px_days, j]
+        return pd.Series(col, index=pd.RangeIndex(len(col), name="day"), name=f"px_{symbol}")
+
     def _tag(self, actions: List[Dict], agent_name: str) -> List[Dict]:
         """Agrega la etiqueta del agente a cada acción (para desempates en el merge)."""
         return [{**a, "agent": agent_name} for a in actions]
@@ -61,6 +141,7 @@ class Coordinator:
         Fusión por mayoría simple. Si hay empate:
         - privilegia la dirección del agente 'fundamental' si no es HOLD,
         - si sigue empatado, toma el primer no-HOLD.
+        Cada acción fusionada lleva en 'agents' quiénes la votaron (atribución de PnL).
         """
         symbols = list(obs["symbols"].keys())
         merged: List[Dict] = []
@@ -70,32 +151,30 @@ class Coordinator:
             score = sum(1 if a["action"] == "buy" else -1 if a["action"] == "sell" else 0 for a in votes)
 
             if score > 0:
-                merged.append({"action": "buy", "symbol": s, "qty": 10, "price": None, "reason": "merged-majority"})
+                merged.append({"action": "buy", "symbol": s, "qty": 10, "price": None, "reason": "merged-majority",
+                               "agents": [a.get("agent") for a in votes if a["action"] == "buy"]})
             elif score < 0:
-                merged.append({"action": "sell", "symbol": s, "qty": 10, "price": None, "reason": "merged-majority"})
+                merged.append({"action": "sell", "symbol": s, "qty": 10, "price": None, "reason": "merged-majority",
+                               "agents": [a.get("agent") for a in votes if a["action"] == "sell"]})
             else:
                 f = next((a for a in votes if a.get("agent") == "fundamental" and a["action"] != "hold"), None)
                 if f:
-                    merged.append({"action": f["action"], "symbol": s, "qty": 10, "price": None, "reason": "merged-tie-fundamental"})
+                    merged.append({"action": f["action"], "symbol": s, "qty": 10, "price": None, "reason": "merged-tie-fundamental",
+                                   "agents": ["fundamental"]})
                 else:
                     nh = next((a for a in votes if a["action"] != "hold"), None)
                     if nh:
-                        merged.append({"action": nh["action"], "symbol": s, "qty": 10, "price": None, "reason": "merged-tie-any"})
+                        merged.append({"action": nh["action"], "symbol": s, "qty": 10, "price": None, "reason": "merged-tie-any",
+                                       "agents": [nh.get("agent")]})
                     else:
-                        merged.append({"action": "hold", "symbol": s, "qty": 0, "price": None, "reason": "merged-all-hold"})
+                        merged.append({"action": "hold", "symbol": s, "qty": 0, "price": None, "reason": "merged-all-hold",
+                                       "agents": []})
         return merged
 
-    def _apply_trades(self, trades: List[Trade]):
-        st = self.cfg
-        for t in trades:
-            notional = t.price * t.qty
-            fee = notional * st.fee_bps / 10_000.0
-            if t.buy_agent == "exec":
-                self._state.cash -= (notional + fee)
-                self._state.positions[t.symbol] += t.qty
-            if t.sell_agent == "exec":
-                self._state.cash += (notional - fee)
-                self._state.positions[t.symbol] -= t.qty
+    def _apply_trades(self, fills: FillBatch):
+        """Aplica en bloque los fills del día del agente de ejecución al ledger."""
+        self._ledger.apply_fills(fills, "exec")
+        self._state.cash = self._ledger.cash
 
     # ---------- main loop ----------
 
@@ -108,11 +187,50 @@ class Coordinator:
 
         os.makedirs("artifacts", exist_ok=True)
 
-        state = AgentState(cash=self.cfg.cash0, positions={s: 0 for s in self.cfg.symbols})
+        prof = profiling.Profiler() if self.cfg.profile else profiling.NULL_PROFILER
+        prev_prof = profiling.activate(prof)
+        ev, jr = NULL_EVENTS, None
+        try:
+            if self.cfg.event_log_path:
+                ev = EventLog(
+                    self.cfg.event_log_path, fmt=self.cfg.event_log_format, level=self.cfg.event_log_level,
+                    sample=self.cfg.event_log_sample, rate=self.cfg.event_log_rate,
+                )
+            if self.cfg.journal_path:
+                jr = Journal(self.cfg.journal_path, self.market.table.symbols, AGENTS,
+                             exec_agent="exec", config=self.cfg.model_dump(mode="json"))
+            return self._run(prof, ev, jr, return_dataframes, user_goal, loop_report)
+        finally:
+            # también si el loop se corta con una excepción (p.ej. JobCancelled desde loop_report)
+            profiling.activate(prev_prof)
+            ev.close()
+            if jr is not None:
+                jr.close()
+
+    def _run(self, prof, ev, jr: Optional[Journal], return_dataframes: bool, user_goal: str,
+             loop_report: Callable[[int, str], None] | None):
+        """Loop de días y persistencia; la limpieza (profiler, event log, journal) la hace run()."""
+        import pandas as pd
+
+        def phase(day: int, name: str):
+            if loop_report: loop_report(day, name)
+            prof.lap(name)
+
+        table = self.market.table
+        table.position[:] = 0
+        state = AgentState(cash=self.cfg.cash0, positions=table.positions_view())
         self._state = state
-
-        # historial local por símbolo (si tu Market no expone history())
-        price_hist: Dict[str, List[float]] = {s: [] for s in self.cfg.symbols}
+        ledger = self._ledger = Ledger(self.cfg, table, AGENTS)
+
+        # historial acotado a las ventanas de features; el largo de la corrida, para price_history()
+        ring = PriceRing(len(table), ring_capacity(self.cfg))
+        self._px_hist = np.full((self.cfg.days, len(table)), np.nan)
+        self._px_days = 0
+        # replay fijo: las features salen del cubo precalculado en vez de recalcularse
+        self._cube = self._feature_cube()
+        self._xs = CrossSection(table.symbols, self.cfg.cs_halflife) if self.cfg.cs_halflife > 0 else None
+        self._var = RiskEngine.from_config(self.cfg, table.symbols, self._xs.cov if self._xs else None) \
+            if self.cfg.var_window > 0 else None
 
         f = FundamentalAgent("fundamental", self.cfg, state, mode=self.cfg.fundamental_mode)
         m = MacroAgent("macro", self.cfg, state, mode=self.cfg.macro_mode)
@@ -120,30 +238,43 @@ class Coordinator:
         r = RiskManager("risk", self.cfg, state)
         x = ExecutionAgent("exec", self.cfg, state)
 
+        px_cols = [f"px_{k}" for k in table.symbols]
+        pos_cols = [f"pos_{k}" for k in table.symbols]
+        pnl_cols = [f"pnl_{a}" for a in AGENTS]
+        sym_arr = np.array(table.symbols, dtype=object)
         history_rows: List[Dict] = []
-        trades_rows: List[Dict] = []
+        trades_cols: Dict[str, List[np.ndarray]] = {k: [] for k in TRADE_COLUMNS}
         notes: List[str] = [f"User goal: {user_goal}" if user_goal else "No user goal provided."]
+        if self._cube is not None:
+            notes.append(f"Features: cubo precalculado {self._cube[0].name} (ventanas {self._cube[0].windows})")
         transcript: List[dict] = []
+        # modo abm: precios de la subasta entre la población y el exec (core/population.py)
+        pop = self.market.population
 
         for d in range(self.cfg.days):
-            if loop_report: loop_report(d, "tick-precios")
+            phase(d, "tick-precios")
             self.market.step_prices()
-            snapshot = self.market.snapshot_prices()
-            for sym, px in snapshot.items():
-                price_hist[sym].append(float(px))
+            snap = self.market.prices()
+            ring.push(snap)
+            self._px_hist[d] = snap
+            self._px_days = d + 1
+            if jr is not None:
+                jr.prices(d, snap)
+            if self._xs is not None:
+                self._xs.update(snap)
+            if self._var is not None:
+                self._var.update_prices(snap)
 
             # Observación con features
-            obs = {
-                "symbols": {
-                    sym: self._features_from_history(price_hist[sym])
-                    for sym in self.cfg.symbols
-                }
-            }
-
-            if loop_report: loop_report(d, "agents")
-            f_dec = f.decide(obs, user_goal=user_goal)
-            m_dec = m.decide(obs, user_goal=user_goal)
-            s_dec = s.decide(obs, user_goal=user_goal)
+            obs = self._obs_from_ring(ring, table.symbols, d)
+
+            phase(d, "agents")
+            with prof.span("agent:fundamental"):
+                f_dec = f.decide(obs, user_goal=user_goal)
+            with prof.span("agent:macro"):
+                m_dec = m.decide(obs, user_goal=user_goal)
+            with prof.span("agent:sentiment"):
+                s_dec = s.decide(obs, user_goal=user_goal)
             transcript.append({
                 "day": d, "step": "agents_opinion",
                 "messages": [
@@ -153,7 +284,7 @@ class Coordinator:
                 ],
             })
 
-            if loop_report: loop_report(d, "merge")
+            phase(d, "merge")
             merged = self._merge_actions(
                 self._tag(f_dec.get("actions", []), "fundamental")
                 + self._tag(m_dec.get("actions", []), "macro")
@@ -161,51 +292,117 @@ class Coordinator:
                 obs
             )
             transcript.append({"day": d, "step": "merge", "actions": merged})
+            ledger.set_credit(merged)
+            if jr is not None:
+                jr.credit(d, ledger.credit)
 
-            if loop_report: loop_report(d, "risk")
+            phase(d, "risk")
             gated = r.enforce(merged, obs)
             transcript.append({"day": d, "step": "risk_manager", "actions": gated})
-
-            if loop_report: loop_report(d, "exec")
+            if jr is not None:
+                jr.risk(d, merged, gated)
+            if ev is not NULL_EVENTS:
+                # sampling/rate limit por evento (uno por símbolo), no por día
+                for a, g in zip(merged, gated):
+                    if not ev.enabled("decision"):
+                        continue
+                    ev.emit("decision", day=d, symbol=a["symbol"], action=a["action"], agents=a.get("agents"),
+                            qty=g.get("qty", 0), final=g.get("action"), risk_note=g.get("risk_note"))
+
+            phase(d, "exec")
             orders = x.to_orders(gated)
             transcript.append({
                 "day": d, "step": "execution_agent",
                 "orders": [o.__dict__ for o in orders]
             })
 
-            for o in orders:
-                if o.qty > 0:
-                    self.market.place(o)
-            trades = self.market.match_all()
-            self._apply_trades(trades)
-            for t in trades:
-                trades_rows.append({
-                    "day": d, "symbol": t.symbol, "price": t.price, "qty": t.qty,
-                    "buy_agent": t.buy_agent, "sell_agent": t.sell_agent
-                })
-
-            equity = state.cash + sum(q * snapshot[sym] for sym, q in state.positions.items())
+            self.market.place_many(orders)
+            self.market.match_all()
+            fills = self.market.fills
+            if jr is not None:
+                jr.orders(d, orders)
+                jr.fills(d, fills)
+            prof.count("orders", len(orders))
+            prof.count("trades", len(fills))
+            if len(fills) and ev.enabled("fill", 10):
+                ev.emit("fill", day=d, symbol=sym_arr[fills.idx].tolist(), price=fills.price.tolist(),
+                        qty=fills.qty.tolist(), buy=fills.buy_agent.tolist(), sell=fills.sell_agent.tolist())
+            self._apply_trades(fills)
+            if len(fills):
+                trades_cols["day"].append(np.full(len(fills), d))
+                trades_cols["symbol"].append(sym_arr[fills.idx])
+                trades_cols["price"].append(fills.price)
+                trades_cols["qty"].append(fills.qty.astype(np.int64))
+                trades_cols["buy_agent"].append(fills.buy_agent)
+                trades_cols["sell_agent"].append(fills.sell_agent)
+
+            equity = ledger.equity(snap)
+            if jr is not None:
+                jr.end(d, equity)
             history_rows.append({
                 "day": d,
-                **{f"px_{k}": v for k, v in snapshot.items()},
-                "cash": state.cash,
-                **{f"pos_{k}": v for k, v in state.positions.items()},
-                "equity": equity
+                **dict(zip(px_cols, snap.tolist())),
+                "cash": ledger.cash,
+                **dict(zip(pos_cols, table.position.tolist())),
+                "equity": equity,
+                "realized_pnl": float(ledger.realized.sum()),
+                "unrealized_pnl": float(ledger.unrealized(snap).sum()),
+                "fees": float(ledger.fees.sum()),
+                **dict(zip(pnl_cols, ledger.agent_pnl(snap).tolist())),
             })
-
-        if loop_report: loop_report(self.cfg.days - 1, "persist")
+            if self._var is not None:
+                history_rows[-1].update(self._var.record(equity, table.position * snap))
+            if pop is not None:
+                history_rows[-1]["abm_volume"] = float(table.volume.sum())
+                history_rows[-1].update({f"abm_eq_{k}": v for k, v in pop.family_equity(table.price).items()})
+            if ev.enabled("day"):
+                ev.emit("day", day=d, equity=equity, cash=ledger.cash, realized=history_rows[-1]["realized_pnl"])
+            prof.lap(None)
+            prof.sample_memory()
+
+        phase(self.cfg.days - 1, "persist")
+        if jr is not None:  # se cierra en run()
+            notes.append(f"Journal: {jr.records} registros en {jr.path}")
+        if pop is not None and history_rows:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                gap = np.nanmean(np.abs(table.price / self.market.value - 1.0))
+            sizes = ", ".join(f"{k}={len(v)}" for k, v in pop.members.items())
+            notes.append(f"Mercado ABM: {len(pop)} agentes ({sizes}), volumen medio "
+                         f"{np.mean([r['abm_volume'] for r in history_rows]):,.0f}/día, "
+                         f"desvío final precio vs. valor fundamental {gap:.2%}")
+        if self._var is not None and history_rows:
+            last = history_rows[-1]
+            notes.append(f"VaR {1 - self._var.alpha:.0%} 1d al cierre: hist={last['var_hist']:.2%}, "
+                         f"param={last['var_param']:.2%} (ES {last['es_hist']:.2%} / {last['es_param']:.2%})")
 
         hist_df = pd.DataFrame(history_rows)
-        trades_df = pd.DataFrame(trades_rows) if trades_rows else pd.DataFrame(
-            columns=["day", "symbol", "price", "qty", "buy_agent", "sell_agent"]
-        )
+        trades_df = pd.DataFrame({k: np.concatenate(v) for k, v in trades_cols.items()}) if trades_cols["day"] \
+            else pd.DataFrame(columns=list(TRADE_COLUMNS))
+        final_pnl = ledger.agent_pnl(self.market.prices())
+        notes.append("PnL atribuido: " + ", ".join(f"{a}={v:,.2f}" for a, v in zip(AGENTS, final_pnl)))
         hist_df.to_parquet("artifacts/history.parquet")
         trades_df.to_parquet("artifacts/trades.parquet")
         try:
             self.store.write("history", hist_df)
             self.store.write("trades", trades_df)
         except Exception as e:
-            print("DuckDB write failed (optional):", e)
+            get_logger().warning("duckdb_write_failed", error=str(e))
+            if ev.enabled("warning", 30):
+                ev.emit("warning", msg="DuckDB write failed (optional)", error=str(e))
+
+        prof.lap(None)
+        if prof.enabled:
+            paths = prof.export("artifacts")
+            top = sorted(prof.timers.items(), key=lambda kv: -kv[1][1])[:3]
+            notes.append("Profiling: " + ", ".join(f"{n}={t[1] / 1e6:.1f}ms" for n, t in top)
+                         + f" (detalle en {paths['json']})")
+        gates = [(a, ag.gate) for a, ag in zip(AGENTS, (f, m, s)) if ag.gate is not None]
+        if gates:
+            notes.append("LLM gating: " + ", ".join(f"{a} {g.stats()}" for a, g in gates))
+            transcript.append({"day": self.cfg.days - 1, "step": "llm_gating",
+                               "stats": {a: {"calls": g.calls, "reused": g.reused} for a, g in gates}})
+        if ev.dropped:
+            notes.append(f"Event log: {ev.dropped} eventos descartados (cola llena)")
 
         if return_dataframes:
             return hist_df, trades_df, notes, transcript
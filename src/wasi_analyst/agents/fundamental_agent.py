@@ -1,12 +1,11 @@
 from typing import Dict
 from .base import BaseAgent
 from wasi_analyst.util.schemas import Action
-from .llm_mixins import llm_actions
 
 class FundamentalAgent(BaseAgent):
     def decide(self, obs: Dict, user_goal: str = "") -> Dict:
         if self.mode == "llm":
-            out = llm_actions("fundamental", obs, user_goal)
+            out = self.llm_decide("fundamental", obs, user_goal)
             return {"role": "fundamental", **out}
 
         cap = self.cfg.fundamental_qty_cap
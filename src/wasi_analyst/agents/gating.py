@@ -0,0 +1,69 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+
+from wasi_analyst.util.config import WasiConfig
+from .prompting import relative_features
+
+# Gating de llamadas al LLM por evento.
+#
+# Guarda los features por símbolo de la última decisión del modelo y solo
+# vuelve a llamarlo cuando algún símbolo se movió más que `drift` (precio
+# relativo o cualquiera de los features relativos) o pasaron `max_staleness`
+# días. Mientras tanto se reutiliza la decisión anterior tal cual.
+
+
+class LLMGate:
+    def __init__(self, drift: float = 0.005, max_staleness: int = 5):
+        self.drift = float(drift)
+        self.max_staleness = int(max_staleness)
+        self._ref: Optional[Dict[str, Tuple[float, ...]]] = None  # features de la última llamada
+        self._last_out: Optional[Dict[str, Any]] = None
+        self._age = 0
+        self.calls = 0
+        self.reused = 0
+
+    @classmethod
+    def from_config(cls, cfg: WasiConfig) -> "LLMGate":
+        return cls(cfg.llm_gate_drift, cfg.llm_gate_max_staleness)
+
+    @staticmethod
+    def _features(obs: Dict[str, Any]) -> Dict[str, Tuple[float, ...]]:
+        return {s: (float(f.get("price") or 0.0), *relative_features(f))
+                for s, f in (obs or {}).get("symbols", {}).items()}
+
+    def _drift(self, cur: Dict[str, Tuple[float, ...]]) -> float:
+        worst = 0.0
+        for s, v in cur.items():
+            ref = self._ref[s]
+            px0 = ref[0]
+            worst = max(worst, abs(v[0] / px0 - 1.0) if px0 else abs(v[0]),
+                        max(abs(a - b) for a, b in zip(v[1:], ref[1:])))
+        return worst
+
+    def check(self, obs: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        """(hay que llamar al LLM?, info del gate para el transcript)."""
+        cur = self._features(obs)
+        self._age += 1
+        if self.drift <= 0 or self._ref is None or self._last_out is None or cur.keys() != self._ref.keys():
+            return True, {"called": True, "reason": "first" if self._ref is None else "always", "age": self._age}
+        drift = self._drift(cur)
+        if drift >= self.drift:
+            return True, {"called": True, "reason": "drift", "drift": drift, "age": self._age}
+        if self.max_staleness > 0 and self._age >= self.max_staleness:
+            return True, {"called": True, "reason": "stale", "drift": drift, "age": self._age}
+        self.reused += 1
+        return False, {"called": False, "reason": "reused", "drift": drift, "age": self._age}
+
+    def remember(self, obs: Dict[str, Any], out: Dict[str, Any]) -> None:
+        self._ref = self._features(obs)
+        self._last_out = out
+        self._age = 0
+        self.calls += 1
+
+    def reuse(self) -> Dict[str, Any]:
+        out = self._last_out or {}
+        return {**out, "actions": [dict(a) for a in out.get("actions", [])], "prompt_tokens": 0}
+
+    def stats(self) -> str:
+        total = self.calls + self.reused
+        return f"{self.calls}/{total} llamadas ({self.reused} reutilizadas)"
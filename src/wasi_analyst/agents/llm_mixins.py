@@ -1,53 +1,19 @@
 from __future__ import annotations
-import os
-import json
 from typing import Dict, List, Any, Optional
 
+from wasi_analyst.providers.backends import extract_json, get_backend
+from wasi_analyst.util.profiling import get_profiler
+from .prompting import PromptEncoder, estimate_tokens, hold_actions
+
 # Tipos de acción esperados por el resto del sistema
 _VALID_ACTIONS = {"buy", "sell", "hold"}
 
-def _fmt_num(x: Optional[float]) -> str:
-    try:
-        return f"{float(x):.4f}"
-    except Exception:
-        return "NA"
-
-def _obs_to_bulleted_text(obs: Dict[str, Any]) -> str:
-    """
-    Convierte el dict de observaciones en texto bullet-friendly para el prompt del LLM.
-    Es tolerante a claves faltantes (ej: 'avg').
-    Espera obs = {"symbols": {SYM: {"price":..,"avg":..,"sma":..,"mom":..,"vol":..,"hi":..,"lo":..}, ...}}
-    """
-    lines: List[str] = []
-    symbols = list((obs or {}).get("symbols", {}).keys())
-    for s in symbols:
-        info: Dict[str, Any] = obs["symbols"].get(s, {})
-        price = info.get("price")
-        # 'avg' puede no existir; usamos 'sma' como aproximación si está, o NA
-        avg = info.get("avg", info.get("sma"))
-        mom = info.get("mom")
-        vol = info.get("vol")
-        hi  = info.get("hi")
-        lo  = info.get("lo")
-        parts = [
-            f"price={_fmt_num(price)}",
-            f"avg={_fmt_num(avg)}",
-            f"sma={_fmt_num(info.get('sma'))}",
-            f"mom={_fmt_num(mom)}",
-            f"vol={_fmt_num(vol)}",
-            f"hi={_fmt_num(hi)}",
-            f"lo={_fmt_num(lo)}",
-        ]
-        lines.append(f"- {s}: " + ", ".join(parts))
-    return "\n".join(lines) if lines else "(sin símbolos)"
-
-def _safe_actions_from_json(txt: str) -> Optional[List[Dict[str, Any]]]:
+def _normalize_actions(data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
     """
-    Intenta parsear una respuesta JSON y normaliza acciones.
-    Retorna None si falla.
+    Normaliza las acciones de una respuesta JSON ya parseada.
+    Retorna None si no tiene la forma esperada.
     """
     try:
-        data = json.loads(txt)
         acts = data.get("actions", [])
         norm: List[Dict[str, Any]] = []
         for a in acts:
@@ -74,6 +40,7 @@ def _heuristic_fallback(role: str, obs: Dict[str, Any], user_goal: str) -> Dict[
     Fallback determinista cuando no hay API key o la respuesta del LLM no es usable.
     Usa señales disponibles: 'mom' (momentum), 'sma/avg' (mean-reversion) y 'hi/lo' (breakout).
     """
+    get_profiler().count("llm_fallbacks")
     actions: List[Dict[str, Any]] = []
     symbols = list((obs or {}).get("symbols", {}).keys())
     for s in symbols:
@@ -120,71 +87,66 @@ def _heuristic_fallback(role: str, obs: Dict[str, Any], user_goal: str) -> Dict[
     )
     return {"reasoning": reasoning, "actions": actions}
 
-def llm_actions(role: str, obs: Dict[str, Any], user_goal: str = "") -> Dict[str, Any]:
+def llm_actions(role: str, obs: Dict[str, Any], user_goal: str = "",
+                encoder: Optional[PromptEncoder] = None) -> Dict[str, Any]:
     """
-    Intenta usar un LLM (OpenAI) para decidir acciones. Si falla, aplica heurística.
-    Retorna: {"reasoning": str, "actions": List[ActionDict]}
+    Intenta usar el backend LLM configurado para decidir acciones. Si falla, aplica heurística.
+    Con `encoder` (con estado) solo se mandan los símbolos que cambiaron; el resto queda en hold.
+    Retorna: {"reasoning": str, "actions": List[ActionDict], "prompt_tokens": int, "prompt_symbols": int}
     """
-    # Construcción de prompt (robusta a claves faltantes como 'avg')
-    bullets = _obs_to_bulleted_text(obs)
+    backend = get_backend()
+
+    if backend is None:
+        # Sin API key (ni backend local) → fallback directo
+        return {**_heuristic_fallback(role, obs, user_goal), "prompt_tokens": 0, "prompt_symbols": 0}
+
+    if encoder is None:
+        encoder = PromptEncoder(role, min_change=0.0)  # sin memoria: todo lo que entre en el budget
     sys_msg = (
         "Sos un analista de inversiones. Tu tarea es proponer acciones por símbolo (buy/sell/hold) con qty y motivo. "
         "Contestá EXCLUSIVAMENTE en JSON con la forma: "
         '{"reasoning": "...", "actions": [{"action":"buy|sell|hold","symbol":"TICKER","qty":int,"price":null,"reason":"texto"}]}'
     )
-    user_msg = (
+    head = (
         f"Rol del agente: {role}\n"
         f"Objetivo del usuario: {user_goal or '(no especificado)'}\n"
-        f"Observaciones por símbolo:\n{bullets}\n\n"
-        "Devolvé JSON válido. No incluyas comentarios ni texto fuera del JSON."
+        "Observaciones (CSV; dev=precio/SMA-1, hi/lo=distancia al máx/mín, en %; "
+        "devz/momz=z-score contra el resto de los símbolos, beta=contra el universo). "
+        "Los símbolos no listados no cambiaron: quedan en hold.\n"
     )
+    tail = "\n\nDevolvé JSON válido. No incluyas comentarios ni texto fuera del JSON."
+    reserved = estimate_tokens(sys_msg) + estimate_tokens(head) + estimate_tokens(tail)
+    table, included, omitted, sent = encoder.encode(obs, reserved_tokens=reserved)
+    user_msg = head + table + tail
+    held = hold_actions(omitted)
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    if not included:
+        # Nada cambió de forma material: no hace falta llamar al modelo
+        return {"reasoning": "Sin cambios materiales desde la última llamada.", "actions": held,
+                "prompt_tokens": 0, "prompt_symbols": 0}
 
-    if not api_key:
-        # Sin API key → fallback directo
-        return _heuristic_fallback(role, obs, user_goal)
-
-    # Intento de llamada al LLM
+    # Llamada al backend (openai con resiliencia, mock o record/replay)
     try:
-        from openai import OpenAI  # type: ignore
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=model,
-            temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.2")),
-            messages=[
-                {"role": "system", "content": sys_msg},
-                {"role": "user",   "content": user_msg},
-            ],
-        )
-        content = (resp.choices[0].message.content or "").strip()
-        # Aceptamos JSON directo; si viniera dentro de ```json ... ``` limpiamos cercos
-        if content.startswith("```"):
-            content = content.strip("`")
-            # a veces viene como "json\n{...}"
-            if content.lower().startswith("json"):
-                content = content[4:].lstrip()
-        acts = _safe_actions_from_json(content)
-        if acts is None:
-            # Reintento simple: buscar el primer bloque {...} en texto
-            import re
-            m = re.search(r"\{.*\}", content, flags=re.DOTALL)
-            if m:
-                acts = _safe_actions_from_json(m.group(0))
-
-        if acts is None:
-            # Fallback si no pudimos parsear acciones
-            return _heuristic_fallback(role, obs, user_goal)
+        get_profiler().count("llm_calls")
+        out = backend.complete(sys_msg, user_msg)
+    except Exception:
+        # Cualquier error en el cliente (o breaker abierto) → fallback inmediato
+        return {**_heuristic_fallback(role, obs, user_goal), "prompt_tokens": 0, "prompt_symbols": 0}
 
-        # Si el JSON traía reasoning, lo preservamos; si no, ponemos uno genérico
-        try:
-            parsed = json.loads(content)
-            reasoning = parsed.get("reasoning") or f"Respuesta del modelo {model}."
-        except Exception:
-            reasoning = f"Respuesta del modelo {model}."
-        return {"reasoning": reasoning, "actions": acts}
+    prompt_tokens = out.prompt_tokens or reserved + estimate_tokens(table)
+    get_profiler().count("llm_prompt_tokens", prompt_tokens)
+    parsed = extract_json(out.content)
+    acts = _normalize_actions(parsed) if parsed is not None else None
+    if acts is None:
+        # Fallback si no pudimos parsear acciones
+        return {**_heuristic_fallback(role, obs, user_goal),
+                "prompt_tokens": prompt_tokens, "prompt_symbols": len(included)}
 
-    except Exception as e:
-        # Cualquier error en el cliente → fallback
-        return _heuristic_fallback(role, obs, user_goal)
+    # recién ahora el modelo "vio" esas filas: si la llamada falla se reenvían la próxima vez
+    encoder.commit(sent)
+    answered = {a["symbol"] for a in acts}
+    held = [h for h in held if h["symbol"] not in answered]
+    # Si el JSON traía reasoning, lo preservamos; si no, ponemos uno genérico
+    reasoning = parsed.get("reasoning") or f"Respuesta del modelo {out.model}."
+    return {"reasoning": reasoning, "actions": acts + held,
+            "prompt_tokens": prompt_tokens, "prompt_symbols": len(included)}
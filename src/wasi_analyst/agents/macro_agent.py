@@ -1,12 +1,11 @@
 from typing import Dict
 from .base import BaseAgent
 from wasi_analyst.util.schemas import Action
-from .llm_mixins import llm_actions
 
 class MacroAgent(BaseAgent):
     def decide(self, obs: Dict, user_goal: str = "") -> Dict:
         if self.mode == "llm":
-            out = llm_actions("macro", obs, user_goal)
+            out = self.llm_decide("macro", obs, user_goal)
             return {"role":"macro", **out}
 
         cap = self.cfg.macro_qty_cap
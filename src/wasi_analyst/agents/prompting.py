@@ -0,0 +1,105 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+
+from wasi_analyst.util.config import WasiConfig
+
+# Encoder de observaciones para prompts LLM con presupuesto de tokens.
+#
+# En vez de siete números por símbolo y por día, manda una tabla CSV compacta
+# con campos relativos (sin el par redundante avg/sma) y solo los símbolos que
+# se movieron de forma material desde la última llamada del agente, ordenados
+# por fuerza de señal según el rol. El resto queda en HOLD por defecto.
+# Si la observación trae features cross-section (core/crosssection.py) se suman
+# z-scores de desvío y momentum y la beta contra el universo.
+
+HEADER = "sym,px,dev%,mom%,vol%,hi%,lo%"
+HEADER_CROSS = ",devz,momz,beta"
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación ~4 caracteres por token (suficiente para presupuestar)."""
+    return (len(text) + 3) // 4
+
+
+def relative_features(f: Dict[str, Any]) -> Tuple[float, ...]:
+    """(dev vs SMA, mom, vol, dist. al máximo, dist. al mínimo) como fracciones."""
+    px = float(f.get("price") or 0.0)
+    sma = float(f.get("sma", f.get("avg", px)) or px)
+    hi = float(f.get("hi", px) or px)
+    lo = float(f.get("lo", px) or px)
+    dev = px / sma - 1.0 if sma else 0.0
+    hi_d = px / hi - 1.0 if hi else 0.0
+    lo_d = px / lo - 1.0 if lo else 0.0
+    return (dev, float(f.get("mom", 0.0) or 0.0), float(f.get("vol", 0.0) or 0.0), hi_d, lo_d)
+
+
+def _strength(role: str, v: Tuple[float, ...]) -> float:
+    dev, mom, vol, hi_d, lo_d = v
+    if role == "fundamental":
+        return abs(dev) / (vol + 1e-3)
+    if role == "macro":
+        return abs(mom)
+    # sentiment: cuanto más cerca del máximo/mínimo, más fuerte
+    return -min(abs(hi_d), abs(lo_d))
+
+
+class PromptEncoder:
+    def __init__(self, role: str, budget_tokens: int = 2000, top_k: int = 0, min_change: float = 0.001):
+        self.role = role
+        self.budget_tokens = int(budget_tokens)
+        self.top_k = int(top_k)
+        self.min_change = float(min_change)
+        self._last: Dict[str, Tuple[float, ...]] = {}  # valores enviados en la última llamada
+
+    @classmethod
+    def from_config(cls, cfg: WasiConfig, role: str) -> "PromptEncoder":
+        return cls(role, cfg.llm_prompt_budget_tokens, cfg.llm_prompt_top_k, cfg.llm_prompt_min_change)
+
+    def encode(self, obs: Dict[str, Any], reserved_tokens: int = 0
+               ) -> Tuple[str, List[str], List[str], Dict[str, Tuple[float, ...]]]:
+        """
+        Retorna (tabla CSV, símbolos incluidos, símbolos omitidos -> HOLD, valores enviados).
+        `reserved_tokens` descuenta del presupuesto el resto del prompt. Los valores
+        enviados recién cuentan como vistos por el modelo tras `commit()`.
+        """
+        feats = (obs or {}).get("symbols", {})
+        vals = {s: relative_features(f) for s, f in feats.items()}
+
+        changed = [
+            s for s, v in vals.items()
+            if s not in self._last or max(abs(a - b) for a, b in zip(v, self._last[s])) >= self.min_change
+        ]
+        changed.sort(key=lambda s: _strength(self.role, vals[s]), reverse=True)
+        if self.top_k > 0:
+            changed = changed[:self.top_k]
+
+        cross = any("mom_z" in f for f in feats.values())
+        header = HEADER + HEADER_CROSS if cross else HEADER
+        budget = self.budget_tokens - reserved_tokens - estimate_tokens(header)
+        rows: List[str] = []
+        included: List[str] = []
+        for s in changed:
+            dev, mom, vol, hi_d, lo_d = vals[s]
+            row = (f"{s},{float(feats[s].get('price') or 0.0):.2f},{dev * 100:.2f},{mom * 100:.2f},"
+                   f"{vol * 100:.2f},{hi_d * 100:.2f},{lo_d * 100:.2f}")
+            if cross:
+                f = feats[s]
+                row += f",{f.get('dev_z', 0.0):.2f},{f.get('mom_z', 0.0):.2f},{f.get('beta', 1.0):.2f}"
+            cost = estimate_tokens(row) + 1
+            if cost > budget:
+                break
+            budget -= cost
+            rows.append(row)
+            included.append(s)
+
+        omitted = [s for s in feats if s not in set(included)]
+        return "\n".join([header, *rows]), included, omitted, {s: vals[s] for s in included}
+
+    def commit(self, sent: Dict[str, Tuple[float, ...]]) -> None:
+        """Marca como vistos los valores de `encode()`: solo tras una respuesta parseable del modelo."""
+        self._last.update(sent)
+
+
+def hold_actions(symbols: List[str], reason: str = "prompt: sin cambios materiales (hold)") -> List[Dict[str, Any]]:
+    return [{"action": "hold", "symbol": s, "qty": 0, "price": None, "reason": reason} for s in symbols]
+
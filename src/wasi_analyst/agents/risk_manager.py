@@ -1,5 +1,8 @@
 from __future__ import annotations
 from typing import Dict, List
+import numpy as np
+from wasi_analyst.core.crosssection import corr_exposure, max_corr_add
+from wasi_analyst.core.riskengine import max_var_add
 from .base import BaseAgent
 
 class RiskManager(BaseAgent):
@@ -10,6 +13,26 @@ class RiskManager(BaseAgent):
         max_pos = int(getattr(self.cfg, "max_position_per_symbol", 100)) or 100
         max_gross = float(getattr(self.cfg, "max_gross_exposure", 1e12))
 
+        # exposición ajustada por correlación (core/crosssection.py): notionales del día
+        # incluyendo las compras ya aprobadas en este batch
+        max_corr = float(getattr(self.cfg, "max_corr_exposure", 0.0))
+        xs = obs.get("cross") if max_corr > 0 else None
+        if xs is not None:
+            rho = xs.corr()
+            x = np.array([self.state.positions.get(s, 0) * float(prices[s]) for s in xs.symbols])
+
+        # presupuesto de VaR (core/riskengine.py): sigma de la cartera con las compras
+        # aprobadas hasta el momento contra el límite derivado del equity; C x y x' C x
+        # se actualizan en O(S) por compra en vez de recalcular la forma cuadrática
+        var_budget = float(getattr(self.cfg, "var_budget", 0.0))
+        ve = obs.get("risk") if var_budget > 0 else None
+        if ve is not None:
+            xv = np.array([self.state.positions.get(s, 0) * float(prices[s]) for s in ve.symbols])
+            lim = ve.limit_sigma(self.state.cash + float(xv.sum()), var_budget)
+            cov = ve.cov.matrix()
+            cx = cov @ xv
+            var_x = float(xv @ cx)
+
         for a in actions:
             if a.get("action") == "hold":
                 capped.append(a); continue
@@ -51,6 +74,26 @@ class RiskManager(BaseAgent):
                         elif fit_qty < qty:
                             qty = fit_qty; note.append("cap->gross")
 
+                if qty > 0 and xs is not None:
+                    i = xs.index[sym]
+                    fit_qty = int(max_corr_add(x, rho, i, max_corr) // price)
+                    if fit_qty <= 0:
+                        qty = 0; note.append("cap: corr_exposure")
+                    elif fit_qty < qty:
+                        qty = fit_qty; note.append(f"cap->corr({corr_exposure(x, rho):,.0f})")
+                    x[i] += qty * price
+
+                if qty > 0 and ve is not None:
+                    i = ve.index[sym]
+                    fit_qty = int(min(max_var_add(cov[i, i], cx[i], var_x, lim), 1e15) // price)
+                    if fit_qty <= 0:
+                        qty = 0; note.append("cap: var_budget")
+                    elif fit_qty < qty:
+                        qty = fit_qty; note.append(f"cap->var({var_budget:.2%})")
+                    add = qty * price
+                    var_x += 2.0 * add * cx[i] + add * add * cov[i, i]
+                    cx += add * cov[:, i]
+
             elif side == "sell":
                 max_sell = max(0, pos)
                 if max_sell <= 0:
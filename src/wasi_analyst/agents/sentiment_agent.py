@@ -1,12 +1,11 @@
 from typing import Dict
 from .base import BaseAgent
 from wasi_analyst.util.schemas import Action
-from .llm_mixins import llm_actions
 
 class SentimentAgent(BaseAgent):
     def decide(self, obs: Dict, user_goal: str = "") -> Dict:
         if self.mode == "llm":
-            out = llm_actions("sentiment", obs, user_goal)
+            out = self.llm_decide("sentiment", obs, user_goal)
             return {"role":"sentiment", **out}
 
         eps = self.cfg.sentiment_eps
@@ -14,7 +13,8 @@ class SentimentAgent(BaseAgent):
 
         actions = []
         for sym, f in obs["symbols"].items():
-            p, hi, lo = f["price"], f.get("hi", p), f.get("lo", p)
+            p = f["price"]
+            hi, lo = f.get("hi", p), f.get("lo", p)
             if p >= hi * (1 + eps):
                 actions.append(Action(action="buy",  symbol=sym, qty=qty, price=None, reason="breakout-high").model_dump())
             elif p <= lo * (1 - eps):
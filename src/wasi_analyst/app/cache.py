@@ -0,0 +1,124 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from wasi_analyst.util.config import WasiConfig
+
+# Caché de corridas completas.
+#
+# Clave = sha256(config completa + fingerprint de los datos de precios + versión
+# del código + extras como el objetivo y el backend LLM). Cada entrada es un
+# directorio con history/trades en Parquet, el transcript en JSON y las notas; se
+# desalojan las menos usadas (mtime) cuando se pasa de `max_entries` o `max_bytes`.
+
+_PKG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash del código fuente del paquete: cualquier cambio invalida la caché."""
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(_PKG_DIR):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                h.update(os.path.relpath(path, _PKG_DIR).encode())
+                with open(path, "rb") as fh:
+                    h.update(fh.read())
+    return h.hexdigest()[:16]
+
+
+def run_key(cfg: WasiConfig, fingerprint: str, **extra: Any) -> str:
+    payload = {
+        "config": cfg.model_dump(mode="json"),
+        "data": fingerprint,
+        "code": code_version(),
+        "extra": extra,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class RunCache:
+    def __init__(self, root: str = "artifacts/cache", max_entries: int = 32, max_bytes: int = 512 * 2**20):
+        self.root = root
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+
+    @classmethod
+    def from_env(cls) -> "RunCache":
+        return cls(
+            root=os.getenv("WASI_CACHE_DIR", "artifacts/cache"),
+            max_entries=int(os.getenv("WASI_CACHE_MAX_ENTRIES", "32")),
+            max_bytes=int(float(os.getenv("WASI_CACHE_MAX_MB", "512")) * 2**20),
+        )
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        d = self._dir(key)
+        if not os.path.isfile(os.path.join(d, "meta.json")):
+            return None
+        import pandas as pd
+        try:
+            with open(os.path.join(d, "meta.json"), encoding="utf-8") as fh:
+                meta = json.load(fh)
+            with open(os.path.join(d, "transcript.json"), encoding="utf-8") as fh:
+                transcript = json.load(fh)
+            out = {
+                "history": pd.read_parquet(os.path.join(d, "history.parquet")),
+                "trades": pd.read_parquet(os.path.join(d, "trades.parquet")),
+                "notes": list(meta["notes"]),
+                "transcript": transcript,
+            }
+        except Exception:
+            shutil.rmtree(d, ignore_errors=True)  # entrada corrupta: se descarta
+            return None
+        os.utime(d)  # LRU: marca de último uso
+        return out
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._dir(f".tmp-{key}-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            result["history"].to_parquet(os.path.join(tmp, "history.parquet"))
+            result["trades"].to_parquet(os.path.join(tmp, "trades.parquet"))
+            # JSON como en app/results.py: nada que se ejecute al leer la caché
+            with open(os.path.join(tmp, "transcript.json"), "w", encoding="utf-8") as fh:
+                json.dump(result["transcript"], fh, default=str)
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+                json.dump({"key": key, "created": time.time(), "notes": result["notes"]}, fh)
+            final = self._dir(key)
+            shutil.rmtree(final, ignore_errors=True)
+            os.replace(tmp, final)  # aparece completa o no aparece
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            d = self._dir(name)
+            if name.startswith(".") or not os.path.isdir(d):
+                continue
+            size = sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d))
+            entries.append((os.path.getmtime(d), size, d))
+        entries.sort()  # más viejas primero
+        total = sum(e[1] for e in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, d = entries.pop(0)
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
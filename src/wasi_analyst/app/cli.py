@@ -1,9 +1,9 @@
+from typing import List
+
 from typer import Typer, Option
-from wasi_analyst.core.market import Market
-from wasi_analyst.data.providers import RandomWalkProvider
-from wasi_analyst.agents.coordinator import Coordinator
-from wasi_analyst.util.store import DuckDBStore
-from wasi_analyst.util.config import WasiConfig
+
+# Los imports pesados (pandas, pydantic, agentes) se hacen dentro de cada
+# comando: `wasi hello` y `wasi --help` no deberían pagarlos.
 
 app = Typer(help="Wasi Analyst CLI")
 
@@ -17,15 +17,210 @@ def simulate(
     days: int = Option(10, "--days", help="Trading days"),
     symbols: str = Option("AAPL,MSFT", "--symbols", help="Símbolos separados por coma"),
     seed: int = Option(123, "--seed", help="Random seed"),
+    journal: str = Option("", "--journal", help="Journal binario de órdenes/fills (ver `wasi replay`)"),
+    var_budget: float = Option(0.0, "--var-budget", help="Tope de VaR 1d como fracción del equity (0 = solo registrar)"),
+    market_mode: str = Option("lp", "--market", help="lp (LP virtual) | abm (población de traders + subasta)"),
+    abm_agents: int = Option(1000, "--abm-agents", help="Tamaño de la población en --market abm"),
 ):
     """Corre una simulación mínima y guarda artefactos."""
+    from wasi_analyst.core.market import Market
+    from wasi_analyst.data.providers import RandomWalkProvider
+    from wasi_analyst.agents.coordinator import Coordinator
+    from wasi_analyst.util.store import DuckDBStore
+    from wasi_analyst.util.config import WasiConfig
+
     cfg = WasiConfig(
         seed=seed,
         days=days,
         symbols=[s.strip() for s in symbols.split(",") if s.strip()],
+        journal_path=journal or None,
+        var_budget=var_budget,
+        market_mode=market_mode,
+        abm_agents=abm_agents,
     )
     market = Market(cfg, price_provider=RandomWalkProvider(seed=seed))
     store = DuckDBStore("wasi.duckdb")
     coord = Coordinator(cfg=cfg, market=market, store=store)
     coord.run()
     print("✅ Simulation complete. Artifacts en ./artifacts y ./wasi.duckdb (si DuckDB disponible)")
+
+@app.command()
+def replay(
+    journal: str,
+    out: str = Option("artifacts/replay", "--out", help="Directorio de salida (Parquet)"),
+):
+    """Reconstruye ledger, órdenes, trades y métricas desde un journal, sin re-simular."""
+    import os
+    import time
+    from wasi_analyst.core.journal import replay as replay_journal
+
+    t0 = time.perf_counter()
+    res = replay_journal(journal)
+    elapsed = time.perf_counter() - t0
+    os.makedirs(out, exist_ok=True)
+    for name in ("history", "trades", "orders", "risk"):
+        res[name].to_parquet(os.path.join(out, f"{name}.parquet"))
+    for n in res["notes"]:
+        print(n)
+    print(f"✅ Replay en {elapsed * 1000:.0f} ms. Resultados en {out}/")
+
+# ---------- jobs (app/jobs.py) ----------
+
+jobs_app = Typer(help="Servicio de jobs de simulación en segundo plano")
+app.add_typer(jobs_app, name="jobs")
+
+@jobs_app.command("serve")
+def jobs_serve(
+    host: str = Option("127.0.0.1", "--host"),
+    port: int = Option(8765, "--port"),
+    workers: int = Option(2, "--workers", help="Procesos del pool"),
+    root: str = Option("artifacts/jobs", "--root", help="Cola SQLite y resultados"),
+):
+    """Levanta la API HTTP de jobs con un pool de workers."""
+    from wasi_analyst.app.jobs import serve
+    print(f"Jobs en http://{host}:{port}/jobs ({workers} workers)")
+    serve(host, port, workers, root)
+
+@jobs_app.command("submit")
+def jobs_submit(
+    days: int = Option(10, "--days"),
+    symbols: str = Option("AAPL,MSFT", "--symbols"),
+    seed: int = Option(123, "--seed"),
+    goal: str = Option("", "--goal"),
+    url: str = Option("http://127.0.0.1:8765", "--url"),
+    wait_: bool = Option(False, "--wait", help="Seguir el progreso hasta que termine"),
+):
+    """Encola una simulación en el servicio de jobs."""
+    from wasi_analyst.app.jobs import JobClient, wait
+    cli = JobClient(url)
+    job_id = cli.submit({"days": days, "symbols": [s.strip() for s in symbols.split(",") if s.strip()],
+                         "seed": seed, "user_goal": goal})
+    print(job_id)
+    if wait_:
+        job = wait(cli, job_id, on_event=lambda ev: print(f"[{(ev['progress'] or 0):4.0%}] {ev['message']}"))
+        print(f"Estado: {job.get('status')}")
+        if job.get("status") == "done":
+            res = cli.result(job_id)
+            print(f"Equity final: {res['history']['equity'].iloc[-1]:,.2f} · trades: {len(res['trades'])}")
+
+@jobs_app.command("status")
+def jobs_status(job_id: str, url: str = Option("http://127.0.0.1:8765", "--url")):
+    """Estado de un job."""
+    from wasi_analyst.app.jobs import JobClient
+    job = JobClient(url).status(job_id)
+    print(job if job else "job inexistente")
+
+@jobs_app.command("cancel")
+def jobs_cancel(job_id: str, url: str = Option("http://127.0.0.1:8765", "--url")):
+    """Cancela un job encolado o en curso."""
+    from wasi_analyst.app.jobs import JobClient
+    print("cancelación pedida" if JobClient(url).cancel(job_id) else "el job ya terminó o no existe")
+
+# ---------- walk-forward (app/walkforward.py) ----------
+
+_BOOLS = {"true": True, "1": True, "yes": True, "si": True, "false": False, "0": False, "no": False}
+
+def _parse_value(name: str, default, raw: str):
+    """Convierte `raw` al tipo del default (bool explícito: bool("False") sería True)."""
+    try:
+        if isinstance(default, bool):
+            return _BOOLS[raw.lower()]
+        return type(default)(raw) if isinstance(default, (int, float)) else raw
+    except (KeyError, ValueError):
+        raise SystemExit(f"valor inválido para {name}: {raw!r}")
+
+def _parse_grid(grid: List[str], base: dict) -> dict:
+    """["param=v1,v2", ...] -> {param: [v1, v2]} con el tipo del default de run_simulation."""
+    import inspect
+    from wasi_analyst.app.jobs import validate_params
+    from wasi_analyst.app.run import run_simulation
+    defaults = {n: p.default for n, p in inspect.signature(run_simulation).parameters.items()}
+    parsed = {}
+    for g in grid:
+        name, _, vals = g.partition("=")
+        name = name.strip()
+        parsed[name] = [_parse_value(name, defaults.get(name), v.strip()) for v in vals.split(",") if v.strip()]
+    try:
+        validate_params({**base, **dict.fromkeys(parsed)})   # mismos nombres que acepta un job
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return parsed
+
+@app.command()
+def walkforward(
+    days: int = Option(750, "--days", help="Largo total de la historia"),
+    is_days: int = Option(250, "--is-days", help="Días in-sample por ventana"),
+    oos_days: int = Option(50, "--oos-days", help="Días out-of-sample por ventana"),
+    symbols: str = Option("AAPL,MSFT", "--symbols"),
+    seed: int = Option(123, "--seed"),
+    grid: List[str] = Option(..., "--grid", help="param=v1,v2,... (repetible)"),
+    metric: str = Option("sharpe", "--metric", help="sharpe | return"),
+    workers: int = Option(4, "--workers"),
+    out: str = Option("artifacts/walkforward", "--out", help="Directorio de salida (CSV)"),
+):
+    """Optimiza los parámetros de las reglas in-sample y encadena el out-of-sample."""
+    import os
+    from wasi_analyst.app.walkforward import walk_forward
+
+    syms = [s.strip() for s in symbols.split(",") if s.strip()]
+    parsed = _parse_grid(grid, {"days": days, "symbols": syms, "seed": seed})
+    res = walk_forward(syms, parsed, days, is_days, oos_days,
+                       seed=seed, metric=metric, workers=workers)
+    os.makedirs(out, exist_ok=True)
+    res.windows.to_csv(os.path.join(out, "windows.csv"), index=False)
+    res.oos_equity.to_csv(os.path.join(out, "oos_equity.csv"))
+    res.curves.to_csv(os.path.join(out, "curves.csv"), index_label="day")
+    print(res.windows.to_string(index=False))
+    print("\n".join(res.notes))
+    print(f"✅ Resultados en {out}/")
+
+# ---------- sweeps distribuidos (app/sweep.py) ----------
+
+sweep_app = Typer(help="Sweeps de configuraciones repartidos entre workers por TCP")
+app.add_typer(sweep_app, name="sweep")
+
+@sweep_app.command("serve")
+def sweep_serve(
+    days: int = Option(250, "--days"),
+    symbols: str = Option("AAPL,MSFT", "--symbols"),
+    seeds: str = Option("123", "--seeds", help="Seeds separadas por coma (una unidad por seed y config)"),
+    grid: List[str] = Option([], "--grid", help="param=v1,v2,... (repetible)"),
+    host: str = Option("127.0.0.1", "--host"),
+    port: int = Option(8766, "--port"),
+    db: str = Option("wasi.duckdb", "--db", help="DuckDB donde se escriben los resultados"),
+    sweep_id: str = Option("", "--sweep-id", help="Default: hash de las unidades (reanuda el mismo sweep)"),
+    lease: float = Option(30.0, "--lease", help="Segundos sin heartbeat antes de reencolar una unidad"),
+    local_workers: int = Option(0, "--local-workers", help="Workers a lanzar en esta máquina"),
+    artifacts: str = Option("", "--artifacts", help="Directorio (compartido) para resultados completos"),
+    out: str = Option("artifacts/sweep", "--out", help="Directorio de salida (CSV)"),
+):
+    """Reparte las unidades del sweep y espera a que terminen."""
+    import os
+    from wasi_analyst.app.sweep import serve_sweep, sweep_units
+
+    base = {"days": days, "symbols": [s.strip() for s in symbols.split(",") if s.strip()]}
+    seed_list = [int(s) for s in seeds.split(",") if s.strip()]
+    units = sweep_units(_parse_grid(grid, {**base, "seed": seed_list[0]}), seed_list, base)
+    print(f"Sweep: {len(units)} unidades en {host}:{port}")
+    sweep = serve_sweep(units, host, port, db, sweep_id or None, lease, local_workers=local_workers,
+                        artifacts=artifacts or None, on_progress=lambda d, n: print(f"[{d}/{n}]"))
+    res = sweep.results()
+    os.makedirs(out, exist_ok=True)
+    res.to_csv(os.path.join(out, f"{sweep.sweep_id}.csv"), index=False)
+    print("\n".join(sweep.summary()))
+    print(f"✅ Resultados en {db} (tabla sweep_results) y {out}/{sweep.sweep_id}.csv")
+
+@sweep_app.command("worker")
+def sweep_worker(
+    connect: str = Option("127.0.0.1:8766", "--connect", help="host:port del coordinador"),
+    artifacts: str = Option("", "--artifacts", help="Directorio (compartido) para resultados completos"),
+    heartbeat: float = Option(5.0, "--heartbeat", help="Segundos entre heartbeats"),
+    workdir: str = Option("", "--workdir", help="Directorio de trabajo (default: temporal)"),
+):
+    """Corre unidades del coordinador hasta que el sweep termina."""
+    from wasi_analyst.app.sweep import run_worker
+    n = run_worker(connect, artifacts=artifacts or None, heartbeat=heartbeat, workdir=workdir or None)
+    print(f"✅ {n} unidades")
+
+if __name__ == "__main__":
+    app()
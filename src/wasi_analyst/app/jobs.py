@@ -0,0 +1,517 @@
+"""
+Servicio local de jobs de simulación.
+
+- Cola persistente en SQLite (sobrevive reinicios: lo que estaba corriendo vuelve a la cola).
+- Pool acotado de procesos "tibios" (pandas, numpy y los agentes ya importados).
+- Eventos de progreso desde `loop_report`, cancelación y recuperación del resultado
+  (Arrow IPC en disco, ver app/results.py: `result()` devuelve un handle mmap).
+- API HTTP JSON mínima (ThreadingHTTPServer) y un cliente con la misma interfaz
+  que el servicio en proceso.
+
+Uso:
+    python -m wasi_analyst.app.cli jobs serve --port 8765 --workers 2
+    python -m wasi_analyst.app.cli jobs submit --days 60 --symbols AAPL,MSFT --wait
+
+Rutas:
+    POST /jobs                 {"days": 20, "symbols": [...], ...} -> {"id": ...}
+    GET  /jobs                 lista de jobs
+    GET  /jobs/<id>            estado
+    GET  /jobs/<id>/events?after=N
+    GET  /jobs/<id>/result
+    POST /jobs/<id>/cancel
+"""
+from __future__ import annotations
+import inspect
+import json
+import multiprocessing as mp
+import os
+import re
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib import request as urlrequest
+
+from wasi_analyst.util.logging import get_logger
+
+FINAL = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    progress REAL DEFAULT 0,
+    message TEXT DEFAULT '',
+    cancel INTEGER DEFAULT 0,
+    pid INTEGER,
+    result_path TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    progress REAL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS events_job ON events(job_id, seq);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# ---------- persistencia ----------
+
+class JobStore:
+    """Cola y eventos en SQLite (WAL: lectores y workers concurrentes)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as con:
+            con.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def add(self, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        self._conn().execute("INSERT INTO jobs (id, status, params, created) VALUES (?, 'queued', ?, ?)",
+                             (job_id, json.dumps(params), time.time()))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        out = dict(row)
+        out["params"] = json.loads(out["params"])
+        return out
+
+    def list(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, status, progress, message, created, finished FROM jobs ORDER BY created DESC LIMIT ?",
+            (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def queued(self, limit: int) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, params FROM jobs WHERE status = 'queued' AND cancel = 0 ORDER BY created LIMIT ?",
+            (limit,)).fetchall()
+        return [{"id": r["id"], "params": json.loads(r["params"])} for r in rows]
+
+    def set_status(self, job_id: str, status: str, **fields: Any) -> None:
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._conn().execute(f"UPDATE jobs SET status = ?{', ' + cols if cols else ''} WHERE id = ?",
+                             (status, *fields.values(), job_id))
+
+    def add_event(self, job_id: str, message: str, progress: Optional[float]) -> None:
+        con = self._conn()
+        con.execute("INSERT INTO events (job_id, ts, progress, message) VALUES (?, ?, ?, ?)",
+                    (job_id, time.time(), progress, message))
+        if progress is not None:
+            con.execute("UPDATE jobs SET progress = ?, message = ? WHERE id = ?", (progress, message, job_id))
+        else:
+            con.execute("UPDATE jobs SET message = ? WHERE id = ?", (message, job_id))
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT seq, ts, progress, message FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after)).fetchall()
+        return [dict(r) for r in rows]
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Marca el job para cancelar; si todavía está en cola se cancela ya. False si ya terminó."""
+        con = self._conn()
+        cur = con.execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status NOT IN ('done', 'failed', 'cancelled')",
+                          (job_id,))
+        con.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                    (time.time(), job_id))
+        return cur.rowcount > 0
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self._conn().execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel"])
+
+    def requeue(self, job_id: str) -> None:
+        """El job vuelve a la cola (o queda cancelado si ya se había pedido)."""
+        self._conn().execute("UPDATE jobs SET status = CASE WHEN cancel = 1 THEN 'cancelled' ELSE 'queued' END, "
+                             "pid = NULL, started = NULL WHERE id = ?", (job_id,))
+
+    def recover(self) -> int:
+        """Jobs que quedaron 'running'/'starting' de un servicio anterior vuelven a la cola."""
+        cur = self._conn().execute("UPDATE jobs SET status = 'queued', pid = NULL "
+                                   "WHERE status IN ('running', 'starting')")
+        return cur.rowcount
+
+
+# ---------- worker ----------
+
+def _warm() -> None:
+    # se importa todo lo pesado una vez por proceso del pool
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import wasi_analyst.agents.coordinator  # noqa: F401
+    import wasi_analyst.app.run  # noqa: F401
+    import wasi_analyst.core.market  # noqa: F401
+    import wasi_analyst.data.providers  # noqa: F401
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_job(db_path: str, job_id: str, params: Dict[str, Any], result_dir: str, work_dir: str) -> str:
+    from wasi_analyst.app.run import absolute_params, run_simulation, workdir
+
+    db_path, result_dir, work_dir = map(os.path.abspath, (db_path, result_dir, work_dir))
+    store = JobStore(db_path)
+    store.set_status(job_id, "running", started=time.time(), pid=os.getpid())
+    params = absolute_params(params)
+    last = {"event": 0.0, "check": 0.0}
+
+    def report(msg: str, p: Optional[float] = None) -> None:
+        now = time.monotonic()
+        # se muestrean (el loop reporta varias veces por día): como mucho 5 eventos/seg
+        if now - last["event"] >= 0.2:
+            store.add_event(job_id, msg, p)
+            last["event"] = now
+        if now - last["check"] >= 0.25:
+            last["check"] = now
+            if store.cancel_requested(job_id):
+                raise JobCancelled(job_id)
+
+    try:
+        from wasi_analyst.app.results import write_result
+        # cada job en su directorio: los workers del pool corren a la vez
+        with workdir(os.path.join(work_dir, job_id)):
+            res = run_simulation(**params, report=report)
+        path = os.path.join(result_dir, job_id)
+        write_result(res, path, job_id=job_id)
+        store.set_status(job_id, "done", finished=time.time(), progress=1.0, result_path=path)
+        return "done"
+    except JobCancelled:
+        store.set_status(job_id, "cancelled", finished=time.time())
+        store.add_event(job_id, "Cancelado", None)
+        return "cancelled"
+    except Exception as e:
+        store.set_status(job_id, "failed", finished=time.time(), error=traceback.format_exc())
+        store.add_event(job_id, f"Error: {e}", None)
+        return "failed"
+
+
+def validate_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Solo parámetros conocidos de run_simulation (sin `report`)."""
+    from wasi_analyst.app.run import run_simulation
+    sig = inspect.signature(run_simulation)
+    allowed = set(sig.parameters) - {"report"}
+    unknown = set(params) - allowed
+    if unknown:
+        raise ValueError(f"parámetros desconocidos: {sorted(unknown)}")
+    missing = [n for n, p in sig.parameters.items()
+               if p.default is inspect.Parameter.empty and n not in params]
+    if missing:
+        raise ValueError(f"faltan parámetros: {missing}")
+    return params
+
+
+def _load_result(path: Optional[str]):
+    """RunResult (mmap) del job."""
+    if not path or not os.path.isfile(os.path.join(path, "meta.json")):
+        return None   # sin resultado, o un .pkl de versiones anteriores (ya no se deserializa)
+    from wasi_analyst.app.results import RunResult
+    return RunResult(path)
+
+
+# ---------- servicio en proceso ----------
+
+class JobService:
+    def __init__(self, root: str = "artifacts/jobs", workers: int = 2):
+        self.root = root
+        self.store = JobStore(os.path.join(root, "jobs.sqlite"))
+        self.workers = max(1, int(workers))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._suspects: set = set()   # jobs en vuelo cuando se rompió el pool
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- ciclo de vida --
+
+    def start(self) -> "JobService":
+        n = self.store.recover()
+        if n:
+            get_logger().info("jobs_recovered", count=n)
+        self._new_pool()
+        self._thread = threading.Thread(target=self._dispatch, name="wasi-jobs", daemon=True)
+        self._thread.start()
+        return self
+
+    def _new_pool(self) -> None:
+        # spawn: el proceso padre tiene threads (HTTP, dispatcher); fork no es seguro
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn"), initializer=_warm)
+        for _ in range(self.workers):
+            self._pool.submit(_ping)  # arranca los workers ya (quedan tibios)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self) -> None:
+        while not self._stop.is_set():
+            for job_id, fut in list(self._inflight.items()):
+                if fut.done() and not self._broken(fut):
+                    del self._inflight[job_id]
+                    self._suspects.discard(job_id)
+            if any(self._broken(f) for f in self._inflight.values()):
+                self._recover_pool()
+            # un sospechoso (estaba en un pool que se rompió) corre solo: si vuelve a
+            # romperlo, el culpable queda identificado sin arrastrar a otros jobs
+            free = 0 if self._inflight.keys() & self._suspects else self.workers - len(self._inflight)
+            if free > 0:
+                for job in self.store.queued(free):
+                    suspect = job["id"] in self._suspects
+                    if suspect and self._inflight:
+                        break
+                    self.store.set_status(job["id"], "starting")
+                    fut = self._pool.submit(_run_job, self.store.path, job["id"], job["params"],
+                                            os.path.join(self.root, "results"), os.path.join(self.root, "work"))
+                    fut.add_done_callback(lambda _f: self._wake.set())
+                    self._inflight[job["id"]] = fut
+                    if suspect:
+                        break
+            self._wake.wait(0.5)
+            self._wake.clear()
+
+    @staticmethod
+    def _broken(fut: Future) -> bool:
+        return fut.done() and not fut.cancelled() and isinstance(fut.exception(), BrokenProcessPool)
+
+    def _recover_pool(self) -> None:
+        """
+        Un worker murió (OOM, kill) y el pool entero quedó roto: se rehace una sola vez.
+        Si había un solo job en vuelo, ese fue el culpable y falla; si había varios, no se
+        sabe cuál, así que vuelven a la cola como sospechosos (ver _dispatch).
+        """
+        self._pool.shutdown(wait=True, cancel_futures=True)   # todos los futures quedan resueltos
+        hit = [job_id for job_id, fut in self._inflight.items() if fut.cancelled() or self._broken(fut)]
+        for job_id in hit:
+            if len(hit) == 1:
+                self.store.set_status(job_id, "failed", finished=time.time(), error="worker terminado")
+                self._suspects.discard(job_id)
+            else:
+                self.store.requeue(job_id)
+                self._suspects.add(job_id)
+        get_logger().warning("jobs_pool_broken", hit=len(hit), requeued=len(self._suspects))
+        self._inflight.clear()
+        self._new_pool()
+
+    # -- API (misma interfaz que JobClient) --
+
+    def submit(self, params: Dict[str, Any]) -> str:
+        job_id = self.store.add(validate_params(dict(params)))
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is not None:
+            job.pop("result_path", None)
+        return job
+
+    def list(self) -> List[Dict[str, Any]]:
+        return self.store.list()
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        return self.store.events(job_id, after)
+
+    def cancel(self, job_id: str) -> bool:
+        ok = self.store.request_cancel(job_id)
+        self._wake.set()
+        return ok
+
+    def result(self, job_id: str):
+        job = self.store.get(job_id)
+        return _load_result(job and job.get("result_path"))
+
+
+# ---------- HTTP ----------
+
+def _frame_to_json(df) -> Dict[str, Any]:
+    return json.loads(df.to_json(orient="split", index=False, date_format="iso"))
+
+
+def _result_to_json(res: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "history": _frame_to_json(res["history"]),
+        "trades": _frame_to_json(res["trades"]),
+        "notes": res["notes"],
+        "transcript": res["transcript"],
+    }
+
+
+def make_server(service: JobService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    routes = re.compile(r"^/jobs(?:/(?P<id>[0-9a-f]+)(?:/(?P<sub>events|result|cancel))?)?/?$")
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, code: int, body: Any) -> None:
+            data = json.dumps(body, default=str).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self):
+            path, _, query = self.path.partition("?")
+            m = routes.match(path)
+            args = dict(kv.split("=", 1) for kv in query.split("&") if "=" in kv)
+            return m, args
+
+        def do_GET(self):
+            m, args = self._route()
+            if m is None:
+                return self._send(404, {"error": "not found"})
+            job_id, sub = m.group("id"), m.group("sub")
+            if job_id is None:
+                return self._send(200, service.list())
+            job = service.status(job_id)
+            if job is None:
+                return self._send(404, {"error": "job inexistente"})
+            if sub is None:
+                return self._send(200, job)
+            if sub == "events":
+                return self._send(200, service.events(job_id, int(args.get("after", 0))))
+            if sub == "result":
+                res = service.result(job_id)
+                if res is None:
+                    return self._send(409, {"error": f"job en estado {job['status']}"})
+                return self._send(200, _result_to_json(res))
+            return self._send(405, {"error": "método no permitido"})
+
+        def do_POST(self):
+            m, _ = self._route()
+            if m is None:
+                return self._send(404, {"error": "not found"})
+            job_id, sub = m.group("id"), m.group("sub")
+            if job_id is None:
+                n = int(self.headers.get("Content-Length") or 0)
+                try:
+                    params = json.loads(self.rfile.read(n) or b"{}")
+                    return self._send(201, {"id": service.submit(params)})
+                except (ValueError, TypeError) as e:
+                    return self._send(400, {"error": str(e)})
+            if sub == "cancel":
+                if service.status(job_id) is None:
+                    return self._send(404, {"error": "job inexistente"})
+                return self._send(202, {"id": job_id, "cancel": service.cancel(job_id)})
+            return self._send(405, {"error": "método no permitido"})
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 2, root: str = "artifacts/jobs") -> None:
+    service = JobService(root, workers).start()
+    httpd = make_server(service, host, port)
+    get_logger().info("jobs_server_started", url=f"http://{host}:{httpd.server_address[1]}", workers=workers)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop()
+
+
+# ---------- cliente HTTP ----------
+
+class JobClient:
+    def __init__(self, base_url: str = "http://127.0.0.1:8765", timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method: str, path: str, body: Any = None) -> Any:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urlrequest.Request(self.base_url + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urlrequest.HTTPError as e:
+            if e.code in (404, 409):
+                return None
+            raise RuntimeError(json.loads(e.read() or b"{}").get("error", str(e))) from e
+
+    def submit(self, params: Dict[str, Any]) -> str:
+        return self._call("POST", "/jobs", params)["id"]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def list(self) -> List[Dict[str, Any]]:
+        return self._call("GET", "/jobs")
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        return self._call("GET", f"/jobs/{job_id}/events?after={after}") or []
+
+    def cancel(self, job_id: str) -> bool:
+        out = self._call("POST", f"/jobs/{job_id}/cancel")
+        return bool(out and out.get("cancel"))
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        out = self._call("GET", f"/jobs/{job_id}/result")
+        if out is None:
+            return None
+        import pandas as pd
+        for k in ("history", "trades"):
+            out[k] = pd.DataFrame(out[k]["data"], columns=out[k]["columns"])
+        return out
+
+
+def wait(backend, job_id: str, on_event=None, poll: float = 0.5, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Sigue los eventos de un job (servicio o cliente) hasta que termina; devuelve su estado final."""
+    seq, t0 = 0, time.monotonic()
+    while True:
+        for ev in backend.events(job_id, seq):
+            seq = ev["seq"]
+            if on_event is not None:
+                on_event(ev)
+        job = backend.status(job_id)
+        if job is None or job["status"] in FINAL:
+            for ev in backend.events(job_id, seq):  # los últimos eventos (p.ej. "Completado")
+                seq = ev["seq"]
+                if on_event is not None:
+                    on_event(ev)
+            return job or {}
+        if timeout is not None and time.monotonic() - t0 > timeout:
+            return job
+        time.sleep(poll)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+# Resultados de corridas en disco, como Arrow IPC (Feather v2 sin compresión).
+#
+# Un resultado es un directorio con history.arrow, trades.arrow, transcript.arrow
+# (una fila por paso: day, step, payload JSON) y meta.json con las notas. Se lee
+# con pa.memory_map: abrir es casi instantáneo sin importar el tamaño, las
+# páginas las comparte el sistema operativo entre procesos, y quien lo abre
+# (UI, analytics) solo guarda un RunResult: path + notas, sin los datos.
+
+TABLES = ("history", "trades", "transcript")
+
+
+def _pa():
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.feather  # noqa: F401
+    except Exception as e:
+        raise RuntimeError("Falta 'pyarrow'. Instalalo con: pip install pyarrow") from e
+    return pa
+
+
+def write_result(res: Dict[str, Any], path: str, **meta: Any) -> "RunResult":
+    """Escribe el dict de run_simulation en `path` (atómico) y devuelve su handle."""
+    pa = _pa()
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = os.path.join(parent, f".tmp-{os.path.basename(path)}-{uuid.uuid4().hex[:6]}")
+    os.makedirs(tmp)
+    try:
+        for name in ("history", "trades"):
+            tbl = pa.Table.from_pandas(res[name], preserve_index=False)
+            pa.feather.write_feather(tbl, os.path.join(tmp, f"{name}.arrow"), compression="uncompressed")
+        steps = res.get("transcript") or []
+        tbl = pa.table({
+            "day": pa.array([int(t.get("day", -1)) for t in steps], pa.int64()),
+            "step": pa.array([str(t.get("step", "")) for t in steps], pa.string()),
+            "payload": pa.array([json.dumps(t, default=str) for t in steps], pa.string()),
+        })
+        pa.feather.write_feather(tbl, os.path.join(tmp, "transcript.arrow"), compression="uncompressed")
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump({"notes": list(res.get("notes", [])), **meta}, fh, default=str)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return RunResult(path)
+
+
+class RunResult(Mapping):
+    """
+    Handle liviano a un resultado en disco. Se comporta como el dict de
+    run_simulation (res["history"], res["notes"], ...) pero cada acceso abre el
+    archivo mmap en ese momento: el handle no retiene DataFrames.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as fh:
+            self.meta: Dict[str, Any] = json.load(fh)
+        self.notes: List[str] = list(self.meta.get("notes", []))
+
+    def __repr__(self) -> str:
+        return f"RunResult({self.path!r})"
+
+    # ---------- acceso columnar ----------
+
+    def table(self, name: str, columns: Optional[Sequence[str]] = None) -> pa.Table:
+        """Tabla Arrow sobre el archivo mapeado (sin copiar los buffers)."""
+        if name not in TABLES:
+            raise KeyError(name)
+        pa = _pa()
+        with pa.memory_map(os.path.join(self.path, f"{name}.arrow"), "r") as src:
+            tbl = pa.ipc.open_file(src).read_all()
+        return tbl.select(list(columns)) if columns is not None else tbl
+
+    def frame(self, name: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.table(name, columns).to_pandas()
+
+    def columns(self, name: str) -> List[str]:
+        pa = _pa()
+        with pa.memory_map(os.path.join(self.path, f"{name}.arrow"), "r") as src:
+            return list(pa.ipc.open_file(src).schema.names)
+
+    def transcript(self, day: Optional[int] = None, step: Optional[str] = None) -> List[dict]:
+        """Pasos del transcript (opcionalmente de un día / tipo); solo decodifica el JSON filtrado."""
+        import pyarrow.compute as pc
+        tbl = self.table("transcript")
+        if day is not None:
+            tbl = tbl.filter(pc.equal(tbl["day"], day))
+        if step is not None:
+            tbl = tbl.filter(pc.equal(tbl["step"], step))
+        return [json.loads(p) for p in tbl["payload"].to_pylist()]
+
+    # ---------- interfaz dict ----------
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "notes":
+            return self.notes
+        if key == "transcript":
+            return self.transcript()
+        if key in TABLES:
+            return self.frame(key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("history", "trades", "notes", "transcript"))
+
+    def __len__(self) -> int:
+        return 4
+
+
+def open_result(path: str) -> RunResult:
+    if not os.path.isfile(os.path.join(path, "meta.json")):
+        raise FileNotFoundError(f"resultado inexistente: {path}")
+    return RunResult(path)
@@ -1,13 +1,50 @@
-from typing import List, Callable, Optional
-from wasi_analyst.core.market import Market
-from wasi_analyst.data.providers import RandomWalkProvider, YahooDailyReplay
-from wasi_analyst.agents.coordinator import Coordinator
-from wasi_analyst.util.config import WasiConfig
-from wasi_analyst.util.store import DuckDBStore
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Callable, Optional
+from wasi_analyst.util.settings import load_env
 
 ReportFn = Callable[[str, Optional[float]], None]
-from dotenv import load_dotenv
-load_dotenv()
+
+# directorios que se comparten entre corridas aunque cada una tenga su workdir
+_SHARED_PATHS = {
+    "WASI_CACHE_DIR": "artifacts/cache",
+    "WASI_FEATURE_DIR": "artifacts/features",
+    "WASI_LLM_RECORD_PATH": "artifacts/llm_recordings.jsonl",
+}
+
+
+def absolute_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Rutas de entrada/salida de run_simulation en absoluto (antes de cambiar de workdir)."""
+    out = dict(params)
+    if out.get("data_path") and out.get("data_source") != "Shared memory":  # ahí es un nombre
+        out["data_path"] = os.path.abspath(out["data_path"])
+    if out.get("journal_path"):
+        out["journal_path"] = os.path.abspath(out["journal_path"])
+    return out
+
+
+@contextmanager
+def workdir(path: str) -> Iterator[str]:
+    """
+    Corre en `path`: artifacts/ y wasi.duckdb propios, así corridas concurrentes no
+    se pisan los Parquet ni el lock de DuckDB. La caché de corridas, el cubo de
+    features y las grabaciones LLM siguen compartidos (fijados en absoluto).
+    """
+    prev = os.getcwd()
+    env = {k: os.environ.get(k) for k in _SHARED_PATHS}
+    for k, default in _SHARED_PATHS.items():
+        os.environ[k] = os.path.abspath(env[k] or default)
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(prev)
+        for k, v in env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
 
 
 def run_simulation(
@@ -16,6 +53,7 @@ def run_simulation(
     seed: int,
     user_goal: str = "",
     data_source: str = "Random Walk",
+    data_path: str = "",
     fundamental_mode: str = "rule",
     macro_mode: str = "rule",
     sentiment_mode: str = "rule",
@@ -29,8 +67,18 @@ def run_simulation(
     sentiment_break_window: int = 10,
     sentiment_eps: float = 0.002,
     sentiment_qty: int = 8,
+    profile: bool = False,
+    journal_path: str = "",
+    use_cache: bool = True,
     report: ReportFn = lambda msg, p=None: None,
 ) -> dict:
+    load_env()
+    from wasi_analyst.core.market import Market
+    from wasi_analyst.data.providers import RandomWalkProvider, YahooDailyReplay
+    from wasi_analyst.agents.coordinator import Coordinator
+    from wasi_analyst.util.config import WasiConfig
+    from wasi_analyst.util.store import DuckDBStore
+
     total_steps = max(1, days * 4 + 4)
     step = 0
     def tick(msg: str):
@@ -51,24 +99,65 @@ def run_simulation(
         sentiment_break_window=sentiment_break_window,
         sentiment_eps=sentiment_eps,
         sentiment_qty=sentiment_qty,
+        profile=profile,
+        journal_path=journal_path or None,
     )
 
     tick(f"Seleccionando fuente de datos: {data_source}")
-    price_provider = YahooDailyReplay(symbols) if data_source == "Yahoo Finance (daily)" else RandomWalkProvider(seed=seed)
+    if data_source == "Yahoo Finance (daily)":
+        price_provider = YahooDailyReplay(symbols)
+    elif data_source == "Local OHLCV":
+        from wasi_analyst.data.columnar import ColumnarReplay
+        fmt = "csv" if data_path.endswith(".csv") else "arrow" if data_path.endswith((".arrow", ".feather")) else "parquet"
+        price_provider = ColumnarReplay(data_path, symbols, fmt=fmt)
+    elif data_source == "Shared memory":
+        from wasi_analyst.data.shared import SharedReplay
+        price_provider = SharedReplay.attach(data_path)  # data_path = nombre del dataset publicado
+    else:
+        price_provider = RandomWalkProvider(seed=seed)
 
-    tick("Creando mercado y store…")
-    market = Market(cfg, price_provider=price_provider)
-    store = DuckDBStore("wasi.duckdb")
-    coord = Coordinator(cfg=cfg, market=market, store=store)
+    try:
+        # Caché de corridas (app/cache.py): misma config + datos + código => mismo resultado.
+        # Con profiling o journal se corre siempre: lo que se quiere son esos artefactos.
+        cache = key = None
+        fingerprint = getattr(price_provider, "fingerprint", None)
+        if use_cache and not profile and not journal_path and fingerprint is not None:
+            from wasi_analyst.app.cache import RunCache, run_key
+            from wasi_analyst.util.settings import get_llm_settings
+            extra = {"user_goal": user_goal}
+            if "llm" in (fundamental_mode, macro_mode, sentiment_mode):
+                st = get_llm_settings()
+                extra["llm"] = [st.backend, st.model, st.temperature, st.base_url, st.enabled]
+            cache = RunCache.from_env()
+            key = run_key(cfg, fingerprint(), **extra)
+            hit = cache.get(key)
+            if hit is not None:
+                hit["notes"].append(f"Run cache: hit ({key[:12]})")
+                report("Completado ✅ (desde caché)", 1.0)
+                return hit
 
-    def loop_report(day: int, phase: str):
-        report(f"Día {day+1}/{days} · {phase}", None)
+        tick("Creando mercado y store…")
+        market = Market(cfg, price_provider=price_provider)
+        store = DuckDBStore("wasi.duckdb")
+        coord = Coordinator(cfg=cfg, market=market, store=store)
 
-    tick("Ejecutando simulación…")
-    history_df, trades_df, notes, transcript = coord.run(
-        return_dataframes=True, user_goal=user_goal, loop_report=loop_report
-    )
+        def loop_report(day: int, phase: str):
+            report(f"Día {day+1}/{days} · {phase}", min(0.95, 0.1 + 0.85 * day / max(1, days)))
+
+        tick("Ejecutando simulación…")
+        history_df, trades_df, notes, transcript = coord.run(
+            return_dataframes=True, user_goal=user_goal, loop_report=loop_report
+        )
+    finally:
+        if hasattr(price_provider, "close"):
+            price_provider.close()  # suelta la referencia al dataset compartido, también si la corrida falla
 
     tick("Listo. Persistiendo…")
+    res = {"history": history_df, "trades": trades_df, "notes": notes, "transcript": transcript}
+    if cache is not None:
+        cache.put(key, res)
+        notes.append(f"Run cache: miss ({key[:12]}, guardado)")
+    else:
+        notes.append("Run cache: bypass")
     report("Completado ✅", 1.0)
-    return {"history": history_df, "trades": trades_df, "notes": notes, "transcript": transcript}
+    return res
@@ -0,0 +1,369 @@
+"""
+Sweeps distribuidos: un coordinador reparte unidades de trabajo por TCP y
+workers sin estado (en esta u otras máquinas) las corren y devuelven métricas.
+
+- Una unidad = kwargs de run_simulation (grilla x seeds sobre una base común).
+  Su id es el hash de esos kwargs: reenviar el mismo resultado no duplica nada.
+- Protocolo: una línea JSON por pedido y una por respuesta, una conexión por
+  pedido (los workers no mantienen sockets abiertos y sobreviven reinicios).
+      {"op": "pull", "worker": w}                     -> {"unit": {...}} | {"wait": s} | {"done": true}
+      {"op": "heartbeat", "worker": w, "unit": id}    -> {"ok": bool}  (false: la unidad ya no es suya)
+      {"op": "result", "worker": w, "unit": id, ...}  -> {"ok": true}
+- Leases: una unidad entregada vence si no llegan heartbeats en `lease`
+  segundos y vuelve a la cola (worker caído, red cortada). Tras `max_attempts`
+  entregas fallidas queda como fallida.
+- Resultados: una fila por unidad en la tabla `sweep_results` del DuckDBStore,
+  con upsert por (sweep_id, unit_id); al reiniciar el coordinador con el mismo
+  sweep, las unidades ya escritas no se vuelven a repartir.
+- Artefactos opcionales: con `--artifacts DIR` (compartido entre hosts) el
+  worker deja el resultado completo en Arrow IPC (app/results.py).
+
+Sin autenticación: pensado para una red de confianza (por defecto escucha en 127.0.0.1).
+
+Uso (una sola máquina, 4 workers locales):
+    python -m wasi_analyst.app.cli sweep serve --days 250 --symbols AAPL,MSFT --seeds 1,2,3 \\
+        --grid macro_mom_window=3,5,10 --local-workers 4
+Workers en otros hosts:
+    python -m wasi_analyst.app.cli sweep serve ... --host 0.0.0.0 --port 8766
+    python -m wasi_analyst.app.cli sweep worker --connect coordinador:8766
+"""
+from __future__ import annotations
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from wasi_analyst.util.logging import get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+TABLE = "sweep_results"
+METRIC_COLUMNS = ("final_equity", "period_return", "cagr", "sharpe", "max_drawdown", "trades", "fees")
+DEFAULT_PORT = 8766
+
+
+def unit_id(params: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def sweep_units(grid: Dict[str, List[Any]], seeds: Sequence[int], base: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Producto grilla x seeds sobre `base`; valida contra la firma de run_simulation."""
+    from wasi_analyst.app.jobs import validate_params
+    from wasi_analyst.app.walkforward import expand_grid
+    return [validate_params({**base, **combo, "seed": int(s)}) for combo in expand_grid(grid) for s in seeds]
+
+
+def parse_address(addr: str) -> Tuple[str, int]:
+    host, _, port = addr.rpartition(":")
+    return (host or "127.0.0.1", int(port) if port else DEFAULT_PORT)
+
+
+def _call(address: Tuple[str, int], msg: Dict[str, Any], timeout: float = 10.0) -> Dict[str, Any]:
+    with socket.create_connection(address, timeout=timeout) as sock:
+        sock.sendall(json.dumps(msg, default=str).encode() + b"\n")
+        line = sock.makefile("rb").readline()
+    if not line:
+        raise ConnectionError("respuesta vacía del coordinador")
+    return json.loads(line)
+
+
+# ---------- coordinador ----------
+
+class SweepServer:
+    """Cola de unidades con leases, reintentos y escritura idempotente de resultados."""
+
+    def __init__(self, units: List[Dict[str, Any]], db_path: str = "wasi.duckdb", sweep_id: Optional[str] = None,
+                 lease: float = 30.0, max_attempts: int = 3):
+        from wasi_analyst.util.store import DuckDBStore
+        self.units = {unit_id(p): p for p in units}
+        self.sweep_id = sweep_id or hashlib.sha1("".join(sorted(self.units)).encode()).hexdigest()[:12]
+        self.lease = float(lease)
+        self.max_attempts = int(max_attempts)
+        self.store = DuckDBStore(db_path)
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.failed: Dict[str, str] = {}
+        self.attempts: Dict[str, int] = {u: 0 for u in self.units}
+        self.leases: Dict[str, Tuple[str, float]] = {}     # unit -> (worker, vencimiento)
+        self.workers: Dict[str, float] = {}                # worker -> último contacto
+        self.requeued = 0
+        self._lock = threading.Lock()
+        self.finished = threading.Event()
+
+        # reanudación: lo que ya está en el store para este sweep no se reparte de nuevo
+        prev = self.store.read(TABLE)
+        if prev is not None and len(prev):
+            prev = prev[(prev["sweep_id"] == self.sweep_id) & prev["unit_id"].isin(list(self.units))]
+            self.rows = {r["unit_id"]: r for r in prev.to_dict("records")}
+        self.pending = deque(u for u in self.units if u not in self.rows)
+        if not self.pending:
+            self.finished.set()
+
+    # -- estado --
+
+    def _check_finished(self) -> None:
+        if not self.pending and not self.leases:
+            self.finished.set()
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Leases vencidos vuelven al frente de la cola (o quedan fallidos si agotaron los intentos)."""
+        now = time.monotonic() if now is None else now
+        n = 0
+        with self._lock:
+            for u, (worker, deadline) in list(self.leases.items()):
+                if deadline > now:
+                    continue
+                del self.leases[u]
+                n += 1
+                if self.attempts[u] >= self.max_attempts:
+                    self.failed[u] = f"lease vencido {self.attempts[u]} veces (último worker: {worker})"
+                else:
+                    self.pending.appendleft(u)
+                    self.requeued += 1
+                get_logger().warning("sweep_lease_expired", unit=u, worker=worker, attempts=self.attempts[u])
+            self._check_finished()
+        return n
+
+    # -- protocolo --
+
+    def handle(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        op, worker = msg.get("op"), str(msg.get("worker", "?"))
+        with self._lock:
+            self.workers[worker] = time.monotonic()
+        if op == "pull":
+            return self._pull(worker)
+        if op == "heartbeat":
+            with self._lock:
+                u = msg.get("unit")
+                if self.leases.get(u, (None,))[0] != worker:
+                    return {"ok": False}
+                self.leases[u] = (worker, time.monotonic() + self.lease)
+            return {"ok": True}
+        if op == "result":
+            return self._result(worker, msg)
+        return {"error": f"op desconocida: {op!r}"}
+
+    def _pull(self, worker: str) -> Dict[str, Any]:
+        with self._lock:
+            if self.pending:
+                u = self.pending.popleft()
+                self.attempts[u] += 1
+                self.leases[u] = (worker, time.monotonic() + self.lease)
+                return {"unit": {"id": u, "sweep_id": self.sweep_id, "params": self.units[u],
+                                 "attempt": self.attempts[u]}}
+            if self.leases:
+                return {"wait": min(1.0, self.lease / 4)}
+            return {"done": True}
+
+    def _result(self, worker: str, msg: Dict[str, Any]) -> Dict[str, Any]:
+        u = msg.get("unit")
+        if u not in self.units:
+            return {"ok": False, "error": "unidad desconocida"}
+        with self._lock:
+            if u in self.rows:
+                return {"ok": True, "duplicate": True}   # ya escrita (reintento o worker tardío)
+            if self.leases.get(u, (None,))[0] == worker:
+                del self.leases[u]
+            if msg.get("error"):
+                # si otra entrega de la unidad sigue viva, decide esa
+                if u not in self.leases and u not in self.pending:
+                    if self.attempts[u] >= self.max_attempts:
+                        self.failed[u] = msg["error"]
+                    else:
+                        self.pending.append(u)
+                        self.requeued += 1
+                self._check_finished()
+                get_logger().warning("sweep_unit_failed", unit=u, worker=worker, attempts=self.attempts[u])
+                return {"ok": True}
+            row = {
+                "sweep_id": self.sweep_id, "unit_id": u,
+                "params": json.dumps(self.units[u], sort_keys=True, default=str),
+                "worker": worker, "attempt": self.attempts[u], "seconds": float(msg.get("seconds", 0.0)),
+                **{k: float(msg.get("metrics", {}).get(k, float("nan"))) for k in METRIC_COLUMNS},
+                "artifact": str(msg.get("artifact") or ""), "finished": time.time(),
+            }
+            self.rows[u] = row
+            # otra entrega de la misma unidad (lease vencido) ya no hace falta
+            self.leases.pop(u, None)
+            if u in self.pending:
+                self.pending.remove(u)
+            self._write(row)
+            self._check_finished()
+        return {"ok": True}
+
+    def _write(self, row: Dict[str, Any]) -> None:
+        import pandas as pd
+        try:
+            self.store.upsert(TABLE, pd.DataFrame([row]), keys=("sweep_id", "unit_id"))
+        except Exception as e:
+            # el resultado queda en memoria (results()); el store es best-effort como en el resto
+            get_logger().warning("duckdb_write_failed", error=str(e), table=TABLE)
+
+    def results(self) -> pd.DataFrame:
+        """Una fila por unidad terminada, con los parámetros como columnas."""
+        import pandas as pd
+        rows = [{**json.loads(r["params"]), **r} for r in self.rows.values()]
+        return pd.DataFrame(rows).drop(columns=["params"]) if rows else pd.DataFrame(columns=["unit_id", *METRIC_COLUMNS])
+
+    def summary(self) -> List[str]:
+        return [
+            f"Sweep {self.sweep_id}: {len(self.rows)}/{len(self.units)} unidades, {len(self.failed)} fallidas, "
+            f"{self.requeued} reencoladas, {len(self.workers)} workers",
+            *(f"Fallida {u}: {err.strip().splitlines()[-1] if err.strip() else err}" for u, err in self.failed.items()),
+        ]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                out = self.server.sweep.handle(json.loads(line))
+            except Exception as e:
+                out = {"error": str(e)}
+            self.wfile.write(json.dumps(out, default=str).encode() + b"\n")
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_sweep(units: List[Dict[str, Any]], host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                db_path: str = "wasi.duckdb", sweep_id: Optional[str] = None, lease: float = 30.0,
+                max_attempts: int = 3, local_workers: int = 0, artifacts: Optional[str] = None,
+                on_progress=None) -> SweepServer:
+    """Sirve las unidades hasta que todas terminan (o fallan); opcionalmente lanza workers locales."""
+    sweep = SweepServer(units, db_path, sweep_id, lease, max_attempts)
+    httpd = _TCPServer((host, port), _Handler)
+    httpd.sweep = sweep
+    address = (host if host != "0.0.0.0" else "127.0.0.1", httpd.server_address[1])
+    threading.Thread(target=httpd.serve_forever, name="wasi-sweep", daemon=True).start()
+    get_logger().info("sweep_server_started", address=f"{host}:{address[1]}", sweep=sweep.sweep_id,
+                      units=len(sweep.units), pending=len(sweep.pending))
+
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=run_worker, args=(f"{address[0]}:{address[1]}",),
+                         kwargs={"worker_id": f"local-{i}", "artifacts": artifacts,
+                                 "heartbeat": max(0.5, lease / 6)}, daemon=True)
+             for i in range(int(local_workers))]
+    for p in procs:
+        p.start()
+    try:
+        done = -1
+        while not sweep.finished.wait(min(1.0, lease / 4)):
+            sweep.reap()
+            if on_progress is not None and len(sweep.rows) != done:
+                done = len(sweep.rows)
+                on_progress(done, len(sweep.units))
+        # los workers locales reciben "done" en su próximo pull
+        for p in procs:
+            p.join(timeout=max(5.0, lease))
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        sweep.store.close()
+    return sweep
+
+
+# ---------- worker ----------
+
+class _LeaseLost(Exception):
+    pass
+
+
+def _metrics(res: Dict[str, Any]) -> Dict[str, float]:
+    from wasi_analyst.util.metrics import equity_metrics
+    hist, trades = res["history"], res["trades"]
+    eq = hist["equity"]
+    return {"final_equity": float(eq.iloc[-1]) if len(eq) else float("nan"),
+            **equity_metrics(eq), "trades": float(len(trades)),
+            "fees": float(hist["fees"].iloc[-1]) if "fees" in hist and len(hist) else 0.0}
+
+
+def run_worker(connect: str, worker_id: Optional[str] = None, artifacts: Optional[str] = None,
+               heartbeat: float = 5.0, workdir: Optional[str] = None, connect_retries: int = 10) -> int:
+    """
+    Pide unidades hasta que el coordinador responde "done"; devuelve cuántas corrió.
+    Corre en `workdir` (default: un directorio temporal) para que los artefactos
+    locales de cada corrida (wasi.duckdb, artifacts/) no choquen entre workers.
+    """
+    from wasi_analyst.app.run import run_simulation
+
+    address = parse_address(connect)
+    worker = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    if artifacts:
+        artifacts = os.path.abspath(artifacts)
+    os.chdir(workdir or tempfile.mkdtemp(prefix="wasi-worker-"))
+    log = get_logger()
+
+    def call(msg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # el coordinador puede estar reiniciando: reintentos con backoff acotado
+        for i in range(connect_retries):
+            try:
+                return _call(address, {**msg, "worker": worker})
+            except OSError:
+                time.sleep(min(5.0, 0.2 * 2 ** i))
+        return None
+
+    ran = 0
+    while True:
+        resp = call({"op": "pull"})
+        if resp is None or resp.get("done"):
+            break
+        if "unit" not in resp:
+            time.sleep(float(resp.get("wait", 1.0)))
+            continue
+        unit = resp["unit"]
+        lost = threading.Event()
+        stop = threading.Event()
+
+        def beat(u=unit["id"]):
+            while not stop.wait(heartbeat):
+                try:
+                    if not _call(address, {"op": "heartbeat", "worker": worker, "unit": u}).get("ok"):
+                        lost.set()
+                        return
+                except OSError:
+                    pass   # un heartbeat perdido no corta la corrida: decide el lease
+
+        def report(msg: str, p: Optional[float] = None) -> None:
+            if lost.is_set():
+                raise _LeaseLost(unit["id"])
+
+        hb = threading.Thread(target=beat, name="wasi-sweep-heartbeat", daemon=True)
+        hb.start()
+        t0 = time.perf_counter()
+        out: Dict[str, Any] = {"op": "result", "unit": unit["id"]}
+        try:
+            res = run_simulation(**unit["params"], report=report)
+            out["metrics"] = _metrics(res)
+            if artifacts:
+                from wasi_analyst.app.results import write_result
+                path = os.path.join(artifacts, unit["sweep_id"], unit["id"])
+                write_result(res, path, unit_id=unit["id"], params=unit["params"])
+                out["artifact"] = path
+        except _LeaseLost:
+            log.warning("sweep_lease_lost", unit=unit["id"], worker=worker)
+            continue
+        except Exception:
+            out["error"] = traceback.format_exc()
+        finally:
+            stop.set()
+            hb.join()
+        out["seconds"] = time.perf_counter() - t0
+        if call(out) is None:
+            break
+        ran += 1
+    log.info("sweep_worker_exit", worker=worker, units=ran)
+    return ran
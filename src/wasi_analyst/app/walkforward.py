@@ -0,0 +1,172 @@
+"""
+Walk-forward de los parámetros de las reglas.
+
+La historia se parte en ventanas rodantes in-sample (IS) / out-of-sample (OOS).
+En cada ventana se elige la config de la grilla con mejor métrica IS y se toma
+su desempeño en el OOS siguiente; los tramos OOS se encadenan en una sola curva.
+
+Reutilización: cada config de la grilla se simula UNA vez sobre toda la historia
+(en paralelo, con la caché de corridas de app/cache.py) y las métricas de
+cualquier ventana salen de recortar esa curva de equity. Ventanas superpuestas
+no vuelven a simular nada y una grilla de G configs cuesta G corridas, no
+G x ventanas. Los precios se publican una sola vez en el plano de datos
+compartido (data/shared.py) y los workers los leen sin copiarlos; las features
+de todas las ventanas de la grilla se precalculan antes en un único cubo
+(data/features.py) que cada corrida indexa.
+
+Nota: el tramo OOS es el de la corrida continua de la config elegida (con las
+posiciones que traía), no una corrida que arranca de cero en cada ventana.
+
+Uso:
+    python -m wasi_analyst.app.cli walkforward --days 750 --is-days 250 --oos-days 50 \\
+        --grid macro_mom_window=3,5,10 --grid fundamental_base_thresh=0.001,0.002,0.004
+"""
+from __future__ import annotations
+import itertools
+import multiprocessing as mp
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wasi_analyst.util import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+METRICS = ("sharpe", "return")
+
+
+@dataclass
+class WalkForwardResult:
+    windows: pd.DataFrame                  # una fila por ventana: rangos, params elegidos, métricas
+    oos_equity: pd.Series                  # curva OOS encadenada (arranca en cash0)
+    curves: pd.DataFrame                   # equity de cada config sobre toda la historia
+    configs: List[Dict[str, Any]] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    keys = sorted(grid)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+
+def make_windows(n_days: int, is_days: int, oos_days: int, step: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """(is_start, oos_start, oos_end) con oos_end exclusivo; el último OOS puede quedar corto."""
+    step = step or oos_days
+    out = []
+    a = 0
+    while a + is_days < n_days:
+        b = a + is_days
+        out.append((a, b, min(n_days, b + oos_days)))
+        a += step
+    return out
+
+
+def _score(equity: np.ndarray, lo: int, hi: int, metric: str) -> float:
+    """Métrica de la ventana [lo, hi) tomando como base el cierre del día anterior."""
+    import pandas as pd
+    seg = pd.Series(equity[max(0, lo - 1):hi])
+    val = metrics.sharpe(seg) if metric == "sharpe" else metrics.period_return(seg)
+    return float("-inf") if np.isnan(val) else val
+
+
+def _full_run(base: Dict[str, Any], params: Dict[str, Any]) -> np.ndarray:
+    from wasi_analyst.app.run import absolute_params, run_simulation, workdir
+    # directorio propio por corrida: los workers escriben artifacts/ y wasi.duckdb a la vez
+    tmp = tempfile.mkdtemp(prefix="wasi-wf-")
+    try:
+        with workdir(tmp):
+            res = run_simulation(**absolute_params(base), **params)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return res["history"]["equity"].to_numpy(dtype=float)
+
+
+def walk_forward(
+    symbols: List[str],
+    grid: Dict[str, List[Any]],
+    days: int,
+    is_days: int,
+    oos_days: int,
+    seed: int = 123,
+    step: Optional[int] = None,
+    metric: str = "sharpe",
+    provider=None,
+    workers: int = 4,
+    use_cache: bool = True,
+    base_params: Optional[Dict[str, Any]] = None,
+) -> WalkForwardResult:
+    """
+    `provider` es cualquier PriceProvider con fingerprint() (default: RandomWalkProvider(seed)).
+    `base_params` son kwargs fijos de run_simulation (modos, tuning no optimizado, etc.).
+    """
+    import pandas as pd
+    from wasi_analyst.data.providers import RandomWalkProvider
+    from wasi_analyst.data.features import FeatureCube, feature_windows
+    from wasi_analyst.data.shared import SharedReplay, publish_provider
+    from wasi_analyst.util.config import WasiConfig
+
+    if metric not in METRICS:
+        raise ValueError(f"métrica desconocida: {metric!r} (opciones: {METRICS})")
+    windows = make_windows(days, is_days, oos_days, step)
+    if not windows:
+        raise ValueError("no entra ninguna ventana: days debe ser mayor que is_days")
+    fixed = {"days", "symbols", "seed", "data_source", "data_path", "use_cache", *(base_params or {})} & set(grid)
+    if fixed:
+        raise ValueError(f"la grilla no puede variar parámetros fijos de la corrida: {sorted(fixed)}")
+    configs = expand_grid(grid)
+    cash0 = WasiConfig().cash0
+
+    provider = provider or RandomWalkProvider(seed=seed)
+    data = publish_provider(provider, symbols, days)
+    try:
+        # cubo con la unión de ventanas de la grilla: las corridas solo lo indexan
+        wins = set()
+        for c in configs:
+            fields = {k: v for k, v in {**(base_params or {}), **c}.items() if k in WasiConfig.model_fields}
+            wins |= set(feature_windows(WasiConfig(**fields)).values())
+        FeatureCube.ensure(data["close"], SharedReplay(data).fingerprint(), data.symbols, wins)
+        base = {"days": days, "symbols": symbols, "seed": seed, "data_source": "Shared memory",
+                "data_path": data.name, "use_cache": use_cache, **(base_params or {})}
+        # una corrida por config sobre toda la historia (las ventanas solo recortan)
+        if workers > 1 and len(configs) > 1:
+            with ProcessPoolExecutor(min(workers, len(configs)), mp_context=mp.get_context("spawn")) as pool:
+                curves = list(pool.map(_full_run, [base] * len(configs), configs))
+        else:
+            curves = [_full_run(base, c) for c in configs]
+    finally:
+        data.close()
+
+    eq = np.vstack(curves)                   # configs x días
+    rows = []
+    oos = [cash0]
+    for a, b, e in windows:
+        scores = [_score(eq[k], a, b, metric) for k in range(len(configs))]
+        best = int(np.argmax(scores))
+        # retornos diarios OOS de la config elegida, encadenados a la curva acumulada
+        seg = eq[best, b - 1:e]
+        rets = seg[1:] / seg[:-1]
+        start = oos[-1]
+        oos.extend((start * np.cumprod(rets)).tolist())
+        rows.append({
+            "is_start": a, "is_end": b, "oos_start": b, "oos_end": e,
+            **{f"best_{k}": v for k, v in configs[best].items()},
+            "is_score": scores[best],
+            "oos_score": _score(eq[best], b, e, metric),
+            "oos_return": float(oos[-1] / start - 1.0),
+        })
+
+    windows_df = pd.DataFrame(rows)
+    oos_equity = pd.Series(oos, index=range(windows[0][1] - 1, windows[0][1] - 1 + len(oos)), name="oos_equity")
+    curves_df = pd.DataFrame(eq.T, columns=[",".join(f"{k}={v}" for k, v in c.items()) for c in configs])
+    m = metrics.equity_metrics(oos_equity)
+    notes = [
+        f"Walk-forward: {len(windows)} ventanas IS={is_days} / OOS={oos_days}, {len(configs)} configs "
+        f"({len(configs)} corridas completas en lugar de {len(configs) * len(windows)})",
+        f"OOS encadenado: retorno={m['period_return']:.2%}, sharpe={m['sharpe']:.2f}, maxDD={m['max_drawdown']:.2%}",
+    ]
+    return WalkForwardResult(windows_df, oos_equity, curves_df, configs, notes)
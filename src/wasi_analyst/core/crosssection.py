@@ -0,0 +1,123 @@
+from __future__ import annotations
+from typing import Dict, List
+
+import numpy as np
+
+# Features cross-section y covarianza incremental del universo.
+#
+# La covarianza de retornos diarios es EWMA de media cero (estilo RiskMetrics):
+#     C <- lam * C + (1 - lam) * r r'
+# una actualización de rango uno O(S^2) por día, sin recalcular la matriz desde
+# el historial. De ahí salen correlaciones, beta contra el mercado equiponderado
+# y la exposición ajustada por correlación que usa el RiskManager.
+# Ranks y z-scores comparan cada símbolo contra el resto del universo en el día.
+
+
+def cs_rank(x: np.ndarray) -> np.ndarray:
+    """Rank percentil en [0, 1] dentro del día (empates promediados; 0.5 si hay un solo símbolo)."""
+    n = len(x)
+    if n <= 1:
+        return np.full(n, 0.5)
+    order = np.argsort(x, kind="stable")
+    ranks = np.empty(n)
+    ranks[order] = np.arange(n, dtype=float)
+    _, inv, counts = np.unique(x, return_inverse=True, return_counts=True)
+    if len(counts) < n:  # empates: rank promedio del grupo
+        ranks = (np.bincount(inv, weights=ranks) / counts)[inv]
+    return ranks / (n - 1)
+
+
+def cs_zscore(x: np.ndarray) -> np.ndarray:
+    """(x - media) / desvío dentro del día; 0 si no hay dispersión."""
+    sd = x.std()
+    return (x - x.mean()) / sd if sd > 0 else np.zeros_like(x)
+
+
+def corr_exposure(x: np.ndarray, rho: np.ndarray) -> float:
+    """sqrt(x' rho x) para notionales `x`: igual al gross si todo está correlacionado 1, menor si diversifica."""
+    return float(np.sqrt(max(0.0, x @ rho @ x)))
+
+
+def max_corr_add(x: np.ndarray, rho: np.ndarray, i: int, limit: float) -> float:
+    """
+    Máximo notional a agregar en el símbolo i sin que corr_exposure pase `limit`:
+    la mayor raíz de q^2 + 2 q (rho x)_i + x' rho x - limit^2 = 0 (rho_ii = 1).
+    """
+    b = float(rho[i] @ x)
+    c = float(x @ rho @ x) - limit * limit
+    disc = b * b - c
+    if disc < 0:
+        return 0.0
+    return max(0.0, -b + np.sqrt(disc))
+
+
+class EWMACovariance:
+    def __init__(self, n: int, halflife: float = 20.0):
+        self.lam = 0.5 ** (1.0 / float(halflife))
+        self.cov = np.zeros((n, n))
+        self.count = 0
+
+    def update(self, r: np.ndarray) -> None:
+        r = np.where(np.isfinite(r), r, 0.0)
+        self.cov *= self.lam
+        self.cov += np.outer((1.0 - self.lam) * r, r)
+        self.count += 1
+
+    def matrix(self) -> np.ndarray:
+        """Covarianza con corrección de sesgo por el arranque en cero."""
+        if self.count == 0:
+            return self.cov.copy()
+        return self.cov / (1.0 - self.lam ** self.count)
+
+    def corr(self) -> np.ndarray:
+        c = self.matrix()
+        sd = np.sqrt(np.diag(c))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rho = c / np.outer(sd, sd)
+        ok = sd > 0
+        rho = np.where(np.outer(ok, ok), rho, 0.0)
+        np.fill_diagonal(rho, 1.0)
+        return np.clip(rho, -1.0, 1.0)
+
+    def beta(self) -> np.ndarray:
+        """Beta de cada símbolo contra el retorno equiponderado del universo (1 sin datos)."""
+        c = self.matrix()
+        n = len(c)
+        cm = c.sum(axis=1) / n            # cov(r_i, r_m) con r_m = media
+        vm = cm.sum() / n                 # var(r_m)
+        return cm / vm if vm > 0 else np.ones(n)
+
+
+class CrossSection:
+    """Estado cross-section de una corrida: retornos diarios -> covarianza EWMA + features del día."""
+
+    def __init__(self, symbols: List[str], halflife: float = 20.0):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.cov = EWMACovariance(len(self.symbols), halflife)
+        self._prev: np.ndarray | None = None
+
+    def update(self, prices: np.ndarray) -> None:
+        prices = np.asarray(prices, dtype=float)
+        if self._prev is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.cov.update(np.where(self._prev > 0, prices / self._prev - 1.0, np.nan))
+        self._prev = prices.copy()
+
+    def corr(self) -> np.ndarray:
+        return self.cov.corr()
+
+    def features(self, feats: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Ranks/z-scores de momentum y desvío vs SMA, beta y correlación media con el resto."""
+        p, sma = feats["price"], feats["sma"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dev = np.where(sma > 0, p / sma - 1.0, 0.0)
+        mom = np.nan_to_num(feats["mom"])
+        n = len(p)
+        rho = self.corr()
+        avg_corr = (rho.sum(axis=1) - 1.0) / (n - 1) if n > 1 else np.zeros(n)
+        return {
+            "mom_rank": cs_rank(mom), "mom_z": cs_zscore(mom),
+            "dev_rank": cs_rank(dev), "dev_z": cs_zscore(dev),
+            "beta": self.cov.beta(), "avg_corr": avg_corr,
+        }
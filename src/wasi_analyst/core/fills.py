@@ -0,0 +1,101 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import numpy as np
+
+from wasi_analyst.util.config import WasiConfig
+
+# Modelos de ejecución contra el LP virtual.
+#
+# Cada modelo precalcula sus coeficientes por instrumento en `prepare()` (una
+# sola vez, al crear el Market) y después `fill()` opera vectorizado sobre todas
+# las órdenes del batch:
+#   - idx:   índice del instrumento de cada orden
+#   - sign:  +1 buy / -1 sell
+#   - qty:   cantidad (>0)
+#   - last:  precio de referencia del instrumento (pre-batch) para cada orden
+# Devuelve (precio de fill, impacto permanente fraccional con signo) por orden.
+
+
+class FillModel:
+    name = "base"
+
+    def prepare(self, cfg: WasiConfig, symbols: List[str]) -> None:
+        self.n = len(symbols)
+
+    def fill(
+        self, idx: np.ndarray, sign: np.ndarray, qty: np.ndarray, last: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+
+class FixedBpsFill(FillModel):
+    """Slippage fijo en bps (comportamiento histórico de Market.place)."""
+    name = "fixed_bps"
+
+    def prepare(self, cfg: WasiConfig, symbols: List[str]) -> None:
+        super().prepare(cfg, symbols)
+        self.slip = np.full(self.n, float(cfg.slippage_bps) / 10_000.0)
+
+    def fill(self, idx, sign, qty, last):
+        move = sign * self.slip[idx]
+        # el fill desplaza el precio hasta el precio ejecutado
+        return last * (1.0 + move), move
+
+
+def _adv(cfg: WasiConfig, symbols: List[str]) -> np.ndarray:
+    adv = np.array([float(cfg.adv_by_symbol.get(s, cfg.adv_shares)) for s in symbols], dtype=float)
+    return np.maximum(adv, 1.0)
+
+
+class SqrtImpactFill(FillModel):
+    """
+    Impacto raíz cuadrada: slip + coef * sqrt(qty / ADV).
+    El impacto es temporal: el precio post-batch no se mueve por el fill.
+    """
+    name = "sqrt"
+
+    def prepare(self, cfg: WasiConfig, symbols: List[str]) -> None:
+        super().prepare(cfg, symbols)
+        self.slip = np.full(self.n, float(cfg.slippage_bps) / 10_000.0)
+        self.k = float(cfg.impact_coef) / np.sqrt(_adv(cfg, symbols))
+
+    def fill(self, idx, sign, qty, last):
+        impact = self.slip[idx] + self.k[idx] * np.sqrt(qty)
+        return last * (1.0 + sign * impact), np.zeros_like(last)
+
+
+class LinearImpactFill(FillModel):
+    """
+    Impacto lineal temporal + permanente (estilo Almgren-Chriss):
+      - temporal:   slip + temp_coef * qty / ADV  (solo afecta el fill)
+      - permanente: perm_coef * qty / ADV          (mueve el precio post-batch)
+    """
+    name = "linear"
+
+    def prepare(self, cfg: WasiConfig, symbols: List[str]) -> None:
+        super().prepare(cfg, symbols)
+        adv = _adv(cfg, symbols)
+        self.slip = np.full(self.n, float(cfg.slippage_bps) / 10_000.0)
+        self.temp = float(cfg.linear_temp_impact) / adv
+        self.perm = float(cfg.linear_perm_impact) / adv
+
+    def fill(self, idx, sign, qty, last):
+        perm = sign * self.perm[idx] * qty
+        temp = sign * (self.slip[idx] + self.temp[idx] * qty)
+        return last * (1.0 + temp + perm), perm
+
+
+FILL_MODELS: Dict[str, type] = {
+    FixedBpsFill.name: FixedBpsFill,
+    SqrtImpactFill.name: SqrtImpactFill,
+    LinearImpactFill.name: LinearImpactFill,
+}
+
+
+def make_fill_model(cfg: WasiConfig, symbols: List[str]) -> FillModel:
+    try:
+        model = FILL_MODELS[cfg.fill_model]()
+    except KeyError:
+        raise ValueError(f"fill_model desconocido: {cfg.fill_model!r} (opciones: {sorted(FILL_MODELS)})")
+    model.prepare(cfg, symbols)
+    return model
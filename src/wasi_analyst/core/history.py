@@ -0,0 +1,41 @@
+from __future__ import annotations
+import numpy as np
+
+from wasi_analyst.util.config import WasiConfig
+
+# Historial de precios acotado: un ring 2-D (capacidad x símbolos) para todo el
+# universo. Solo guarda lo que necesitan las ventanas de features; el historial
+# largo de la corrida lo da Coordinator.price_history() (y al final va al store).
+
+
+def ring_capacity(cfg: WasiConfig) -> int:
+    """Capacidad mínima para que las features den lo mismo que con historial completo."""
+    return max(
+        max(1, cfg.fundamental_sma_window),
+        max(1, cfg.macro_mom_window),
+        max(2, cfg.sentiment_break_window),
+    ) + 1
+
+
+class PriceRing:
+    def __init__(self, n_symbols: int, capacity: int):
+        self.capacity = int(capacity)
+        self.buf = np.empty((self.capacity, n_symbols))
+        self.head = 0      # próxima fila a escribir
+        self.count = 0     # filas válidas (<= capacity)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, row: np.ndarray) -> None:
+        self.buf[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def window(self, k: int | None = None) -> np.ndarray:
+        """Últimas min(k, count) filas en orden cronológico (copia)."""
+        k = self.count if k is None else min(int(k), self.count)
+        start = (self.head - k) % self.capacity
+        if start + k <= self.capacity:
+            return self.buf[start:start + k].copy()
+        return np.concatenate((self.buf[start:], self.buf[:self.head]))
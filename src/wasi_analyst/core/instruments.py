@@ -0,0 +1,110 @@
+from __future__ import annotations
+from typing import Dict, Iterator, List, MutableMapping, Mapping, Set
+import numpy as np
+
+from .orderbook import Book
+
+# Tabla de instrumentos en formato struct-of-arrays: una fila por símbolo y
+# columnas contiguas en NumPy. Los snapshots y el mark-to-market son operaciones
+# de array; las vistas tipo dict existen solo por compatibilidad.
+
+
+class InstrumentTable:
+    def __init__(self, symbols: List[str], start_price: float):
+        self.symbols: List[str] = list(dict.fromkeys(symbols))  # únicos, mantiene orden
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.price = np.full(n, float(start_price))       # último precio
+        self.prev_close = self.price.copy()                # precio al cierre anterior
+        self.volume = np.zeros(n)                          # volumen operado en el día
+        self.position = np.zeros(n, dtype=np.int64)        # posición del portfolio operador
+        self.books: List[Book] = [Book(symbol=s) for s in self.symbols]
+        # libros potencialmente con órdenes (se marcan al accederlos vía la vista)
+        self.touched: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def roll(self, new_prices: np.ndarray) -> None:
+        """Cierra el día: prev_close <- price, price <- new_prices, volumen a cero."""
+        self.prev_close[:] = self.price
+        self.price[:] = new_prices
+        self.volume[:] = 0.0
+
+    def mark_to_market(self, prices: np.ndarray | None = None) -> float:
+        px = self.price if prices is None else prices
+        return float(self.position @ px)
+
+    def view(self) -> "InstrumentsView":
+        return InstrumentsView(self)
+
+    def positions_view(self) -> "PositionsView":
+        return PositionsView(self)
+
+
+class Instrument:
+    """Fila de la tabla (proxy liviano; lee y escribe sobre los arrays)."""
+    __slots__ = ("_t", "_i")
+
+    def __init__(self, table: InstrumentTable, i: int):
+        self._t = table
+        self._i = i
+
+    @property
+    def symbol(self) -> str:
+        return self._t.symbols[self._i]
+
+    @property
+    def price(self) -> float:
+        return float(self._t.price[self._i])
+
+    @price.setter
+    def price(self, v: float) -> None:
+        self._t.price[self._i] = v
+
+    @property
+    def book(self) -> Book:
+        self._t.touched.add(self._i)
+        return self._t.books[self._i]
+
+    def __repr__(self) -> str:
+        return f"Instrument(symbol={self.symbol!r}, price={self.price!r})"
+
+
+class InstrumentsView(Mapping):
+    """Vista dict-like {símbolo: Instrument} sobre la tabla."""
+
+    def __init__(self, table: InstrumentTable):
+        self._t = table
+        self._rows = [Instrument(table, i) for i in range(len(table))]
+
+    def __getitem__(self, sym: str) -> Instrument:
+        return self._rows[self._t.index[sym]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._t.symbols)
+
+    def __len__(self) -> int:
+        return len(self._t)
+
+
+class PositionsView(MutableMapping):
+    """Vista dict-like {símbolo: qty} sobre la columna de posiciones."""
+
+    def __init__(self, table: InstrumentTable):
+        self._t = table
+
+    def __getitem__(self, sym: str) -> int:
+        return int(self._t.position[self._t.index[sym]])
+
+    def __setitem__(self, sym: str, qty: int) -> None:
+        self._t.position[self._t.index[sym]] = qty
+
+    def __delitem__(self, sym: str) -> None:
+        raise TypeError("las posiciones de la tabla no se pueden borrar")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._t.symbols)
+
+    def __len__(self) -> int:
+        return len(self._t)
@@ -0,0 +1,322 @@
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .market import FillBatch
+    from .orderbook import Order
+
+# Journal binario append-only de una corrida.
+#
+# Cabecera MAGIC y después registros length-prefixed:
+#     u32 largo | u32 tipo | i32 día | u32 n | payload (columnas, padding a 8 bytes)
+# Un registro por tipo y por día con las columnas como arrays NumPy crudos
+# (float64 primero, después enteros): escribir es un tobytes() al buffer del
+# archivo y leer es np.frombuffer sobre el mmap, sin parsear.
+#
+#     header   JSON: símbolos, agentes, config
+#     prices   snapshot del día (float64[S])
+#     credit   crédito de atribución por (agente, símbolo) (float64[A*S])
+#     risk     por acción fusionada: pedido vs. final del RiskManager + notas
+#     orders   órdenes del ExecutionAgent
+#     fills    fills del día (LP y libro), con agentes codificados
+#     name     alta de un código de agente nuevo (n = código, payload = nombre)
+#     end      equity del día según la corrida (control para el replay)
+#
+# replay() reconstruye history/trades/órdenes con el mismo Ledger, sin agentes.
+
+MAGIC = b"WASIJRN1"
+_HDR = struct.Struct("<IIiI")   # largo del cuerpo, tipo, día, n
+KINDS = ("header", "prices", "credit", "risk", "orders", "fills", "name", "end")
+_KIND = {k: i for i, k in enumerate(KINDS)}
+_ACTION = {"hold": 0, "buy": 1, "sell": 2}
+_ACTION_NAMES = ("hold", "buy", "sell")
+_SEP = "\x1f"
+
+
+def _pad(b: bytes) -> bytes:
+    return b + b"\0" * (-len(b) % 8)
+
+
+class Journal:
+    def __init__(self, path: str, symbols: Sequence[str], agents: Sequence[str] = (),
+                 buffering: int = 1 << 20, **meta: Any):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.symbols = list(symbols)
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+        self._codes: Dict[str, int] = {}
+        self._fh = open(path, "wb", buffering=buffering)
+        self._fh.write(MAGIC)
+        self.records = 0
+        self._write("header", -1, 0, json.dumps({"symbols": self.symbols, "agents": list(agents), **meta}, default=str).encode())
+        for a in ("lp", *agents):
+            self._code(a)
+
+    # ---------- escritura ----------
+
+    def _write(self, kind: str, day: int, n: int, *parts: bytes) -> None:
+        body = _pad(b"".join(parts))
+        self._fh.write(_HDR.pack(len(body), _KIND[kind], day, n))
+        self._fh.write(body)
+        self.records += 1
+
+    def _code(self, agent: str) -> int:
+        c = self._codes.get(agent)
+        if c is None:
+            c = self._codes[agent] = len(self._codes)
+            self._write("name", -1, c, agent.encode())
+        return c
+
+    def _codes_of(self, agents: np.ndarray) -> np.ndarray:
+        return np.fromiter((self._code(str(a)) for a in agents), dtype=np.int16, count=len(agents))
+
+    def prices(self, day: int, px: np.ndarray) -> None:
+        self._write("prices", day, len(px), np.asarray(px, dtype=np.float64).tobytes())
+
+    def credit(self, day: int, credit: np.ndarray) -> None:
+        self._write("credit", day, credit.shape[0], np.asarray(credit, dtype=np.float64).tobytes())
+
+    def risk(self, day: int, merged: List[Dict], gated: List[Dict]) -> None:
+        n = len(gated)
+        req = np.fromiter((float(a.get("qty", 0) or 0) for a in merged), dtype=np.float64, count=n)
+        fin = np.fromiter((float(g.get("qty", 0) or 0) for g in gated), dtype=np.float64, count=n)
+        idx = np.fromiter((self._index.get(g["symbol"], -1) for g in gated), dtype=np.int32, count=n)
+        act = np.fromiter((_ACTION.get(g.get("action"), 0) for g in gated), dtype=np.int8, count=n)
+        notes = _SEP.join(g.get("risk_note") or "" for g in gated).encode()
+        self._write("risk", day, n, req.tobytes(), fin.tobytes(), idx.tobytes(), act.tobytes(), notes)
+
+    def orders(self, day: int, orders: List[Order]) -> None:
+        n = len(orders)
+        qty = np.fromiter((o.qty for o in orders), dtype=np.float64, count=n)
+        lim = np.fromiter((np.nan if o.price is None else o.price for o in orders), dtype=np.float64, count=n)
+        idx = np.fromiter((self._index.get(o.symbol, -1) for o in orders), dtype=np.int32, count=n)
+        agent = np.fromiter((self._code(o.agent_id) for o in orders), dtype=np.int16, count=n)
+        side = np.fromiter((_ACTION[o.side] for o in orders), dtype=np.int8, count=n)
+        self._write("orders", day, n, qty.tobytes(), lim.tobytes(), idx.tobytes(), agent.tobytes(), side.tobytes())
+
+    def fills(self, day: int, fills: FillBatch) -> None:
+        n = len(fills)
+        self._write("fills", day, n,
+                    np.asarray(fills.price, dtype=np.float64).tobytes(), np.asarray(fills.qty, dtype=np.float64).tobytes(),
+                    np.asarray(fills.idx, dtype=np.int32).tobytes(),
+                    self._codes_of(fills.buy_agent).tobytes(), self._codes_of(fills.sell_agent).tobytes())
+
+    def end(self, day: int, equity: float) -> None:
+        self._write("end", day, 1, struct.pack("<d", equity))
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ---------- lectura ----------
+
+def _decode(kind: str, n: int, mm: mmap.mmap, start: int, end: int, S: int) -> Dict[str, Any]:
+    def take(off: int, dtype, count: int) -> Tuple[np.ndarray, int]:
+        a = np.frombuffer(mm, dtype=dtype, count=count, offset=start + off)
+        return a, off + a.nbytes
+
+    if kind == "prices":
+        return {"price": take(0, np.float64, n)[0]}
+    if kind == "credit":
+        return {"credit": take(0, np.float64, n * S)[0].reshape(n, S)}
+    if kind == "end":
+        return {"equity": float(take(0, np.float64, 1)[0][0])}
+    if kind == "risk":
+        req, o = take(0, np.float64, n)
+        fin, o = take(o, np.float64, n)
+        idx, o = take(o, np.int32, n)
+        act, o = take(o, np.int8, n)
+        notes = mm[start + o:end].rstrip(b"\0").decode().split(_SEP) if n else []
+        return {"requested": req, "final": fin, "idx": idx, "action": act, "notes": notes}
+    if kind == "orders":
+        qty, o = take(0, np.float64, n)
+        lim, o = take(o, np.float64, n)
+        idx, o = take(o, np.int32, n)
+        agent, o = take(o, np.int16, n)
+        side, o = take(o, np.int8, n)
+        return {"qty": qty, "limit": lim, "idx": idx, "agent": agent, "side": side}
+    if kind == "fills":
+        price, o = take(0, np.float64, n)
+        qty, o = take(o, np.float64, n)
+        idx, o = take(o, np.int32, n)
+        buy, o = take(o, np.int16, n)
+        sell, o = take(o, np.int16, n)
+        return {"price": price, "qty": qty, "idx": idx, "buy": buy, "sell": sell}
+    raise ValueError(f"tipo de registro desconocido: {kind}")
+
+
+def read_journal(path: str) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+    """
+    Itera (tipo, día, campos) en orden de escritura. Los arrays son vistas sobre
+    el mmap (solo lectura): copiarlos si se guardan más allá de la iteración.
+    Un registro final truncado (corrida que se cortó) se ignora.
+    """
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: no es un journal de wasi")
+        size = os.fstat(fh.fileno()).st_size
+        if size == len(MAGIC):
+            return
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        S = 0
+        off = len(MAGIC)
+        while off + _HDR.size <= size:
+            length, k, day, n = _HDR.unpack_from(mm, off)
+            start, off = off + _HDR.size, off + _HDR.size + length
+            if off > size:
+                break
+            kind = KINDS[k]
+            if kind == "header":
+                meta = json.loads(mm[start:off].rstrip(b"\0"))
+                S = len(meta["symbols"])
+                yield kind, day, meta
+            elif kind == "name":
+                yield kind, day, {"code": n, "name": mm[start:off].rstrip(b"\0").decode()}
+            else:
+                yield kind, day, _decode(kind, n, mm, start, off, S)
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            pass  # quedan vistas vivas del caller: el mmap se cierra cuando se liberen
+
+
+# ---------- replay ----------
+
+def replay(path: str) -> Dict[str, Any]:
+    """
+    Reconstruye la corrida desde el journal: ledger (posiciones, PnL, fees,
+    atribución), history y trades con las mismas columnas que Coordinator.run,
+    el blotter de órdenes (pedido vs. llenado) y los ajustes de riesgo.
+    No vuelve a correr agentes ni proveedores de precios.
+    """
+    import pandas as pd
+    from wasi_analyst.util.config import WasiConfig
+    from wasi_analyst.util.metrics import equity_metrics
+    from .instruments import InstrumentTable
+    from .ledger import Ledger
+    from .riskengine import RiskEngine
+
+    names: Dict[int, str] = {}
+    hist_rows: List[Dict[str, Any]] = []
+    trades: Dict[str, List[np.ndarray]] = {k: [] for k in ("day", "symbol", "price", "qty", "buy_agent", "sell_agent")}
+    orders: Dict[str, List[np.ndarray]] = {k: [] for k in ("day", "symbol", "side", "qty", "limit", "agent", "filled")}
+    risk: Dict[str, List[np.ndarray]] = {k: [] for k in ("day", "symbol", "action", "requested", "final", "risk_note")}
+    actions = np.array(_ACTION_NAMES, dtype=object)
+    mismatches = 0
+    exec_code = -1
+    day_orders = None   # órdenes del día, para asignarles los fills
+
+    for kind, day, rec in read_journal(path):
+        if kind == "header":
+            cfg = WasiConfig(**rec.get("config", {"symbols": rec["symbols"]}))
+            table = InstrumentTable(rec["symbols"], cfg.start_price)
+            agents = rec.get("agents", [])
+            exec_agent = rec.get("exec_agent", "exec")
+            ledger = Ledger(cfg, table, agents)
+            var = RiskEngine.from_config(cfg, table.symbols) if cfg.var_window > 0 else None
+            sym = np.array(table.symbols, dtype=object)
+            px_cols = [f"px_{s}" for s in table.symbols]
+            pos_cols = [f"pos_{s}" for s in table.symbols]
+            pnl_cols = [f"pnl_{a}" for a in agents]
+        elif kind == "name":
+            names[rec["code"]] = rec["name"]
+            if rec["name"] == exec_agent:
+                exec_code = rec["code"]
+        elif kind == "prices":
+            snap = rec["price"].copy()
+            if var is not None:
+                var.update_prices(snap)
+            day_orders = None
+        elif kind == "credit":
+            ledger.credit[:] = rec["credit"]
+        elif kind == "risk" and rec["idx"].size:
+            n = len(rec["idx"])
+            risk["day"].append(np.full(n, day))
+            risk["symbol"].append(sym[rec["idx"]])
+            risk["action"].append(actions[rec["action"]])
+            risk["requested"].append(rec["requested"].copy())
+            risk["final"].append(rec["final"].copy())
+            risk["risk_note"].append(np.array(rec["notes"], dtype=object))
+        elif kind == "orders" and rec["idx"].size:
+            n = len(rec["idx"])
+            day_orders = {k: rec[k].copy() for k in ("idx", "side", "agent", "qty")}
+            orders["day"].append(np.full(n, day))
+            orders["symbol"].append(sym[rec["idx"]])
+            orders["side"].append(actions[rec["side"]])
+            orders["qty"].append(day_orders["qty"])
+            orders["limit"].append(rec["limit"].copy())
+            orders["agent"].append(np.array([names[c] for c in rec["agent"]], dtype=object))
+            orders["filled"].append(np.zeros(n))
+        elif kind == "fills":
+            idx = rec["idx"].astype(np.intp)
+            signed = rec["qty"] * ((rec["buy"] == exec_code).astype(float) - (rec["sell"] == exec_code))
+            ledger.apply(idx, signed, rec["price"])
+            if idx.size:
+                n = len(idx)
+                trades["day"].append(np.full(n, day))
+                trades["symbol"].append(sym[idx])
+                trades["price"].append(rec["price"].copy())
+                trades["qty"].append(rec["qty"].astype(np.int64))
+                trades["buy_agent"].append(np.array([names[c] for c in rec["buy"]], dtype=object))
+                trades["sell_agent"].append(np.array([names[c] for c in rec["sell"]], dtype=object))
+                if day_orders is not None:
+                    orders["filled"][-1] += _allocate(day_orders, rec)
+        elif kind == "end":
+            hist_rows.append({
+                "day": day,
+                **dict(zip(px_cols, snap.tolist())),
+                "cash": ledger.cash,
+                **dict(zip(pos_cols, table.position.tolist())),
+                "equity": ledger.equity(snap),
+                "realized_pnl": float(ledger.realized.sum()),
+                "unrealized_pnl": float(ledger.unrealized(snap).sum()),
+                "fees": float(ledger.fees.sum()),
+                **dict(zip(pnl_cols, ledger.agent_pnl(snap).tolist())),
+            })
+            if var is not None:
+                hist_rows[-1].update(var.record(hist_rows[-1]["equity"], table.position * snap))
+            if abs(hist_rows[-1]["equity"] - rec["equity"]) > 1e-9 * max(1.0, abs(rec["equity"])):
+                mismatches += 1
+
+    def frame(cols: Dict[str, List[np.ndarray]]) -> pd.DataFrame:
+        return pd.DataFrame({k: np.concatenate(v) for k, v in cols.items()}) if cols["day"] \
+            else pd.DataFrame(columns=list(cols))
+
+    hist_df = pd.DataFrame(hist_rows)
+    notes = [f"Replay de {os.path.basename(path)}: {len(hist_rows)} días"]
+    if len(hist_df):
+        m = equity_metrics(hist_df["equity"])
+        notes.append(f"Equity: retorno={m['period_return']:.2%}, sharpe={m['sharpe']:.2f}, "
+                     f"maxDD={m['max_drawdown']:.2%}")
+    notes.append("Control de equity: OK" if not mismatches else f"Control de equity: {mismatches} días no coinciden")
+    return {"history": hist_df, "trades": frame(trades), "orders": frame(orders), "risk": frame(risk),
+            "notes": notes, "transcript": []}
+
+
+def _allocate(day_orders: Dict[str, np.ndarray], fills: Dict[str, Any]) -> np.ndarray:
+    """Cantidad llenada por orden: los fills de (símbolo, lado, agente) se reparten FIFO."""
+    got: Dict[Tuple[int, int, int], float] = {}
+    for i, q, b, s in zip(fills["idx"].tolist(), fills["qty"].tolist(), fills["buy"].tolist(), fills["sell"].tolist()):
+        got[(i, 1, b)] = got.get((i, 1, b), 0.0) + q
+        got[(i, 2, s)] = got.get((i, 2, s), 0.0) + q
+    out = np.zeros(len(day_orders["qty"]))
+    for k, key in enumerate(zip(day_orders["idx"].tolist(), day_orders["side"].tolist(), day_orders["agent"].tolist())):
+        left = got.get(key, 0.0)
+        out[k] = min(left, day_orders["qty"][k])
+        got[key] = left - out[k]
+    return out
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from typing import Dict, List, Sequence
+import numpy as np
+
+from .instruments import InstrumentTable
+from wasi_analyst.util.config import WasiConfig
+
+# Ledger del portfolio operador: posiciones, costo promedio, PnL realizado y fees
+# como arrays por símbolo. Los trades del día se aplican en bloque (agregados por
+# símbolo y lado) y el PnL se atribuye a los agentes que votaron cada orden.
+
+
+def _apply_net(pos: np.ndarray, avg: np.ndarray, q: np.ndarray, px: np.ndarray):
+    """
+    Aplica una cantidad neta con signo `q` al precio `px` sobre (pos, avg).
+    Devuelve (new_pos, new_avg, realized). Soporta cruces long <-> short.
+    """
+    new_pos = pos + q
+    opening = (pos == 0) | (np.sign(pos) == np.sign(q))
+    closed = np.where(opening, 0, np.minimum(np.abs(q), np.abs(pos)))
+    realized = closed * (px - avg) * np.sign(pos)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_open = np.where(new_pos != 0, (pos * avg + q * px) / new_pos, 0.0)
+    flipped = ~opening & (np.sign(new_pos) == np.sign(q)) & (new_pos != 0)
+    new_avg = np.where(opening, avg_open, np.where(flipped, px, np.where(new_pos == 0, 0.0, avg)))
+    return new_pos, new_avg, realized
+
+
+class Ledger:
+    def __init__(self, cfg: WasiConfig, table: InstrumentTable, agents: Sequence[str]):
+        n = len(table)
+        self.symbols = table.symbols
+        self._index = table.index
+        self.position = table.position          # compartido con la tabla del Market
+        self.avg_cost = np.zeros(n)
+        self.realized = np.zeros(n)
+        self.fees = np.zeros(n)
+        self.cash = float(cfg.cash0)
+        self.fee_rate = float(cfg.fee_bps) / 10_000.0
+
+        # atribución: crédito por (agente, símbolo) de las órdenes del día
+        self.agents: List[str] = list(agents)
+        self._agent_idx = {a: i for i, a in enumerate(self.agents)}
+        self.credit = np.zeros((len(self.agents), n))
+        self.attr_pos = np.zeros((len(self.agents), n))
+        self.attr_cash = np.zeros((len(self.agents), n))
+
+    # ---------- atribución ----------
+
+    def set_credit(self, merged: List[Dict]) -> None:
+        """
+        Reparte el crédito de cada acción fusionada en partes iguales entre los
+        agentes que la votaron (clave 'agents' de Coordinator._merge_actions).
+        """
+        self.credit[:] = 0.0
+        for a in merged:
+            voters = [self._agent_idx[v] for v in a.get("agents", ()) if v in self._agent_idx]
+            if voters and a.get("symbol") in self._index:
+                self.credit[voters, self._index[a["symbol"]]] = 1.0 / len(voters)
+
+    # ---------- trades ----------
+
+    def apply(self, idx: np.ndarray, signed_qty: np.ndarray, price: np.ndarray) -> None:
+        """
+        Aplica en bloque los fills del día (arrays alineados). Compras y ventas se
+        agregan por símbolo a su VWAP y se aplican en ese orden.
+        """
+        if len(idx) == 0:
+            return
+        n = len(self.symbols)
+        idx = np.asarray(idx, dtype=np.intp)
+        q = np.asarray(signed_qty, dtype=float)
+        px = np.asarray(price, dtype=float)
+        notional = q * px
+        fee = np.abs(notional) * self.fee_rate
+
+        fee_s = np.bincount(idx, weights=fee, minlength=n)
+        flow_s = np.bincount(idx, weights=notional, minlength=n)
+        self.cash -= float(flow_s.sum() + fee_s.sum())
+        self.fees += fee_s
+
+        pos = self.position.astype(float)
+        avg = self.avg_cost
+        for side in (q > 0, q < 0):
+            sq = np.bincount(idx[side], weights=q[side], minlength=n)
+            sn = np.bincount(idx[side], weights=notional[side], minlength=n)
+            hit = sq != 0
+            if not hit.any():
+                continue
+            vwap = np.divide(sn, sq, out=np.zeros(n), where=hit)
+            p2, a2, r2 = _apply_net(pos[hit], avg[hit], sq[hit], vwap[hit])
+            pos[hit], avg[hit] = p2, a2
+            self.realized[hit] += r2
+        self.position[:] = np.rint(pos).astype(self.position.dtype)
+
+        # atribución de flujos y posiciones a los agentes según el crédito del día
+        q_s = np.bincount(idx, weights=q, minlength=n)
+        self.attr_pos += self.credit * q_s
+        self.attr_cash -= self.credit * (flow_s + fee_s)
+
+    def apply_fills(self, fills, agent_id: str) -> None:
+        """Aplica los fills del día (Market.fills) que involucran a `agent_id`."""
+        self.apply(fills.idx, fills.signed_qty(agent_id), fills.price)
+
+    # ---------- vistas ----------
+
+    def unrealized(self, prices: np.ndarray) -> np.ndarray:
+        return self.position * (prices - self.avg_cost)
+
+    def equity(self, prices: np.ndarray) -> float:
+        return self.cash + float(self.position @ prices)
+
+    def agent_pnl(self, prices: np.ndarray) -> np.ndarray:
+        """PnL atribuido por agente (flujos de caja + posición atribuida a mercado)."""
+        return self.attr_cash.sum(axis=1) + self.attr_pos @ prices
@@ -1,70 +1,199 @@
 from __future__ import annotations
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional
 from dataclasses import dataclass, field
-from .orderbook import Book, Order, Trade
+import numpy as np
+from .orderbook import Order, Trade
+from .fills import FillModel, make_fill_model
+from .instruments import InstrumentTable, InstrumentsView
 from wasi_analyst.util.config import WasiConfig
 
+if TYPE_CHECKING:
+    from .population import Population
+
 @dataclass
-class Instrument:
-    symbol: str
-    price: float
-    book: Book
+class FillBatch:
+    """Fills del día en formato columnar (alineados por posición)."""
+    idx: np.ndarray          # índice del instrumento
+    price: np.ndarray
+    qty: np.ndarray
+    buy_agent: np.ndarray    # dtype=object
+    sell_agent: np.ndarray   # dtype=object
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def signed_qty(self, agent_id: str) -> np.ndarray:
+        """+qty si `agent_id` compró, -qty si vendió, 0 si no participó."""
+        return self.qty * ((self.buy_agent == agent_id).astype(float) - (self.sell_agent == agent_id))
+
+    @staticmethod
+    def empty() -> "FillBatch":
+        e = np.empty(0)
+        return FillBatch(e.astype(np.intp), e, e, e.astype(object), e.astype(object))
+
+    @staticmethod
+    def concat(batches: List["FillBatch"]) -> "FillBatch":
+        if not batches:
+            return FillBatch.empty()
+        if len(batches) == 1:
+            return batches[0]
+        return FillBatch(*(np.concatenate([getattr(b, f) for b in batches])
+                           for f in ("idx", "price", "qty", "buy_agent", "sell_agent")))
 
 @dataclass
 class Market:
     cfg: WasiConfig
     price_provider: "PriceProvider"
     day: int = 0
-    instruments: Dict[str, Instrument] = field(default_factory=dict)
+    table: InstrumentTable = field(init=False)
+    instruments: InstrumentsView = field(init=False)   # vista dict-like sobre la tabla
     trades: List[Trade] = field(default_factory=list)
 
     # >>> NUEVO: acumulamos ejecuciones “LP” del día
     lp_trades_today: List[Trade] = field(default_factory=list)
+    # fills del último match_all() en formato columnar (para el ledger)
+    fills: FillBatch = field(default_factory=FillBatch.empty)
+    _lp_batches: List[FillBatch] = field(default_factory=list, repr=False)
+    # modo "abm": población de traders, valor fundamental (del provider) y
+    # participantes externos en la subasta (ids >= len(population))
+    population: Optional[Population] = field(default=None, init=False, repr=False)
+    value: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _external: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
 
     def __post_init__(self):
         import random
         random.seed(self.cfg.seed)
-        for s in self.cfg.symbols:
-            self.instruments[s] = Instrument(symbol=s, price=self.cfg.start_price, book=Book(symbol=s))
+        self.table = InstrumentTable(self.cfg.symbols, self.cfg.start_price)
+        self.instruments = self.table.view()
+        self._symbols = self.table.symbols
+        self._index = self.table.index
+        # coeficientes de impacto precalculados por instrumento
+        self.fill_model: FillModel = make_fill_model(self.cfg, self._symbols)
+        # los providers vectorizados exponen next_prices(); si no, vamos símbolo a símbolo
+        self._next_prices = getattr(self.price_provider, "next_prices", None)
+        if self.cfg.market_mode == "abm":
+            from .population import Population
+            self.population = Population.from_config(self.cfg, self._symbols)
+            self.value = self.table.price.copy()
 
     # ---------- pricing ----------
 
+    def _provider_step(self, last: np.ndarray) -> np.ndarray:
+        if self._next_prices is not None:
+            return np.asarray(self._next_prices(self._symbols, last, self.day), dtype=float)
+        return np.array([self.price_provider.next_price(s, float(p), self.day)
+                         for s, p in zip(self._symbols, last)], dtype=float)
+
     def step_prices(self):
-        for _, ins in self.instruments.items():
-            ins.price = self.price_provider.next_price(ins.symbol, ins.price, self.day)
+        t = self.table
+        if self.population is not None:
+            return self._step_abm()
+        t.roll(self._provider_step(t.price))
+        self.day += 1
+
+    def _step_abm(self):
+        """
+        Modo abm: el provider mueve el valor fundamental; el precio de apertura es el
+        de la última subasta y la población deja sus órdenes del día en los libros.
+        """
+        t = self.table
+        self.value = self._provider_step(self.value)
+        t.roll(t.price.copy())
+        agent, sym, side, qty, limit = self.population.decide(t.price, self.value)
+        bounds = np.searchsorted(sym, np.arange(len(t) + 1))   # vienen agrupadas por símbolo
+        for j in range(len(t)):
+            o = slice(bounds[j], bounds[j + 1])
+            t.books[j].submit(side[o], qty[o], limit[o], agent[o])
         self.day += 1
 
     # ---------- execution ----------
 
     def place(self, order: Order):
+        """Compat: una sola orden. Ver place_many()."""
+        return self.place_many([order])
+
+    def place_many(self, orders: List[Order]) -> List[Trade]:
         """
-        Híbrido: mandamos al libro + ejecutamos inmediato contra un LP virtual
-        para garantizar fills (qty>0). Los trades LP se guardan en un buffer
-        diario para ser devueltos por match_all().
+        Ejecuta el batch de órdenes del día contra el LP virtual en una sola pasada
+        vectorizada. Todas las órdenes de un símbolo se llenan contra el mismo precio
+        de referencia (pre-batch); recién al final se aplica el impacto permanente
+        agregado por símbolo. Las órdenes llenadas por el LP no quedan en el libro.
+        Los fills se acumulan en el buffer diario que devuelve match_all().
         """
-        ins = self.instruments[order.symbol]
-        ins.book.add(order)
-
-        if order.qty <= 0:
-            return
-
-        slip = float(getattr(self.cfg, "slippage_bps", 10.0)) / 10_000.0
-        last = float(ins.price)
-
-        if order.side == "buy":
-            px = last * (1.0 + slip)
-            t = Trade(symbol=order.symbol, price=px, qty=order.qty,
-                      buy_agent=order.agent_id, sell_agent="lp")
-        elif order.side == "sell":
-            px = last * (1.0 - slip)
-            t = Trade(symbol=order.symbol, price=px, qty=order.qty,
-                      buy_agent="lp", sell_agent=order.agent_id)
-        else:
-            return
-
-        # Actualizamos precio y guardamos el fill para este “día”
-        ins.price = px
-        self.lp_trades_today.append(t)
+        live = [o for o in orders if o.qty > 0 and o.side in ("buy", "sell")]
+        if not live:
+            return []
+        if self.population is not None:
+            return self._place_abm(live)
+
+        t = self.table
+        n = len(t)
+        idx = np.fromiter((self._index[o.symbol] for o in live), dtype=np.intp, count=len(live))
+        sign = np.fromiter((1.0 if o.side == "buy" else -1.0 for o in live), dtype=float, count=len(live))
+        qty = np.fromiter((o.qty for o in live), dtype=float, count=len(live))
+
+        px, perm = self.fill_model.fill(idx, sign, qty, t.price[idx])
+
+        # impacto permanente agregado por símbolo -> nuevo precio post-batch
+        hit = np.bincount(idx, minlength=n) > 0
+        shift = np.bincount(idx, weights=perm, minlength=n)
+        t.price[hit] *= 1.0 + shift[hit]
+        t.volume += np.bincount(idx, weights=qty, minlength=n)
+
+        agent = np.array([o.agent_id for o in live], dtype=object)
+        buy = sign > 0
+        self._lp_batches.append(FillBatch(
+            idx=idx, price=px, qty=qty,
+            buy_agent=np.where(buy, agent, "lp"), sell_agent=np.where(buy, "lp", agent),
+        ))
+
+        fills = [
+            Trade(symbol=o.symbol, price=float(p), qty=o.qty, buy_agent=o.agent_id, sell_agent="lp")
+            if o.side == "buy" else
+            Trade(symbol=o.symbol, price=float(p), qty=o.qty, buy_agent="lp", sell_agent=o.agent_id)
+            for o, p in zip(live, px)
+        ]
+        self.lp_trades_today.extend(fills)
+        return fills
+
+    def _place_abm(self, live: List[Order]) -> List[Trade]:
+        """Modo abm: las órdenes van a la subasta del día (sin límite = a mercado)."""
+        n = len(self.population)
+        for o in live:
+            owner = n + self._external.setdefault(o.agent_id, len(self._external))
+            buy = o.side == "buy"
+            limit = o.price if o.price is not None else (np.inf if buy else 0.0)
+            self.table.books[self._index[o.symbol]].submit(
+                np.array([1 if buy else -1]), np.array([o.qty]), np.array([limit]), np.array([owner]))
+        return []
+
+    def _match_abm(self) -> List[Trade]:
+        """Subasta de cada símbolo: nuevo precio, fills de la población y FillBatch de los externos."""
+        t = self.table
+        pop = self.population
+        n = len(pop)
+        names = np.array(["abm", *self._external], dtype=object)
+        todays: List[Trade] = []
+        batches: List[FillBatch] = []
+        for j in range(len(t)):
+            px, buyer, seller, qty = t.books[j].auction(float(t.price[j]))
+            t.price[j] = px
+            if not len(qty):
+                continue
+            t.volume[j] += qty.sum()
+            pop.apply(j, buyer, seller, qty, px)
+            ext = (buyer >= n) | (seller >= n)
+            if ext.any():
+                b = names[np.maximum(buyer[ext] - n + 1, 0)]
+                s = names[np.maximum(seller[ext] - n + 1, 0)]
+                q = qty[ext].astype(float)
+                batches.append(FillBatch(idx=np.full(len(q), j, dtype=np.intp), price=np.full(len(q), px),
+                                         qty=q, buy_agent=b, sell_agent=s))
+                todays.extend(Trade(symbol=self._symbols[j], price=px, qty=int(x), buy_agent=bb, sell_agent=ss)
+                              for x, bb, ss in zip(q, b, s))
+        self.fills = FillBatch.concat(batches)
+        self.trades.extend(todays)
+        return todays
 
     def match_all(self):
         """
@@ -73,19 +202,35 @@ class Market:
           - luego los del libro si existieran
         Limpia el buffer diario y persiste en self.trades.
         """
+        if self.population is not None:
+            return self._match_abm()
         todays: List[Trade] = []
+        batches, self._lp_batches = self._lp_batches, []
 
         # 1) LP fills de hoy
         if self.lp_trades_today:
             todays.extend(self.lp_trades_today)
             self.lp_trades_today = []
 
-        # 2) Matching del libro
-        for _, ins in self.instruments.items():
-            t = ins.book.match()
-            if t:
-                ins.price = t[-1].price
-                todays.extend(t)
+        # 2) Matching del libro (solo los libros que recibieron órdenes)
+        t = self.table
+        for i in list(t.touched):
+            book = t.books[i]
+            tr = book.match()
+            if tr:
+                t.price[i] = tr[-1].price
+                t.volume[i] += sum(x.qty for x in tr)
+                todays.extend(tr)
+                batches.append(FillBatch(
+                    idx=np.full(len(tr), i, dtype=np.intp),
+                    price=np.array([x.price for x in tr], dtype=float),
+                    qty=np.array([x.qty for x in tr], dtype=float),
+                    buy_agent=np.array([x.buy_agent for x in tr], dtype=object),
+                    sell_agent=np.array([x.sell_agent for x in tr], dtype=object),
+                ))
+            if not book.bids and not book.asks:
+                t.touched.discard(i)
+        self.fills = FillBatch.concat(batches)
 
         # Persistimos y devolvemos
         self.trades.extend(todays)
@@ -93,8 +238,15 @@ class Market:
 
     # ---------- views ----------
 
-    def snapshot_prices(self):
-        return {s: ins.price for s, ins in self.instruments.items()}
+    def snapshot_prices(self) -> Dict[str, float]:
+        return dict(zip(self._symbols, self.table.price.tolist()))
+
+    def prices(self) -> np.ndarray:
+        """Snapshot de precios como array (orden de self.table.symbols)."""
+        return self.table.price.copy()
 
 class PriceProvider:
     def next_price(self, symbol: str, last: float, day: int) -> float: ...
+
+    # Opcional: versión vectorizada para todo el universo (mismo orden que `symbols`)
+    def next_prices(self, symbols: List[str], last: np.ndarray, day: int) -> np.ndarray: ...
@@ -1,5 +1,7 @@
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 @dataclass
 class Order:
@@ -22,6 +24,8 @@ class Book:
     symbol: str
     bids: List[Order] = field(default_factory=list)  # sorted desc price
     asks: List[Order] = field(default_factory=list)  # sorted asc price
+    # órdenes del día en columnas (side +1/-1, qty, límite, participante) para la subasta
+    _batches: List[Tuple[np.ndarray, ...]] = field(default_factory=list, repr=False)
 
     def add(self, o: Order):
         if o.side == 'buy':
@@ -47,3 +51,90 @@ class Book:
             else:
                 break
         return trades
+
+    # ---------- subasta de cierre (columnar) ----------
+    # Para poblaciones grandes (core/population.py) las órdenes no se insertan de
+    # a una: se acumulan en columnas y se cruzan en una subasta de precio único.
+
+    def submit(self, side: np.ndarray, qty: np.ndarray, limit: np.ndarray, owner: np.ndarray) -> None:
+        """Encola un lote de órdenes límite del día (limit = inf / 0 para órdenes de mercado)."""
+        if len(qty):
+            self._batches.append((np.asarray(side, dtype=np.int8), np.asarray(qty, dtype=np.int64),
+                                  np.asarray(limit, dtype=float), np.asarray(owner, dtype=np.int64)))
+
+    @property
+    def pending(self) -> int:
+        return sum(len(b[1]) for b in self._batches)
+
+    def auction(self, last: float) -> Tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cruza las órdenes encoladas a un único precio y vacía el libro (órdenes del día).
+        Retorna (precio, comprador, vendedor, qty): un fill por par, con los `owner` de cada lado.
+        """
+        batches, self._batches = self._batches, []
+        empty = np.empty(0, dtype=np.int64)
+        if not batches:
+            return last, empty, empty, empty
+        side, qty, limit, owner = (np.concatenate(c) for c in zip(*batches))
+        b, a = side > 0, side < 0
+        px, bfill, afill = call_auction(limit[b], qty[b], limit[a], qty[a], last)
+        i, j, q = pair_fills(bfill, afill)
+        return px, owner[b][i], owner[a][j], q
+
+
+def _priority(limit: np.ndarray, buy: bool) -> np.ndarray:
+    """Prioridad precio-tiempo: mejor límite primero y, a igual límite, orden de llegada."""
+    return np.argsort(-limit if buy else limit, kind="stable")
+
+
+def call_auction(bid_px: np.ndarray, bid_qty: np.ndarray, ask_px: np.ndarray, ask_qty: np.ndarray,
+                 last: float) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    Subasta de precio único: el precio maximiza el volumen cruzado; a igual volumen
+    minimiza el desbalance y después la distancia a `last`. El lado excedente se
+    raciona por precio-tiempo. Sin cruce, el precio se corre hacia la mejor punta
+    que lo haya superado (o queda en `last`).
+    Retorna (precio, qty llenada por bid, qty llenada por ask) en el orden de entrada.
+    """
+    bfill = np.zeros(len(bid_qty), dtype=np.int64)
+    afill = np.zeros(len(ask_qty), dtype=np.int64)
+    finite = np.concatenate((bid_px[np.isfinite(bid_px)], ask_px[(ask_px > 0) & np.isfinite(ask_px)]))
+    cand = np.unique(np.append(finite, last))
+    # un solo orden por lado (el de prioridad) sirve para las curvas y para el racionamiento:
+    # demanda(p) = qty con límite >= p; oferta(p) = qty con límite <= p
+    bo, ao = _priority(bid_px, True), _priority(ask_px, False)
+    bcum = np.concatenate(([0], np.cumsum(bid_qty[bo])))
+    demand = bcum[np.searchsorted(-bid_px[bo], -cand, side="right")]
+    acum = np.concatenate(([0], np.cumsum(ask_qty[ao])))
+    supply = acum[np.searchsorted(ask_px[ao], cand, side="right")]
+    vol = np.minimum(demand, supply)
+    best = int(vol.max()) if len(vol) else 0
+    if best <= 0:
+        top_bid = bid_px[np.isfinite(bid_px)].max(initial=-np.inf)
+        top_ask = ask_px[(ask_px > 0) & np.isfinite(ask_px)].min(initial=np.inf)
+        px = top_bid if top_bid > last else top_ask if top_ask < last else last
+        return float(px), bfill, afill
+    k = np.flatnonzero(vol == best)
+    imb = np.abs(demand[k] - supply[k])
+    k = k[imb == imb.min()]
+    px = float(cand[k[np.argmin(np.abs(cand[k] - last))]])
+
+    for qty, limit, fill, buy, order in ((bid_qty, bid_px, bfill, True, bo), (ask_qty, ask_px, afill, False, ao)):
+        elig = (limit[order] >= px) if buy else (limit[order] <= px)
+        q = np.where(elig, qty[order], 0)
+        before = np.cumsum(q) - q
+        fill[order] = np.clip(best - before, 0, q)
+    return px, bfill, afill
+
+
+def pair_fills(bfill: np.ndarray, afill: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Empareja compradores y vendedores llenados (mismo total) cortando por las sumas acumuladas."""
+    bi, ai = np.flatnonzero(bfill), np.flatnonzero(afill)
+    if not len(bi):
+        e = np.empty(0, dtype=np.int64)
+        return e, e, e
+    bc, ac = np.cumsum(bfill[bi]), np.cumsum(afill[ai])
+    cuts = np.union1d(bc, ac)
+    q = np.diff(np.concatenate(([0], cuts)))
+    starts = cuts - q
+    return bi[np.searchsorted(bc, starts, side="right")], ai[np.searchsorted(ac, starts, side="right")], q
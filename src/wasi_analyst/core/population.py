@@ -0,0 +1,178 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+
+from wasi_analyst.util.config import WasiConfig
+from .history import PriceRing
+
+if TYPE_CHECKING:
+    from wasi_analyst.agents.base import AgentState
+
+# Población de traders para el modo de mercado "abm" (Market con market_mode="abm").
+#
+# Miles de agentes heterogéneos de las familias de reglas del repo (mean-reversion,
+# momentum, breakout) más traders de ruido que dan profundidad al libro. Cada uno
+# tiene sus parámetros aleatorios y su propio cash/posiciones, pero el estado vive
+# en struct-of-arrays (como InstrumentTable): las decisiones se evalúan por familia
+# sobre matrices agentes x símbolos y las órdenes van en columnas a la subasta del
+# Book. `state(i)` da el AgentState de un agente puntual.
+#
+# Los precios de mercado salen de la subasta. El PriceProvider pasa a ser el valor
+# fundamental (no observado por el resto): los fundamentalistas revierten hacia una
+# mezcla de ese valor y su SMA según su `anchor`.
+
+FAMILIES = ("fundamental", "macro", "sentiment", "noise")
+WINDOWS = (3, 5, 10, 20)
+
+
+def _features(hist: np.ndarray, windows: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    """Features por ventana sobre el historial (días x símbolos): arrays (ventanas x símbolos)."""
+    k = len(hist)
+    p = hist[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = hist[1:] / hist[:-1] - 1.0 if k > 1 else np.zeros((1, hist.shape[1]))
+    out: Dict[str, List[np.ndarray]] = {"sma": [], "mom": [], "vol": [], "hi": [], "lo": []}
+    for w in windows:
+        wk = min(w, k)
+        prior = hist[-wk - 1:-1] if k > 1 else hist
+        out["sma"].append(hist[-wk:].mean(axis=0))
+        out["mom"].append(p / hist[-min(w + 1, k)] - 1.0)
+        out["vol"].append(rets[-wk:].std(axis=0))
+        out["hi"].append(prior.max(axis=0))
+        out["lo"].append(prior.min(axis=0))
+    return {f: np.vstack(v) for f, v in out.items()}
+
+
+def _signal(buy: np.ndarray, sell: np.ndarray) -> np.ndarray:
+    """+1 / -1 / 0 en int8 a partir de las máscaras de compra y venta."""
+    return buy.view(np.int8) - sell.view(np.int8)
+
+
+class Population:
+    def __init__(self, symbols: List[str], n: int, mix: Dict[str, float], cash: float, shares: int,
+                 cfg: WasiConfig, seed: int = 0):
+        rng = self.rng = np.random.default_rng(seed)
+        self.symbols = list(symbols)
+        self.n = int(n)
+        S = len(self.symbols)
+        w = np.array([max(0.0, float(mix.get(f, 0.0))) for f in FAMILIES])
+        if w.sum() <= 0:
+            raise ValueError(f"abm_mix sin pesos positivos: {mix!r}")
+        self.family = rng.choice(len(FAMILIES), size=self.n, p=w / w.sum()).astype(np.int8)
+        self.members = {f: np.flatnonzero(self.family == k) for k, f in enumerate(FAMILIES)}
+
+        # parámetros por agente, dispersos alrededor de los de la config
+        spread = rng.uniform(0.5, 2.0, self.n)
+        base_thresh = np.array([cfg.fundamental_base_thresh, cfg.macro_thresh, cfg.sentiment_eps, 0.0])
+        base_cap = np.array([cfg.fundamental_qty_cap, cfg.macro_qty_cap, cfg.sentiment_qty, cfg.sentiment_qty])
+        self.thresh = base_thresh[self.family] * spread
+        self.cap = np.maximum(1, np.rint(base_cap[self.family] * rng.uniform(0.25, 1.5, self.n))).astype(np.int64)
+        self.window = rng.integers(0, len(WINDOWS), self.n)       # índice en WINDOWS
+        self.aggr = rng.uniform(0.0005, 0.01, self.n)             # offset del límite sobre el último precio
+        self.anchor = rng.uniform(0.0, 1.0, self.n)               # peso del valor fundamental vs SMA
+        self.activity = rng.uniform(0.2, 1.0, self.n)             # prob. de operar en el día
+
+        self.cash = cash * rng.uniform(0.5, 1.5, self.n)
+        self.position = rng.integers(0, 2 * int(shares) + 1, (self.n, S)).astype(np.int64)
+        # tope por símbolo (como max_position_per_symbol del exec): con long-only da una
+        # caja simétrica alrededor de la dotación; sin él las compras solo las frena el
+        # cash y el precio se infla respecto del valor fundamental
+        self.max_position = 2 * int(shares)
+        self.fee_rate = float(cfg.fee_bps) / 10_000.0
+        self.ring = PriceRing(S, max(WINDOWS) + 1)
+
+    @classmethod
+    def from_config(cls, cfg: WasiConfig, symbols: List[str]) -> "Population":
+        return cls(symbols, cfg.abm_agents, cfg.abm_mix, cfg.abm_cash, cfg.abm_shares, cfg, seed=cfg.seed)
+
+    def __len__(self) -> int:
+        return self.n
+
+    # ---------- decisiones (vectorizadas por familia) ----------
+
+    def decide(self, price: np.ndarray, value: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Órdenes del día en columnas (agente, símbolo, lado +1/-1, qty, límite), ordenadas
+        por símbolo y, dentro de cada uno, en orden aleatorio de agentes: la prioridad
+        temporal dentro de un mismo límite no favorece a nadie.
+        """
+        self.ring.push(price)
+        feats = _features(self.ring.window(), WINDOWS)
+        rng = self.rng
+        S = len(price)
+        side = np.zeros((self.n, S), dtype=np.int8)
+        qty = np.zeros((self.n, S), dtype=np.int64)
+
+        for fam, rows in self.members.items():
+            rows = rows[rng.random(len(rows)) < self.activity[rows]]
+            if not len(rows):
+                continue
+            w = self.window[rows]
+            th = self.thresh[rows][:, None]
+            cap = self.cap[rows][:, None]
+            if fam == "fundamental":
+                a = self.anchor[rows][:, None]
+                ref = a * value + (1.0 - a) * feats["sma"][w]
+                dev = price / ref - 1.0
+                t = th + 0.5 * feats["vol"][w]
+                s = _signal(dev < -t, dev > t)
+                q = np.minimum(cap, (np.abs(dev) / (t + 1e-6) * 5).astype(np.int64))
+            elif fam == "macro":
+                mom = np.nan_to_num(feats["mom"][w])
+                s = _signal(mom > th, mom < -th)
+                q = np.minimum(cap, (np.abs(mom) / (th + 1e-6) * 4).astype(np.int64))
+            elif fam == "sentiment":
+                s = _signal(price >= feats["hi"][w] * (1 + th), price <= feats["lo"][w] * (1 - th))
+                q = np.broadcast_to(cap, s.shape)
+            else:
+                s = rng.choice(np.array([-1, 0, 1], dtype=np.int8), size=(len(rows), S))
+                q = rng.integers(1, cap + 1, size=(len(rows), S))
+            side[rows] = s
+            qty[rows] = q
+
+        # límites: agresivos alrededor del último precio; los de ruido también ponen órdenes pasivas
+        aggr = np.broadcast_to(self.aggr[:, None], side.shape).copy()
+        noise = self.members["noise"]
+        aggr[noise] *= rng.uniform(-1.0, 2.0, (len(noise), S))
+        limit = price * (1.0 + side * aggr)
+
+        # restricciones: long-only, tope de posición y cash repartido entre las compras del agente
+        buys = side > 0
+        n_buys = np.maximum(1, buys.sum(axis=1))[:, None]
+        budget = np.maximum(0.0, self.cash)[:, None] / n_buys / (limit * (1.0 + self.fee_rate))
+        room = np.where(buys, np.minimum(self.max_position - self.position, np.floor(budget)), self.position)
+        qty = np.minimum(qty, np.maximum(room, 0).astype(np.int64))
+
+        # agrupadas por símbolo; dentro de cada uno, orden de llegada aleatorio del día
+        perm = rng.permutation(self.n)
+        sym, k = np.nonzero(((side != 0) & (qty > 0))[perm].T)
+        agent = perm[k]
+        return agent, sym, side[agent, sym], qty[agent, sym], limit[agent, sym]
+
+    # ---------- fills ----------
+
+    def apply(self, j: int, buyer: np.ndarray, seller: np.ndarray, qty: np.ndarray, px: float) -> None:
+        """Fills de la subasta del símbolo j; ids >= n son participantes externos (p.ej. "exec")."""
+        cost = qty * px
+        fee = cost * self.fee_rate
+        b = buyer < self.n
+        np.add.at(self.cash, buyer[b], -(cost[b] + fee[b]))
+        np.add.at(self.position[:, j], buyer[b], qty[b])
+        s = seller < self.n
+        np.add.at(self.cash, seller[s], cost[s] - fee[s])
+        np.add.at(self.position[:, j], seller[s], -qty[s])
+
+    # ---------- vistas ----------
+
+    def equity(self, prices: np.ndarray) -> np.ndarray:
+        return self.cash + self.position @ prices
+
+    def family_equity(self, prices: np.ndarray) -> Dict[str, float]:
+        eq = np.bincount(self.family, weights=self.equity(prices), minlength=len(FAMILIES))
+        return dict(zip(FAMILIES, eq.tolist()))
+
+    def state(self, i: int) -> AgentState:
+        """AgentState (copia) del agente i."""
+        from wasi_analyst.agents.base import AgentState
+        return AgentState(cash=float(self.cash[i]), positions=dict(zip(self.symbols, self.position[i].tolist())))
@@ -0,0 +1,135 @@
+from __future__ import annotations
+from bisect import bisect_left, insort
+from collections import deque
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .crosssection import EWMACovariance
+
+# VaR / expected shortfall a 1 día, mantenidos de forma incremental.
+#
+# Histórico: ventana deslizante de retornos diarios de equity guardada también
+# ordenada (bisect), así que entrar/salir de la ventana es O(log W) de búsqueda
+# y el cuantil es un acceso por índice; no se reordena la ventana cada día.
+# Paramétrico (normal): sigma = sqrt(x' C x) con la covarianza EWMA de rango uno
+# de core/crosssection.py (la misma de CrossSection si está activa).
+# Todas las cifras son pérdidas positivas como fracción del equity.
+
+VAR_COLUMNS = ("var_hist", "es_hist", "var_param", "es_param")
+MAX_TAIL_MULT = 3.0
+
+
+class RollingTail:
+    """Cola izquierda de una ventana deslizante de retornos: VaR y ES históricos."""
+
+    def __init__(self, window: int, alpha: float = 0.05):
+        self.window = int(window)
+        self.alpha = float(alpha)
+        self._fifo: deque = deque()
+        self._sorted: List[float] = []
+        # con menos de 1/alpha observaciones el cuantil de cola no está definido
+        self.min_obs = max(2, int(np.ceil(1.0 / self.alpha)))
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def push(self, r: float) -> None:
+        if not np.isfinite(r):
+            return
+        if len(self._fifo) == self.window:
+            old = self._fifo.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+        self._fifo.append(r)
+        insort(self._sorted, r)
+
+    def _k(self) -> int:
+        return max(0, int(np.ceil(self.alpha * len(self._sorted))) - 1)
+
+    def var(self) -> float:
+        if len(self._sorted) < self.min_obs:
+            return float("nan")
+        return max(0.0, -self._sorted[self._k()])
+
+    def es(self) -> float:
+        """Promedio de los retornos en la cola (hasta el cuantil inclusive)."""
+        if len(self._sorted) < self.min_obs:
+            return float("nan")
+        k = self._k() + 1
+        return max(0.0, -sum(self._sorted[:k]) / k)
+
+
+def max_var_add(cii: float, cxi: float, var_x: float, limit_sigma: float) -> float:
+    """
+    Máximo notional a agregar en el símbolo i sin que sqrt(x' C x) pase `limit_sigma`:
+    la mayor raíz de C_ii q^2 + 2 q (C x)_i + x' C x - limit^2 = 0.
+    """
+    c = var_x - limit_sigma * limit_sigma
+    if cii <= 0:
+        # sin varianza estimada todavía: solo limita si ya se pasó
+        return float("inf") if c <= 0 else 0.0
+    disc = cxi * cxi - cii * c
+    if disc < 0:
+        return 0.0
+    return max(0.0, (-cxi + np.sqrt(disc)) / cii)
+
+
+class RiskEngine:
+    """
+    Estado de riesgo de una corrida. `update_prices` al comienzo del día,
+    `record` al cierre (después de los fills); `limit_sigma` + `max_var_add`
+    le sirven al RiskManager para recortar compras contra el presupuesto de VaR.
+    """
+
+    def __init__(self, symbols: List[str], window: int = 250, alpha: float = 0.05,
+                 halflife: float = 20.0, cov: Optional[EWMACovariance] = None):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.alpha = float(alpha)
+        nd = NormalDist()
+        self.z = nd.inv_cdf(1.0 - self.alpha)
+        self.es_z = nd.pdf(self.z) / self.alpha
+        self.tail = RollingTail(window, alpha)
+        self._own_cov = cov is None
+        self.cov = cov if cov is not None else EWMACovariance(len(self.symbols), halflife)
+        self.tail_mult = 1.0     # VaR histórico / paramétrico del último cierre (>= 1)
+        self._prev_px: Optional[np.ndarray] = None
+        self._prev_eq: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, cfg, symbols: List[str], cov: Optional[EWMACovariance] = None) -> "RiskEngine":
+        return cls(symbols, cfg.var_window, cfg.var_alpha, cfg.cs_halflife or 20.0, cov)
+
+    def update_prices(self, prices: np.ndarray) -> None:
+        """Retornos del día a la covarianza (si es compartida con CrossSection, ya la actualiza ella)."""
+        if not self._own_cov:
+            return
+        prices = np.asarray(prices, dtype=float)
+        if self._prev_px is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.cov.update(np.where(self._prev_px > 0, prices / self._prev_px - 1.0, np.nan))
+        self._prev_px = prices.copy()
+
+    def sigma(self, x: np.ndarray) -> float:
+        """Desvío diario en moneda de una cartera con notionales `x`."""
+        c = self.cov.matrix()
+        return float(np.sqrt(max(0.0, x @ c @ x)))
+
+    def record(self, equity: float, x: np.ndarray) -> Dict[str, float]:
+        """Cierre del día: suma el retorno de equity a la ventana y devuelve las cifras VaR/ES."""
+        if self._prev_eq:
+            self.tail.push(equity / self._prev_eq - 1.0)
+        self._prev_eq = equity
+        s = self.sigma(x) / equity if equity > 0 else 0.0
+        var_h, var_p = self.tail.var(), self.z * s
+        if var_p > 0 and np.isfinite(var_h):
+            self.tail_mult = min(MAX_TAIL_MULT, max(1.0, var_h / var_p))
+        return {"var_hist": var_h, "es_hist": self.tail.es(), "var_param": var_p, "es_param": self.es_z * s}
+
+    def limit_sigma(self, equity: float, budget: float) -> float:
+        """
+        sigma máximo (moneda) para que el VaR paramétrico, inflado por la cola
+        histórica cuando esta es más gruesa que la normal, quede dentro de `budget` * equity.
+        """
+        return budget * equity / (self.z * self.tail_mult)
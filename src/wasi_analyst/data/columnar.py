@@ -0,0 +1,246 @@
+from __future__ import annotations
+import hashlib
+import os
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+# --------- Replay de OHLCV local (Parquet / Arrow IPC / CSV) ----------
+#
+# Lee datasets columnares (particionados o no) con pushdown de símbolos y rango
+# de fechas, vía pyarrow.dataset o DuckDB. Los record batches se consumen de a
+# poco a medida que avanza la simulación: en memoria hay como mucho
+# `read_ahead_days` barras (más el batch en curso de cada archivo).
+#
+# Formato esperado (nombres configurables): una fila por (fecha, símbolo) con
+# columnas date, symbol, open, high, low, close, volume. Cada archivo debe venir
+# ordenado por fecha; con pyarrow los archivos (p.ej. particiones hive por
+# símbolo) se mezclan por fecha, DuckDB hace ORDER BY. Filas fuera de orden son
+# un error (no se descartan).
+
+OHLCV = ("open", "high", "low", "close", "volume")
+
+
+class ColumnarReplay:
+    def __init__(
+        self,
+        path: str,
+        symbols: List[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        fmt: str = "parquet",              # parquet | arrow | csv
+        engine: str = "pyarrow",           # pyarrow | duckdb
+        read_ahead_days: int = 64,
+        batch_rows: int = 65_536,
+        date_col: str = "date",
+        symbol_col: str = "symbol",
+    ):
+        if fmt not in ("parquet", "arrow", "csv"):
+            raise ValueError(f"formato no soportado: {fmt!r}")
+        if engine not in ("pyarrow", "duckdb"):
+            raise ValueError(f"engine no soportado: {engine!r}")
+        if engine == "duckdb" and fmt == "arrow":
+            raise ValueError("DuckDB no lee Arrow IPC: usá engine='pyarrow'")
+
+        self.path = path
+        self.symbols = list(dict.fromkeys([s.upper() for s in symbols]))
+        self._pos = {s: j for j, s in enumerate(self.symbols)}
+        self.start, self.end = start, end
+        self.fmt, self.engine = fmt, engine
+        self.read_ahead_days = max(1, int(read_ahead_days))
+        self.batch_rows = int(batch_rows)
+        self.date_col, self.symbol_col = date_col, symbol_col
+
+        self._batches = self._open()
+        self._ready: Deque[Tuple[object, np.ndarray]] = deque()  # (fecha, matriz 5 x S)
+        self._open_date = None
+        self._open_bar: Optional[np.ndarray] = None
+        self._exhausted = False
+        self._cols: Dict[tuple, np.ndarray] = {}
+
+        self.date = None
+        self.bar = np.full((len(OHLCV), len(self.symbols)), np.nan)  # barra actual (5 x S)
+
+    def fingerprint(self) -> str:
+        """Parámetros de lectura + (ruta, tamaño, mtime) de cada archivo del dataset."""
+        h = hashlib.sha256(repr((self.symbols, self.start, self.end, self.fmt, self.date_col,
+                                 self.symbol_col)).encode())
+        paths = [self.path] if os.path.isfile(self.path) else sorted(
+            os.path.join(root, f) for root, _, files in os.walk(self.path) for f in files)
+        for p in paths:
+            st = os.stat(p)
+            h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}".encode())
+        return "columnar:" + h.hexdigest()
+
+    # ---------- lectura ----------
+
+    def _open(self) -> Iterator:
+        cols = [self.date_col, self.symbol_col, *OHLCV]
+        if self.engine == "duckdb":
+            return self._open_duckdb(cols)
+        return self._open_pyarrow(cols)
+
+    def _open_pyarrow(self, cols: List[str]) -> Iterator:
+        try:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+        except Exception as e:
+            raise RuntimeError("Falta 'pyarrow'. Instalalo con: pip install pyarrow") from e
+
+        fmt = "ipc" if self.fmt == "arrow" else self.fmt
+        dataset = ds.dataset(self.path, format=fmt, partitioning="hive")
+        dtype = dataset.schema.field(self.date_col).type
+        flt = ds.field(self.symbol_col).isin(self.symbols)
+        if self.start:
+            flt = flt & (ds.field(self.date_col) >= pa.scalar(self.start).cast(dtype))
+        if self.end:
+            flt = flt & (ds.field(self.date_col) <= pa.scalar(self.end).cast(dtype))
+        # los fragments se leen en orden de path: particionado por símbolo, cada uno
+        # cubre todas las fechas, así que se mezclan por fecha en vez de encadenarse
+        fragments = list(dataset.get_fragments(filter=flt))
+        return self._merge_by_date(fragments, dataset.schema, cols, flt)
+
+    def _merge_by_date(self, fragments: list, schema, cols: List[str], flt) -> Iterator:
+        """
+        Merge k-way por fecha de fragments ordenados por fecha: en cada paso emite las
+        filas hasta la menor de las últimas fechas de los batches en curso (a lo sumo
+        un batch en memoria por fragment).
+        """
+        import pyarrow as pa
+
+        # [iterador, batch, fechas, offset] por fragment
+        heads = [[iter(f.to_batches(schema=schema, columns=cols, filter=flt, batch_size=self.batch_rows,
+                                    batch_readahead=2)), None, None, 0] for f in fragments]
+
+        def load(h) -> bool:
+            while h[1] is None or h[3] >= len(h[2]):
+                try:
+                    b = next(h[0])
+                except StopIteration:
+                    return False
+                if b.num_rows == 0:
+                    continue
+                d = b.column(self.date_col).to_numpy(zero_copy_only=False)
+                if (d[1:] < d[:-1]).any() or (h[2] is not None and d[0] < h[2][-1]):
+                    raise ValueError(f"{self.path}: hay un archivo sin ordenar por '{self.date_col}'")
+                h[1], h[2], h[3] = b, d, 0
+            return True
+
+        live = [h for h in heads if load(h)]
+        while live:
+            bound = min(h[2][-1] for h in live)
+            parts = []
+            for h in live:
+                k = int(np.searchsorted(h[2], bound, side="right"))
+                if k > h[3]:
+                    parts.append(h[1].slice(h[3], k - h[3]))
+                    h[3] = k
+            if len(parts) == 1:
+                yield parts[0]
+            else:
+                # sort_by es estable: dentro de una fecha se respeta el orden de los fragments
+                yield from pa.Table.from_batches(parts).sort_by(self.date_col).to_batches()
+            live = [h for h in live if load(h)]
+
+    def _open_duckdb(self, cols: List[str]) -> Iterator:
+        try:
+            import duckdb  # type: ignore
+        except Exception as e:
+            raise RuntimeError("Falta 'duckdb'. Instalalo con: pip install duckdb") from e
+
+        reader = "read_parquet" if self.fmt == "parquet" else "read_csv_auto"
+        if any(ch in self.path for ch in "*?") or self.path.endswith((".parquet", ".csv")):
+            src = self.path
+        else:  # directorio (posiblemente particionado hive)
+            src = f"{self.path.rstrip('/')}/**/*.{'parquet' if self.fmt == 'parquet' else 'csv'}"
+        src = src.replace("'", "''")
+        where = [f'list_contains($syms, "{self.symbol_col}")']
+        params: Dict[str, object] = {"syms": self.symbols}
+        if self.start:
+            where.append(f'"{self.date_col}" >= CAST($start AS DATE)')
+            params["start"] = self.start
+        if self.end:
+            where.append(f'"{self.date_col}" <= CAST($end AS DATE)')
+            params["end"] = self.end
+        sql = (
+            f"SELECT {', '.join(chr(34) + c + chr(34) for c in cols)} "
+            f"FROM {reader}('{src}', hive_partitioning=true) "
+            f"WHERE {' AND '.join(where)} ORDER BY \"{self.date_col}\""
+        )
+        self._con = duckdb.connect()
+        rel = self._con.execute(sql, params)
+        return iter(rel.fetch_record_batch(self.batch_rows))
+
+    def _fill(self) -> None:
+        """Consume batches hasta tener `read_ahead_days` barras cerradas (o fin del stream)."""
+        while len(self._ready) < self.read_ahead_days and not self._exhausted:
+            try:
+                batch = next(self._batches)
+            except StopIteration:
+                self._exhausted = True
+                if self._open_bar is not None:
+                    self._ready.append((self._open_date, self._open_bar))
+                    self._open_date, self._open_bar = None, None
+                break
+            if batch.num_rows == 0:
+                continue
+            self._ingest(batch)
+
+    def _ingest(self, batch) -> None:
+        d = batch.column(self.date_col).to_numpy(zero_copy_only=False)
+        sym = batch.column(self.symbol_col).to_pylist()
+        j = np.fromiter((self._pos.get(str(s).upper(), -1) for s in sym), dtype=np.intp, count=len(sym))
+        vals = np.vstack([batch.column(c).to_numpy(zero_copy_only=False).astype(float) for c in OHLCV])
+
+        # cortes donde cambia la fecha (el dataset viene ordenado por fecha)
+        cuts = np.flatnonzero(d[1:] != d[:-1]) + 1
+        for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len(d)]):
+            date = d[lo]
+            if self._open_date is not None and date != self._open_date:
+                if date < self._open_date:
+                    raise ValueError(f"{self.path}: fila del {date} después del {self._open_date} "
+                                     f"(el dataset debe venir ordenado por '{self.date_col}')")
+                self._ready.append((self._open_date, self._open_bar))
+                self._open_date, self._open_bar = None, None
+            if self._open_bar is None:
+                self._open_date = date
+                self._open_bar = np.full((len(OHLCV), len(self.symbols)), np.nan)
+            ok = j[lo:hi] >= 0
+            self._open_bar[:, j[lo:hi][ok]] = vals[:, lo:hi][:, ok]
+
+    # ---------- interfaz PriceProvider ----------
+
+    def advance(self) -> bool:
+        """Pasa a la próxima barra. False si el dataset se terminó (se repite la última)."""
+        if not self._ready:
+            self._fill()
+        if not self._ready:
+            return False
+        self.date, bar = self._ready.popleft()
+        # símbolos sin dato ese día: se mantiene la última barra conocida
+        self.bar = np.where(np.isnan(bar), self.bar, bar)
+        return True
+
+    def current_bar(self, symbols: List[str]) -> Dict[str, np.ndarray]:
+        """OHLCV de la barra actual alineado a `symbols` (NaN si no hay dato)."""
+        cols = self._columns(symbols)
+        out = np.where(cols >= 0, self.bar[:, cols], np.nan)
+        return dict(zip(OHLCV, out))
+
+    def _columns(self, symbols: List[str]) -> np.ndarray:
+        key = tuple(symbols)
+        cols = self._cols.get(key)
+        if cols is None:
+            cols = self._cols[key] = np.array([self._pos.get(s.upper(), -1) for s in symbols], dtype=np.intp)
+        return cols
+
+    def next_prices(self, symbols: List[str], last: np.ndarray, day: int) -> np.ndarray:
+        self.advance()
+        close = self.bar[OHLCV.index("close")]
+        cols = self._columns(symbols)
+        vals = np.where(cols >= 0, close[cols], np.nan)
+        return np.where(np.isfinite(vals), vals, last)
+
+    def next_price(self, symbol: str, last: float, day: int) -> float:
+        # versión escalar: avanza una barra por llamada; usar next_prices() para el universo
+        return float(self.next_prices([symbol], np.array([last]), day)[0])
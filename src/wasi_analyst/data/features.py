@@ -0,0 +1,235 @@
+from __future__ import annotations
+import glob
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from wasi_analyst.util.logging import get_logger
+
+if TYPE_CHECKING:
+    from wasi_analyst.util.config import WasiConfig
+
+# --------- Cubo de features precalculado ----------
+#
+# Para un replay fijo (precios que no dependen del trading, p.ej. data/shared.py)
+# las features de cada día solo dependen de la matriz de cierres y de la ventana.
+# El cubo las calcula UNA vez para todas las ventanas pedidas:
+#
+#     cube[feature, ventana, día, símbolo]     feature in FEATURES
+#
+# en una sola pasada vectorizada (SMA por suma acumulada, max/min deslizante de
+# van Herk/Gil-Werman, desvío rodante por sumas acumuladas de retornos) y lo
+# deja en disco como .npy que se abre con mmap: todas las corridas de un sweep
+# leen las mismas páginas. Los valores coinciden con Coordinator._features_matrix
+# sobre el ring (mismas reglas de borde para los primeros días).
+#
+# Clave = fingerprint de los datos + símbolos. Si se piden ventanas que el cubo
+# no tiene, se arma uno nuevo con la unión y se borran los que quedan cubiertos.
+
+FEATURES = ("sma", "mom", "vol", "hi", "lo")
+
+
+def default_root() -> str:
+    return os.getenv("WASI_FEATURE_DIR", "artifacts/features")
+
+
+def feature_windows(cfg: WasiConfig) -> Dict[str, int]:
+    """Ventana efectiva de cada feature para una config (los mínimos de siempre)."""
+    w_brk = max(2, cfg.sentiment_break_window)
+    return {
+        "sma": max(1, cfg.fundamental_sma_window),
+        "mom": max(1, cfg.macro_mom_window),
+        "vol": w_brk,   # proxy: misma ventana que el breakout
+        "hi": w_brk,
+        "lo": w_brk,
+    }
+
+
+# ---------- kernels (matriz día x símbolo -> matriz día x símbolo) ----------
+
+def rolling_mean(C: np.ndarray, w: int) -> np.ndarray:
+    """Media de las últimas min(w, d+1) filas, vía suma acumulada (centrada en la primera fila)."""
+    D = len(C)
+    base = C[0]
+    cs = np.vstack((np.zeros((1, C.shape[1])), np.cumsum(C - base, axis=0)))
+    end = np.arange(1, D + 1)
+    start = np.maximum(0, end - w)
+    return base + (cs[end] - cs[start]) / (end - start)[:, None]
+
+
+def momentum(C: np.ndarray, w: int) -> np.ndarray:
+    """C[d] / C[d-w+1] - 1 desde el día w (antes: 0), como en el ring."""
+    out = np.zeros_like(C)
+    if w < len(C):
+        out[w:] = C[w:] / C[1:len(C) - w + 1] - 1.0
+    return out
+
+
+def rolling_extreme(C: np.ndarray, w: int, fn=np.maximum) -> np.ndarray:
+    """
+    Max (o min con fn=np.minimum) de las últimas min(w, d+1) filas en O(1) por celda
+    (van Herk/Gil-Werman): prefijos y sufijos acumulados por bloques de w.
+    """
+    if w <= 1:
+        return C.copy()
+    D, S = C.shape
+    fill = -np.inf if fn is np.maximum else np.inf
+    M = -(-(D + w - 1) // w) * w
+    X = np.full((M, S), fill)
+    X[w - 1:w - 1 + D] = C
+    blocks = X.reshape(M // w, w, S)
+    pre = fn.accumulate(blocks, axis=1).reshape(M, S)
+    suf = fn.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(M, S)
+    return fn(suf[:D], pre[w - 1:w - 1 + D])
+
+
+def rolling_std(C: np.ndarray, w: int) -> np.ndarray:
+    """
+    Desvío (ddof=0) de los últimos min(d, w) retornos simples; 0 si hay menos de
+    2 válidos. Los retornos se centran antes de acumular para no perder precisión.
+    """
+    D, S = C.shape
+    r = np.full((D, S), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r[1:] = np.where(C[:-1] > 0, C[1:] / C[:-1] - 1.0, np.nan)
+    ok = ~np.isnan(r)
+    r = np.where(ok, r - np.nanmean(r, axis=0) if ok.any() else 0.0, 0.0)
+    z = np.zeros((1, S))
+    cn = np.vstack((z, np.cumsum(ok, axis=0)))
+    c1 = np.vstack((z, np.cumsum(r, axis=0)))
+    c2 = np.vstack((z, np.cumsum(r * r, axis=0)))
+    end = np.arange(1, D + 1)
+    start = end - np.minimum(end - 1, w)   # win = min(d, w) retornos
+    n = cn[end] - cn[start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = (c1[end] - c1[start]) / n
+        var = (c2[end] - c2[start]) / n - m * m
+    return np.where(n >= 2, np.sqrt(np.maximum(var, 0.0)), 0.0)
+
+
+def build_cube(C: np.ndarray, windows: Iterable[int], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Arma (o llena `out`, p.ej. un memmap) el cubo FEATURES x ventanas x días x símbolos."""
+    C = np.asarray(C, dtype=float)
+    windows = sorted(set(int(w) for w in windows))
+    if out is None:
+        out = np.empty((len(FEATURES), len(windows)) + C.shape)
+    for k, w in enumerate(windows):
+        out[0, k] = rolling_mean(C, w)
+        out[1, k] = momentum(C, w)
+        out[2, k] = rolling_std(C, w)
+        out[3, k] = rolling_extreme(C, w, np.maximum)
+        out[4, k] = rolling_extreme(C, w, np.minimum)
+    return out
+
+
+# ---------- cubo en disco ----------
+
+class FeatureCube:
+    """Handle de solo lectura a un cubo publicado (memmaps)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+        self.symbols: List[str] = self.meta["symbols"]
+        self.windows: List[int] = self.meta["windows"]
+        self.finite: bool = bool(self.meta["finite"])
+        self.cube = np.load(os.path.join(path, "cube.npy"), mmap_mode="r")
+        self.close = np.load(os.path.join(path, "close.npy"), mmap_mode="r")
+        self._fi = {f: i for i, f in enumerate(FEATURES)}
+        self._wi = {w: i for i, w in enumerate(self.windows)}
+
+    @property
+    def days(self) -> int:
+        return int(self.close.shape[0])
+
+    def covers(self, windows: Iterable[int], days: int = 0) -> bool:
+        return set(windows) <= set(self.windows) and self.days >= days
+
+    def series(self, feature: str, window: int) -> np.ndarray:
+        """Vista (día x símbolo) de una feature para una ventana."""
+        return self.cube[self._fi[feature], self._wi[int(window)]]
+
+    def features(self, day: int, windows: Dict[str, int], cols: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Features del día como las arma el ring: price + una por FEATURES (copias)."""
+        sel = slice(None) if cols is None else cols
+        out = {"price": np.array(self.close[day, sel])}
+        for f, w in windows.items():
+            out[f] = np.array(self.cube[self._fi[f], self._wi[w], day, sel])
+        return out
+
+    # ---------- publicación / búsqueda ----------
+
+    @staticmethod
+    def _key(fingerprint: str, symbols: List[str]) -> str:
+        return hashlib.sha256(repr((fingerprint, list(symbols))).encode()).hexdigest()[:16]
+
+    @classmethod
+    def lookup(cls, fingerprint: str, symbols: List[str], windows: Iterable[int], days: int = 0,
+               root: Optional[str] = None) -> Optional["FeatureCube"]:
+        """El primer cubo publicado para estos datos que cubra las ventanas, o None."""
+        windows = set(windows)
+        for meta in sorted(glob.glob(os.path.join(root or default_root(), cls._key(fingerprint, symbols) + "-*", "meta.json"))):
+            try:
+                cube = cls(os.path.dirname(meta))
+            except (OSError, ValueError, KeyError):
+                continue  # borrado o a medio publicar por otro proceso
+            if cube.covers(windows, days):
+                return cube
+        return None
+
+    @classmethod
+    def ensure(cls, close: np.ndarray, fingerprint: str, symbols: List[str], windows: Iterable[int],
+               root: Optional[str] = None) -> "FeatureCube":
+        """Devuelve un cubo que cubra `windows`; si no existe, lo arma con la unión de lo ya publicado."""
+        root = root or default_root()
+        windows = set(int(w) for w in windows)
+        close = np.asarray(close, dtype=float)
+        hit = cls.lookup(fingerprint, symbols, windows, len(close), root)
+        if hit is not None:
+            return hit
+
+        key = cls._key(fingerprint, symbols)
+        old = []
+        for p in glob.glob(os.path.join(root, key + "-*", "meta.json")):
+            try:
+                with open(p, encoding="utf-8") as fh:
+                    meta = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if meta["days"] <= len(close):  # los más largos siguen sirviendo para otros pedidos
+                windows |= set(meta["windows"])
+                old.append(os.path.dirname(p))
+        wins = sorted(windows)
+        final = os.path.join(root, f"{key}-{hashlib.sha256(repr((wins, len(close))).encode()).hexdigest()[:8]}")
+        if not os.path.isfile(os.path.join(final, "meta.json")):
+            os.makedirs(root, exist_ok=True)
+            tmp = os.path.join(root, f".tmp-{key}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+            os.makedirs(tmp)
+            try:
+                np.save(os.path.join(tmp, "close.npy"), close)
+                out = np.lib.format.open_memmap(os.path.join(tmp, "cube.npy"), mode="w+", dtype=np.float64,
+                                                shape=(len(FEATURES), len(wins)) + close.shape)
+                build_cube(close, wins, out)
+                out.flush()
+                del out
+                with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+                    json.dump({"fingerprint": fingerprint, "symbols": list(symbols), "features": list(FEATURES),
+                               "windows": wins, "days": len(close), "finite": bool(np.isfinite(close).all())}, fh)
+                os.rename(tmp, final)  # atómico; si otro proceso ganó, usamos el suyo
+            except OSError:
+                pass
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            get_logger().info("feature_cube_built", name=os.path.basename(final), windows=wins, days=len(close))
+        # los cubos que quedaron cubiertos por el nuevo sobran (los memmaps abiertos siguen válidos)
+        for p in old:
+            if p != final:
+                shutil.rmtree(p, ignore_errors=True)
+        return cls(final)
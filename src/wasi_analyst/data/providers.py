@@ -1,20 +1,34 @@
 from __future__ import annotations
+import hashlib
 import random
 from typing import Dict, List
-import pandas as pd
+import numpy as np
+
+from wasi_analyst.util.logging import get_logger
 
 # --------- Demo provider: precios sintéticos ----------
 class RandomWalkProvider:
     def __init__(self, seed: int = 123, drift: float = 0.0005, vol: float = 0.02):
         random.seed(seed)
+        self.seed = seed
         self.drift = drift
         self.vol = vol
 
+    def fingerprint(self) -> str:
+        """Identifica la serie de precios que va a generar (para la caché de corridas)."""
+        return f"randomwalk:{self.seed}:{self.drift!r}:{self.vol!r}"
+
     def next_price(self, symbol: str, last: float, day: int) -> float:
         from random import gauss
         shock = gauss(self.drift, self.vol)
         return max(1.0, last * (1.0 + shock))
 
+    def next_prices(self, symbols: List[str], last: np.ndarray, day: int) -> np.ndarray:
+        # misma secuencia de shocks que next_price() símbolo a símbolo (reproducible por seed)
+        from random import gauss
+        shocks = np.fromiter((gauss(self.drift, self.vol) for _ in symbols), dtype=float, count=len(symbols))
+        return np.maximum(1.0, last * (1.0 + shocks))
+
 
 # --------- Market replay con datos reales (Yahoo Finance) ----------
 class YahooDailyReplay:
@@ -28,6 +42,7 @@ class YahooDailyReplay:
         except Exception as e:
             raise RuntimeError("Falta 'yfinance'. Instalalo con: pip install yfinance") from e
 
+        import pandas as pd
         from functools import lru_cache
 
         self.symbols = list(dict.fromkeys([s.upper() for s in symbols]))  # únicos, mantiene orden
@@ -56,12 +71,28 @@ class YahooDailyReplay:
                 ser = pd.Series(closes, dtype=float).dropna()
                 self._series[s] = ser.tolist()
             except Exception as e:
-                print(f"[WARN] YahooDailyReplay: no pude cargar {s} ({e}) -> fallback 100.0")
+                get_logger().warning("yahoo_symbol_load_failed", symbol=s, error=str(e), fallback=100.0)
                 self._series[s] = [100.0]
 
         # largo máximo entre series (para no pasarnos de rango)
         self._max_len = max(len(v) for v in self._series.values()) if self._series else 1
 
+        # matriz (día x símbolo); las series cortas repiten su último valor
+        self._matrix = np.full((self._max_len, len(self.symbols)), np.nan)
+        for j, s in enumerate(self.symbols):
+            seq = self._series[s]
+            if seq:
+                self._matrix[:len(seq), j] = seq
+                self._matrix[len(seq):, j] = seq[-1]
+        self._cols: Dict[tuple, np.ndarray] = {}
+        self._period, self._interval = period, interval
+
+    def fingerprint(self) -> str:
+        h = hashlib.sha256(",".join(self.symbols).encode())
+        h.update(f"{self._period}:{self._interval}".encode())
+        h.update(np.ascontiguousarray(self._matrix).tobytes())
+        return "yahoo:" + h.hexdigest()
+
     def next_price(self, symbol: str, last: float, day: int) -> float:
         seq = self._series.get(symbol)
         if not seq:
@@ -75,3 +106,16 @@ class YahooDailyReplay:
             if self._idx < self._max_len - 1:
                 self._idx += 1
         return px
+
+    def next_prices(self, symbols: List[str], last: np.ndarray, day: int) -> np.ndarray:
+        key = tuple(symbols)
+        cols = self._cols.get(key)
+        if cols is None:
+            pos = {s: j for j, s in enumerate(self.symbols)}
+            cols = self._cols[key] = np.array([pos.get(s.upper(), -1) for s in symbols], dtype=np.intp)
+        row = self._matrix[min(self._idx, self._max_len - 1)]
+        vals = row[cols]
+        out = np.where((cols >= 0) & np.isfinite(vals), vals, last)
+        if self._idx < self._max_len - 1:
+            self._idx += 1
+        return out
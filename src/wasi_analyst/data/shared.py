@@ -0,0 +1,286 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from wasi_analyst.util.logging import get_logger
+
+# --------- Plano de datos de mercado compartido entre procesos ----------
+#
+# Las matrices alineadas (día x símbolo) de precios/volumen se publican una vez
+# como archivos .npy en un directorio (en /dev/shm si existe: memoria, sin disco)
+# y cada proceso las abre con np.load(mmap_mode="r"): vistas NumPy de solo
+# lectura sobre las mismas páginas, sin copias.
+#
+# Conteo de referencias: cada handle abierto deja un archivo refs/<pid>-<id>.
+# gc() borra las referencias de procesos muertos (sobrevive a crashes) y los
+# datasets que quedaron sin referencias vivas; corre al publicar, al hacer attach
+# y al cerrar. Un handle crea su referencia ANTES de leer el dataset y gc lo
+# retira con un rename atómico antes de borrarlo, así ninguno de los dos lados
+# puede quedarse con un dataset a medio borrar.
+
+
+_RETRIES = 3
+
+
+def default_root() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+    return os.getenv("WASI_SHARED_DIR", os.path.join(base, "wasi-market"))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe pero es de otro usuario
+    return True
+
+
+def _new_ref(path: str, create: bool = False) -> str:
+    """Referencia nueva en `path`; FileNotFoundError si el dataset no existe (no lo recrea)."""
+    ref_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    if create:
+        os.makedirs(os.path.join(path, "refs"), exist_ok=True)
+    open(os.path.join(path, "refs", ref_id), "w").close()
+    return ref_id
+
+
+class SharedMarketData:
+    """Handle a un dataset publicado. `arrays[nombre]` son memmaps de solo lectura."""
+
+    def __init__(self, path: str, ref: Optional[str] = None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._ref = ref or _new_ref(path)  # primero la referencia: desde acá gc no lo borra
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as fh:
+                self.meta = json.load(fh)
+            self.symbols: List[str] = self.meta["symbols"]
+            self.arrays: Dict[str, np.ndarray] = {
+                k: np.load(os.path.join(path, f"{k}.npy"), mmap_mode="r") for k in self.meta["arrays"]
+            }
+            if not os.path.exists(os.path.join(path, "refs", self._ref)):
+                raise FileNotFoundError(path)  # gc lo retiró mientras lo abríamos
+        except FileNotFoundError:
+            self._drop_ref()
+            raise
+
+    # ---------- publicación / attach ----------
+
+    @classmethod
+    def publish(cls, name: str, symbols: List[str], arrays: Dict[str, np.ndarray],
+                root: Optional[str] = None, **meta) -> "SharedMarketData":
+        """Publica (o reutiliza, si ya existe con ese nombre) y devuelve un handle."""
+        root = root or default_root()
+        final = os.path.join(root, name)
+        gc(root)
+        for _ in range(_RETRIES):
+            try:
+                return cls(final)
+            except FileNotFoundError:
+                pass
+            os.makedirs(root, exist_ok=True)
+            tmp = os.path.join(root, f".tmp-{name}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+            os.makedirs(tmp)
+            for k, a in arrays.items():
+                np.save(os.path.join(tmp, f"{k}.npy"), np.ascontiguousarray(a))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+                json.dump({"symbols": list(symbols), "arrays": sorted(arrays), "owner": os.getpid(), **meta}, fh)
+            ref = _new_ref(tmp, create=True)  # la referencia viaja con el rename: gc() no puede borrarlo en el medio
+            try:
+                os.rename(tmp, final)  # atómico: si otro proceso ganó la carrera, usamos el suyo
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+                continue
+            return cls(final, ref)
+        raise RuntimeError(f"no se pudo publicar el dataset compartido {name}")
+
+    @classmethod
+    def attach(cls, name: str, root: Optional[str] = None) -> "SharedMarketData":
+        root = root or default_root()
+        gc(root)
+        for i in range(_RETRIES):
+            try:
+                return cls(os.path.join(root, name))
+            except FileNotFoundError:
+                time.sleep(0.01 * i)  # gc puede devolverlo a su lugar si vio nuestra referencia
+        raise FileNotFoundError(f"dataset compartido inexistente: {name}")
+
+    def _drop_ref(self) -> None:
+        try:
+            os.remove(os.path.join(self.path, "refs", self._ref))
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Suelta la referencia; el último en salir borra el dataset."""
+        self.arrays = {}
+        self._drop_ref()
+        gc(os.path.dirname(self.path), only=self.name)
+
+    def __enter__(self) -> "SharedMarketData":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    @property
+    def days(self) -> int:
+        return int(self.arrays["close"].shape[0])
+
+
+def gc(root: Optional[str] = None, only: Optional[str] = None) -> List[str]:
+    """Limpia referencias de procesos muertos y datasets sin referencias vivas."""
+    root = root or default_root()
+    removed: List[str] = []
+    if not os.path.isdir(root):
+        return removed
+    for name in os.listdir(root):
+        if only is not None and name != only:
+            continue
+        path = os.path.join(root, name)
+        if name.startswith(".tmp-"):
+            pid = int(name.split("-")[-2]) if name.split("-")[-2].isdigit() else -1
+            if not _pid_alive(pid):
+                shutil.rmtree(path, ignore_errors=True)  # publicación a medias de un proceso caído
+            continue
+        if os.path.isdir(path) and _live_refs(path) == 0 and _retire(root, name):
+            removed.append(name)
+    if removed:
+        get_logger().info("shared_market_gc", removed=removed)
+    return removed
+
+
+def _live_refs(path: str) -> int:
+    """Referencias de procesos vivos (las de procesos muertos se borran)."""
+    refs = os.path.join(path, "refs")
+    try:
+        names = os.listdir(refs)
+    except FileNotFoundError:
+        return 0
+    live = 0
+    for ref in names:
+        if _pid_alive(int(ref.split("-")[0])):
+            live += 1
+        else:
+            try:
+                os.remove(os.path.join(refs, ref))
+            except FileNotFoundError:
+                pass
+    return live
+
+
+def _retire(root: str, name: str) -> bool:
+    """
+    Saca el dataset de su nombre con un rename atómico y recién ahí lo borra. Si entre
+    el conteo y el rename alguien tomó una referencia, vuelve a su lugar.
+    """
+    dead = os.path.join(root, f".tmp-gc-{name}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+    try:
+        os.rename(os.path.join(root, name), dead)
+    except OSError:
+        return False  # otro gc se nos adelantó
+    if _live_refs(dead):
+        try:
+            os.rename(dead, os.path.join(root, name))
+            return False
+        except OSError:
+            pass  # ya se publicó otro con ese nombre: el viejo sobra
+    shutil.rmtree(dead, ignore_errors=True)
+    return True
+
+
+# ---------- integración con providers ----------
+
+def materialize(provider, symbols: List[str], days: int, start_price: float = 100.0) -> Dict[str, np.ndarray]:
+    """
+    Corre el provider `days` pasos y devuelve las matrices alineadas (día x símbolo).
+    Es el camino de precios sin impacto permanente (como con fill_model="sqrt"); a partir de
+    ahí el dataset es un replay: el trading ya no mueve los precios publicados.
+    """
+    close = np.empty((days, len(symbols)))
+    volume = np.full((days, len(symbols)), np.nan)
+    last = np.full(len(symbols), float(start_price))
+    bar = getattr(provider, "current_bar", None)
+    for d in range(days):
+        if hasattr(provider, "next_prices"):
+            last = np.asarray(provider.next_prices(symbols, last, d), dtype=float)
+        else:
+            last = np.array([provider.next_price(s, float(p), d) for s, p in zip(symbols, last)])
+        close[d] = last
+        if bar is not None:
+            volume[d] = bar(symbols)["volume"]
+    return {"close": close, "volume": volume}
+
+
+def publish_provider(provider, symbols: List[str], days: int, start_price: float = 100.0,
+                     root: Optional[str] = None) -> SharedMarketData:
+    """Publica la serie de un provider; el nombre sale de su fingerprint (idempotente)."""
+    fp = provider.fingerprint() if hasattr(provider, "fingerprint") else None
+    if fp is None:
+        raise ValueError("el provider necesita fingerprint() para publicarse")
+    name = hashlib.sha256(repr((fp, list(symbols), days, start_price)).encode()).hexdigest()[:16]
+    try:
+        return SharedMarketData.attach(name, root)  # ya publicado: no se vuelve a materializar
+    except FileNotFoundError:
+        pass
+    return SharedMarketData.publish(name, symbols, materialize(provider, symbols, days, start_price),
+                                    root=root, fingerprint=fp)
+
+
+class SharedReplay:
+    """PriceProvider que reproduce un dataset compartido (vistas de solo lectura)."""
+
+    def __init__(self, data: SharedMarketData):
+        self.data = data
+        self._close = data["close"]
+        self._pos = {s: j for j, s in enumerate(data.symbols)}
+        self._cols: Dict[tuple, np.ndarray] = {}
+        self._idx = 0
+
+    @classmethod
+    def attach(cls, name: str, root: Optional[str] = None) -> "SharedReplay":
+        return cls(SharedMarketData.attach(name, root))
+
+    def fingerprint(self) -> str:
+        return "shared:" + str(self.data.meta.get("fingerprint") or self.data.name)
+
+    def feature_cube(self, symbols: List[str], windows: Dict[str, int]):
+        """
+        (FeatureCube, columnas) con las features precalculadas del dataset (data/features.py),
+        o None si falta algún símbolo o hay precios no finitos (ahí el ring rellena con el último).
+        """
+        from wasi_analyst.data.features import FeatureCube
+        cols = np.array([self._pos.get(s.upper(), -1) for s in symbols], dtype=np.intp)
+        if (cols < 0).any():
+            return None
+        cube = FeatureCube.ensure(self._close, self.fingerprint(), self.data.symbols, set(windows.values()))
+        return (cube, cols) if cube.finite else None
+
+    def next_prices(self, symbols: List[str], last: np.ndarray, day: int) -> np.ndarray:
+        key = tuple(symbols)
+        cols = self._cols.get(key)
+        if cols is None:
+            cols = self._cols[key] = np.array([self._pos.get(s.upper(), -1) for s in symbols], dtype=np.intp)
+        row = self._close[min(self._idx, len(self._close) - 1)]
+        vals = np.where(cols >= 0, row[cols], np.nan)
+        self._idx += 1
+        return np.where(np.isfinite(vals), vals, last)
+
+    def next_price(self, symbol: str, last: float, day: int) -> float:
+        return float(self.next_prices([symbol], np.array([last]), day)[0])
+
+    def close(self) -> None:
+        self.data.close()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from wasi_analyst.util.settings import LLMSettings, get_llm_settings
+
+# Backends de LLM intercambiables (agents/llm_mixins y providers/llm.chat_json):
+#   openai  -> HTTP compatible con OpenAI (OPENAI_BASE_URL), con resiliencia
+#   mock    -> local y determinista (HOLD para cada símbolo del prompt)
+#   record  -> llama al backend real y graba cada respuesta en disco
+#   replay  -> responde solo desde lo grabado (sin red; falla si no está)
+# Se elige con WASI_LLM_BACKEND (default: openai).
+
+_ROW = re.compile(r"^([A-Z0-9][A-Z0-9.\-]*),", re.MULTILINE)
+
+
+def prompt_symbols(user: str) -> List[str]:
+    """Símbolos de la tabla CSV del prompt (ver agents/prompting.py)."""
+    return list(dict.fromkeys(_ROW.findall(user or "")))
+
+
+def extract_json(content: str) -> Optional[Dict[str, Any]]:
+    """Parsea JSON tolerando cercos ```json ...``` o texto alrededor del objeto."""
+    content = (content or "").strip()
+    if content.startswith("```"):
+        content = content.strip("`")
+        # a veces viene como "json\n{...}"
+        if content.lower().startswith("json"):
+            content = content[4:].lstrip()
+    try:
+        data = json.loads(content)
+        return data if isinstance(data, dict) else None
+    except Exception:
+        pass
+    m = re.search(r"\{.*\}", content, flags=re.DOTALL)
+    if m:
+        try:
+            data = json.loads(m.group(0))
+            return data if isinstance(data, dict) else None
+        except Exception:
+            return None
+    return None
+
+
+@dataclass
+class Completion:
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    latency_s: float = 0.0
+    replayed: bool = False
+
+
+class LLMBackend:
+    name = "base"
+
+    def complete(self, system: str, user: str, json_mode: bool = False,
+                 max_tokens: Optional[int] = None) -> Completion:
+        raise NotImplementedError
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self, st: LLMSettings):
+        self.st = st
+
+    def complete(self, system: str, user: str, json_mode: bool = False,
+                 max_tokens: Optional[int] = None) -> Completion:
+        from .llm import get_client
+        from .resilience import get_resilience
+        cli = get_client()
+        if cli is None:
+            raise RuntimeError("LLM deshabilitado (falta OPENAI_API_KEY)")
+        kw: Dict[str, Any] = {}
+        if json_mode:
+            kw["response_format"] = {"type": "json_object"}
+        if max_tokens:
+            kw["max_tokens"] = max_tokens
+        t0 = time.perf_counter()
+        resp = get_resilience().call(lambda: cli.chat.completions.create(
+            model=self.st.model,
+            temperature=self.st.temperature,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            **kw,
+        ))
+        usage = getattr(resp, "usage", None)
+        return Completion(
+            content=(resp.choices[0].message.content or "").strip(),
+            model=self.st.model,
+            prompt_tokens=int(getattr(usage, "prompt_tokens", 0) or 0),
+            latency_s=time.perf_counter() - t0,
+        )
+
+
+class MockBackend(LLMBackend):
+    """Respuestas deterministas sin red; `latency_ms` simula la demora del modelo."""
+    name = "mock"
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = float(latency_ms)
+
+    def complete(self, system: str, user: str, json_mode: bool = False,
+                 max_tokens: Optional[int] = None) -> Completion:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        acts = [{"action": "hold", "symbol": s, "qty": 0, "price": None, "reason": "mock"}
+                for s in prompt_symbols(user)]
+        return Completion(content=json.dumps({"reasoning": "mock", "actions": acts}), model="mock",
+                          latency_s=self.latency_ms / 1000.0)
+
+
+class RecordReplayBackend(LLMBackend):
+    """
+    Graba (modo "record") o reproduce (modo "replay") respuestas en un JSONL,
+    indexadas por hash de (modelo, system, user, json_mode).
+    """
+
+    def __init__(self, path: str, mode: str = "replay", inner: Optional[LLMBackend] = None, model: str = ""):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"modo desconocido: {mode!r}")
+        if mode == "record" and inner is None:
+            raise ValueError("el modo record necesita un backend real")
+        self.name = mode
+        self.path, self.mode, self.inner, self.model = path, mode, inner, model
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self._index[rec["key"]] = rec
+
+    def _key(self, system: str, user: str, json_mode: bool) -> str:
+        h = hashlib.sha256()
+        for part in (self.model, system, user, "json" if json_mode else ""):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def complete(self, system: str, user: str, json_mode: bool = False,
+                 max_tokens: Optional[int] = None) -> Completion:
+        key = self._key(system, user, json_mode)
+        rec = self._index.get(key)
+        if rec is not None:
+            return Completion(content=rec["content"], model=rec["model"], prompt_tokens=rec.get("prompt_tokens", 0),
+                              replayed=True)
+        if self.mode == "replay":
+            raise KeyError(f"respuesta no grabada ({key[:12]})")
+        out = self.inner.complete(system, user, json_mode, max_tokens)
+        rec = {"key": key, "model": out.model, "content": out.content, "prompt_tokens": out.prompt_tokens,
+               "latency_s": out.latency_s}
+        with self._lock:
+            self._index[key] = rec
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(rec) + "\n")
+        return out
+
+
+_cached: tuple = (None, None)
+
+
+def get_backend() -> Optional[LLMBackend]:
+    """Backend según la configuración (None si el LLM está deshabilitado)."""
+    global _cached
+    st = get_llm_settings()
+    key = (st.backend, st.api_key, st.base_url, st.model, st.record_path, st.mock_latency_ms)
+    if _cached[0] == key:
+        return _cached[1]
+    if st.backend == "mock":
+        backend: Optional[LLMBackend] = MockBackend(st.mock_latency_ms)
+    elif st.backend == "replay":
+        backend = RecordReplayBackend(st.record_path, "replay", model=st.model)
+    elif st.backend == "record":
+        backend = RecordReplayBackend(st.record_path, "record", OpenAIBackend(st), model=st.model) \
+            if st.enabled else None
+    elif st.backend == "openai":
+        backend = OpenAIBackend(st) if st.enabled else None
+    else:
+        raise ValueError(f"WASI_LLM_BACKEND desconocido: {st.backend!r}")
+    _cached = (key, backend)
+    return backend
@@ -0,0 +1,140 @@
+"""
+Servidor stub compatible con OpenAI (POST /v1/chat/completions) con inyección
+de fallas, para probar la capa de resiliencia sin red.
+
+Uso:
+    python -m wasi_analyst.providers.fault_server --port 8089 --fail-rate 0.5 --delay 0.2
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8089/v1 wasi --llm ...
+
+Fallas:
+    --fail-rate F   fracción de requests que responden 500
+    --fail-first N  las primeras N requests responden 500 (determinista)
+    --status S      código HTTP de las fallas (500, 429, 503, ...)
+    --delay S       latencia agregada a cada request (segundos)
+    --hang          no responde nunca (se cuelga hasta que el cliente corte)
+
+GET /stats devuelve {"requests": n, "failures": n}. La respuesta OK es HOLD para
+cada símbolo de la tabla CSV del prompt.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from .backends import prompt_symbols
+
+
+class FaultServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, fail_rate: float = 0.0, fail_first: int = 0,
+                 status: int = 500, delay: float = 0.0, hang: bool = False, seed: Optional[int] = 0):
+        self.fail_rate, self.fail_first, self.status = fail_rate, fail_first, status
+        self.delay, self.hang = delay, hang
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self.requests <= self.fail_first or self._rng.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+            return fail
+
+    def _handler(self):
+        srv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):  # silencioso
+                pass
+
+            def _send(self, code: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._send(200, {"requests": srv.requests, "failures": srv.failures})
+                else:
+                    self._send(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                req = json.loads(self.rfile.read(n) or b"{}")
+                if srv.hang:
+                    srv._stop.wait()
+                    return
+                if srv.delay:
+                    time.sleep(srv.delay)
+                if srv._should_fail():
+                    self._send(srv.status, {"error": {"message": "fault injected", "type": "server_error"}})
+                    return
+                msgs = req.get("messages", [])
+                acts = [{"action": "hold", "symbol": s, "qty": 0, "price": None, "reason": "stub"}
+                        for s in prompt_symbols(msgs[-1].get("content", "") if msgs else "")]
+                content = json.dumps({"reasoning": "stub", "actions": acts})
+                self._send(200, {
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()),
+                    "model": req.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+        return Handler
+
+    def start(self) -> "FaultServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="wasi-fault-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FaultServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Stub OpenAI con inyección de fallas")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--fail-first", type=int, default=0)
+    ap.add_argument("--status", type=int, default=500)
+    ap.add_argument("--delay", type=float, default=0.0)
+    ap.add_argument("--hang", action="store_true")
+    args = ap.parse_args(argv)
+    srv = FaultServer(args.host, args.port, args.fail_rate, args.fail_first, args.status, args.delay, args.hang)
+    print(f"fault server en {srv.base_url}", flush=True)
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,38 @@
 from __future__ import annotations
-import json
-from typing import Any, Dict
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 from wasi_analyst.util.settings import get_llm_settings
+from .backends import extract_json, get_backend
+from .resilience import CircuitOpen, RateLimited
 
-def _client() -> OpenAI | None:
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_cached: Tuple[Optional[tuple], Optional["OpenAI"]] = (None, None)
+
+def get_client() -> OpenAI | None:
+    global _cached
     st = get_llm_settings()
     if not st.enabled or not st.api_key:
         return None
-    return OpenAI(api_key=st.api_key)
+    key = (st.api_key, st.base_url, st.timeout)
+    if _cached[0] != key:
+        from openai import OpenAI
+        # los reintentos los maneja providers/resilience, no el SDK
+        _cached = (key, OpenAI(api_key=st.api_key, base_url=st.base_url, timeout=st.timeout, max_retries=0))
+    return _cached[1]
 
 def chat_json(system: str, user: str) -> Dict[str, Any]:
-    cli = _client()
-    if cli is None:
+    backend = get_backend()
+    if backend is None:
         return {"disabled": True}
 
-    st = get_llm_settings()
     try:
-        resp = cli.chat.completions.create(
-            model=st.model,
-            temperature=st.temperature,
-            response_format={"type": "json_object"},
-            messages=[{"role":"system","content":system},{"role":"user","content":user}],
-            timeout=30,  # segundos
-            max_tokens=400,
-        )
-        content = resp.choices[0].message.content or "{}"
-        return json.loads(content)
+        out = backend.complete(system, user, json_mode=True, max_tokens=400)
+    except (CircuitOpen, RateLimited) as e:
+        return {"error": str(e), "actions": [], "reasoning":"llm_unavailable"}
     except Exception as e:
         return {"error": str(e), "actions": [], "reasoning":"llm_error"}
+    data = extract_json(out.content or "{}")
+    if data is None:
+        return {"error": "respuesta no es JSON", "actions": [], "reasoning":"llm_error"}
+    return data
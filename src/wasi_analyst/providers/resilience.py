@@ -0,0 +1,166 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from wasi_analyst.util.profiling import get_profiler
+from wasi_analyst.util.settings import get_llm_settings
+
+# Capa de resiliencia para llamadas al LLM (compartida por agents/llm_mixins y
+# providers/llm.chat_json):
+#   - token bucket: limita requests/seg (con ráfaga),
+#   - reintentos acotados con backoff exponencial y jitter,
+#   - circuit breaker: tras N fallas seguidas corta por `cooldown` segundos y
+#     las llamadas salen de inmediato (el caller cae al fallback heurístico).
+
+T = TypeVar("T")
+
+
+class CircuitOpen(RuntimeError):
+    """El breaker está abierto: no se intenta la llamada."""
+
+
+class RateLimited(RuntimeError):
+    """No hubo token disponible dentro de la espera máxima."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)            # tokens/seg (<= 0 = sin límite)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = 10.0) -> bool:
+        if self.rate <= 0:
+            return True
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                wait = (1.0 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = 3, cooldown: float = 60.0):
+        self.threshold = max(1, int(failures))
+        self.cooldown = float(cooldown)
+        self.state = "closed"              # closed | open | half_open
+        self._fails = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"   # dejamos pasar una llamada de prueba
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state, self._fails = "closed", 0
+
+    def release(self) -> None:
+        """La llamada de prueba no llegó a hacerse (p.ej. sin token): half_open vuelve a open."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state, self._opened_at = "open", time.monotonic()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._fails += 1
+            if self.state == "half_open" or self._fails >= self.threshold:
+                if self.state != "open":
+                    get_profiler().count("llm_breaker_trips")
+                self.state, self._opened_at = "open", time.monotonic()
+
+
+def _retryable(exc: Exception) -> bool:
+    # errores HTTP 4xx (salvo 408/409/429) no se arreglan reintentando
+    status = getattr(exc, "status_code", None)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+
+class Resilience:
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: int = 1,
+        retries: int = 2,
+        backoff: float = 0.5,
+        backoff_max: float = 8.0,
+        breaker_failures: int = 3,
+        breaker_cooldown: float = 60.0,
+        max_wait: float = 10.0,
+        seed: Optional[int] = None,
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self.retries = max(0, int(retries))
+        self.backoff = float(backoff)
+        self.backoff_max = float(backoff_max)
+        self.max_wait = float(max_wait)
+        self._rng = random.Random(seed)    # RNG propio: no toca el `random` global de la simulación
+
+    def _sleep(self, attempt: int) -> None:
+        # "full jitter": uniforme en [0, min(max, base * 2^n)]
+        time.sleep(self._rng.uniform(0.0, min(self.backoff_max, self.backoff * (2 ** attempt))))
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Ejecuta `fn` con rate limit, reintentos y breaker. Propaga la última excepción."""
+        prof = get_profiler()
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                prof.count("llm_breaker_skips")
+                raise CircuitOpen("circuit breaker abierto")
+            if not self.bucket.acquire(self.max_wait):
+                # sin resultado que registrar: no dejar el breaker trabado en half_open
+                self.breaker.release()
+                prof.count("llm_rate_limited")
+                raise RateLimited("sin token del rate limiter")
+            try:
+                out = fn()
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.retries or not _retryable(e) or self.breaker.state == "open":
+                    raise
+                prof.count("llm_retries")
+                self._sleep(attempt)
+                continue
+            self.breaker.record_success()
+            return out
+        raise AssertionError("inalcanzable")
+
+
+_shared: Optional[Resilience] = None
+
+
+def get_resilience() -> Resilience:
+    """Instancia única por proceso (el breaker y el bucket se comparten entre agentes)."""
+    global _shared
+    if _shared is None:
+        st = get_llm_settings()
+        _shared = Resilience(
+            rate=st.rate_limit, burst=st.burst, retries=st.max_retries,
+            backoff=st.backoff, breaker_failures=st.breaker_failures, breaker_cooldown=st.breaker_cooldown,
+        )
+    return _shared
+
+
+def reset_resilience() -> None:
+    """Descarta el estado compartido (p.ej. tras cambiar variables de entorno)."""
+    global _shared
+    _shared = None
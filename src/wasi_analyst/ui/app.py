@@ -1,8 +1,10 @@
+import os
 import streamlit as st
 import pandas as pd
 from collections import Counter
 
-from wasi_analyst.app.run import run_simulation
+from wasi_analyst.app.jobs import JobClient, JobService, wait
+from wasi_analyst.ui import viz
 from wasi_analyst.util.metrics import price_metrics_table, equity_metrics
 
 from dotenv import load_dotenv
@@ -18,6 +20,28 @@ US_TECH   = ["AAPL","MSFT","NVDA","GOOGL","META","AMZN"]
 LATAM_ADR = ["MELI","PBR","VALE","ITUB","ABEV","GGAL","BMA","TEO","YPF","DESP"]
 ALL_OPTIONS = sorted({*POPULAR, *US_TECH, *LATAM_ADR})
 
+# ----------------- Servicio de jobs -----------------
+@st.cache_resource
+def _jobs():
+    """Las simulaciones corren en el servicio de jobs (no en el thread del request).
+    Con WASI_JOBS_URL se usa un servidor externo; si no, uno en este proceso."""
+    url = os.getenv("WASI_JOBS_URL")
+    if url:
+        return JobClient(url)
+    return JobService(workers=int(os.getenv("WASI_JOBS_WORKERS", "2"))).start()
+
+def _run_meta(params):
+    return {
+        "goal": params.get("user_goal") or "(sin objetivo)",
+        "symbols": params["symbols"],
+        "days": params["days"],
+        "seed": params["seed"],
+        "data_source": params.get("data_source", "Random Walk"),
+        "fundamental_mode": params.get("fundamental_mode", "rule"),
+        "macro_mode": params.get("macro_mode", "rule"),
+        "sentiment_mode": params.get("sentiment_mode", "rule"),
+    }
+
 # ----------------- Helpers “conversación de agentes” -----------------
 def _extract_day_views(transcript):
     """Agrupa el transcript por día y arma una vista tabular por símbolo."""
@@ -93,6 +117,8 @@ def _ensure_state():
     st.session_state.setdefault("goal", "")
     st.session_state.setdefault("sel_default", ["AAPL","MSFT"])
     st.session_state.setdefault("exec_logs", [])  # solo textos, no objetos de Streamlit
+    st.session_state.setdefault("job_ids", [])
+    st.session_state.setdefault("loaded_jobs", set())
 _ = _ensure_state()
 
 st.title("Wasi Analyst — Investment Analyst Lab")
@@ -129,10 +155,14 @@ with st.sidebar:
 
     data_source = st.selectbox(
         "Fuente de datos",
-        ["Random Walk (demo)", "Yahoo Finance (daily)"],
+        ["Random Walk (demo)", "Yahoo Finance (daily)", "Local OHLCV"],
         index=0
     )
-    data_source_value = "Random Walk" if data_source.startswith("Random Walk") else "Yahoo Finance (daily)"
+    data_source_value = "Random Walk" if data_source.startswith("Random Walk") else data_source
+    data_path = ""
+    if data_source == "Local OHLCV":
+        data_path = st.text_input("Dataset (directorio Parquet/Arrow o CSV)", value="",
+                                  help="Columnas: date, symbol, open, high, low, close, volume (ordenado por fecha).")
 
     st.markdown("**Presets de símbolos**")
     c1, c2, c3 = st.columns(3)
@@ -197,6 +227,14 @@ with st.sidebar:
 
     fast = st.toggle("Modo rápido (recomendado con LLM)", value=True,
                      help="Reduce días si usás LLM para que responda más rápido.")
+    use_cache = st.toggle("Usar caché de corridas", value=True,
+                          help="Si ya corriste exactamente la misma config y datos, devuelve el resultado guardado.")
+    with st.expander("📉 Gráficos", expanded=False):
+        chart_width = st.slider("Puntos por serie", 200, 4000, viz.DEFAULT_WIDTH, 100,
+                                help="Las series largas se reducen en el servidor a este ancho.")
+        chart_method = st.radio("Reducción", viz.METHODS, horizontal=True,
+                                help="lttb: forma visual; minmax: conserva picos y caídas de cada tramo.")
+        page_size = st.select_slider("Filas por página", [20, 50, 100, 200], 50)
     st.caption("Para usar LLM necesitás `.env` con `OPENAI_API_KEY` (opcional `OPENAI_MODEL`).")
 
     if st.button("Run", use_container_width=True):
@@ -218,13 +256,14 @@ with st.sidebar:
             st.session_state.exec_logs.append(msg)
 
         try:
-            status.update(label="Descargando datos / inicializando…", state="running")
-            res = run_simulation(
+            status.update(label="Encolando simulación…", state="running")
+            params = dict(
                 days=int(days),
                 symbols=symbols,
                 seed=int(seed),
                 user_goal=goal,
                 data_source=data_source_value,
+                data_path=data_path,
                 fundamental_mode=fundamental_mode,
                 macro_mode=macro_mode,
                 sentiment_mode=sentiment_mode,
@@ -238,25 +277,41 @@ with st.sidebar:
                 sentiment_break_window=int(sentiment_break_window),
                 sentiment_eps=float(sentiment_eps_bps) / 10_000.0,
                 sentiment_qty=int(sentiment_qty),
-                report=reporter,
+                use_cache=use_cache,
             )
-            st.session_state.runs.append({
-                "goal": goal or "(sin objetivo)",
-                "symbols": symbols,
-                "days": int(days),
-                "seed": int(seed),
-                "data_source": data_source_value,
-                "fundamental_mode": fundamental_mode,
-                "macro_mode": macro_mode,
-                "sentiment_mode": sentiment_mode,
-                **res
-            })
+            jobs = _jobs()
+            job_id = jobs.submit(params)
+            st.session_state.job_ids.append(job_id)
+            status.update(label=f"Job {job_id} en curso…", state="running")
+            job = wait(jobs, job_id, on_event=lambda ev: reporter(ev["message"], ev["progress"]))
+            if job.get("status") != "done":
+                raise RuntimeError(f"job {job_id}: {job.get('status')} {job.get('error') or ''}")
+            st.session_state.loaded_jobs.add(job_id)
+            st.session_state.runs.append({**_run_meta(params), "result": jobs.result(job_id)})
             status.update(label="Completado ✅", state="complete")
             st.toast("Simulación completada", icon="✅")
         except Exception as e:
             status.update(label=f"Error: {e}", state="error")
             st.exception(e)
 
+    # Jobs del servicio (sobreviven a un refresh del navegador)
+    with st.expander("🗂️ Jobs recientes", expanded=False):
+        jobs = _jobs()
+        for j in jobs.list()[:10]:
+            c1, c2 = st.columns([3, 1])
+            c1.caption(f"`{j['id']}` · {j['status']} · {(j['progress'] or 0):.0%}")
+            if j["status"] in ("queued", "running", "starting"):
+                if c2.button("Cancelar", key=f"cancel_{j['id']}"):
+                    jobs.cancel(j["id"])
+                    st.rerun()
+            elif j["status"] == "done" and j["id"] not in st.session_state.loaded_jobs:
+                if c2.button("Cargar", key=f"load_{j['id']}"):
+                    res = jobs.result(j["id"])
+                    if res is not None:
+                        st.session_state.loaded_jobs.add(j["id"])
+                        st.session_state.runs.append({**_run_meta(jobs.status(j["id"])["params"]), "result": res})
+                        st.rerun()
+
 # ========================== TABS ==========================
 tab1, tab2 = st.tabs(["📈 Resultados", "🧠 Conversación de agentes"])
 
@@ -273,24 +328,38 @@ with tab1:
                 f"| Días: {run['days']} | Seed: {run['seed']} | Datos: {run['data_source']}"
             )
 
-            hist = run["history"]; trades = run["trades"]; notes = run["notes"]
+            # run["result"]: RunResult (Arrow mmap, app/results.py) o dict si el servicio es remoto.
+            # Los gráficos usan series reducidas (ui/viz.py) y las tablas se leen por página.
+            res = run["result"]; notes = res["notes"]
+            run_no = len(st.session_state.runs) - idx + 1
+            price_cols = viz.price_columns(res)
             col1, col2 = st.columns([1,2])
             with col1:
                 st.markdown("**Equity**")
-                st.line_chart(hist.set_index("day")[["equity"]])
-                price_cols = [c for c in hist.columns if c.startswith("px_")]
+                st.line_chart(viz.reduced_series(res, ["equity"], width=chart_width, method=chart_method),
+                              x="day", y="valor", color="serie")
                 if price_cols:
                     st.markdown("**Precios**")
-                    st.line_chart(hist.set_index("day")[price_cols])
+                    st.line_chart(viz.reduced_series(res, price_cols, width=chart_width, method=chart_method),
+                                  x="day", y="valor", color="serie")
+                var_cols = viz.var_columns(res)
+                if var_cols:
+                    st.markdown("**VaR / ES 1d (fracción del equity)**")
+                    st.line_chart(viz.reduced_series(res, var_cols, width=chart_width, method=chart_method),
+                                  x="day", y="valor", color="serie")
             with col2:
-                st.markdown("**Tabla de estados (últimos 10)**")
-                st.dataframe(hist.tail(10), use_container_width=True)
+                n_pages = viz.page_count(res, "history", page_size)
+                pg = st.number_input("Página de estados", 1, n_pages, n_pages, key=f"hist_page_{run_no}")
+                st.markdown(f"**Tabla de estados** (página {pg}/{n_pages})")
+                st.dataframe(viz.read_page(res, "history", pg - 1, page_size), use_container_width=True)
 
-            st.markdown("**Trades (últimos 20)**")
-            st.dataframe(trades.tail(20), use_container_width=True)
+            n_pages = viz.page_count(res, "trades", page_size)
+            pg = st.number_input("Página de trades", 1, n_pages, n_pages, key=f"trades_page_{run_no}")
+            st.markdown(f"**Trades** (página {pg}/{n_pages})")
+            st.dataframe(viz.read_page(res, "trades", pg - 1, page_size), use_container_width=True)
 
             with st.expander("📊 Comparativa por símbolo (CAGR, Sharpe, MaxDD, Return)"):
-                mt = price_metrics_table(hist)
+                mt = price_metrics_table(viz.read_columns(res, "history", price_cols))
                 st.dataframe(mt.style.format({
                     "period_return": "{:.2%}",
                     "cagr": "{:.2%}",
@@ -299,7 +368,7 @@ with tab1:
                 }))
 
             with st.expander("🤖 Métricas del agente (Equity)"):
-                eq = hist["equity"]
+                eq = viz.read_columns(res, "history", ["equity"])["equity"]
                 em = equity_metrics(eq)
                 st.table({
                     "metric": ["period_return", "cagr", "sharpe", "max_drawdown"],
@@ -322,7 +391,7 @@ with tab2:
     else:
         run = st.session_state.runs[-1]  # muestra el último run
         st.caption("Mostrando el último run. Volvé a 'Resultados' para cambiarlo.")
-        transcript = run.get("transcript", [])
+        transcript = run["result"].get("transcript", [])
 
         views = _extract_day_views(transcript)
         if not views:
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from wasi_analyst.core.riskengine import VAR_COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Capa de datos para gráficos y tablas de la UI (sin dependencia de Streamlit).
+#
+# Los charts nunca reciben la serie completa: cada serie se reduce en el servidor a
+# ~`width` puntos (LTTB o min/max por bucket), en formato largo (x, serie, valor), y
+# lo reducido queda en un LRU por corrida. Las tablas se leen por página: con un RunResult (app/results.py) solo
+# se materializa la porción Arrow pedida. Así la latencia no crece con el largo
+# de la corrida.
+
+DEFAULT_WIDTH = 800
+METHODS = ("lttb", "minmax")
+
+
+# ---------- downsampling (índices a conservar, ordenados) ----------
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Primer y último punto + mínimo y máximo de cada bucket (conserva picos y caídas)."""
+    n = len(y)
+    if n <= 2 * n_buckets + 2:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    b = -(-n // size)
+    pad = np.full(b * size, np.nan)
+    pad[:n] = y
+    blocks = pad.reshape(b, size)
+    ok = ~np.isnan(blocks).all(axis=1)   # buckets de puro NaN no aportan puntos
+    base = np.arange(b)[ok] * size
+    lo = base + np.nanargmin(blocks[ok], axis=1)
+    hi = base + np.nanargmax(blocks[ok], axis=1)
+    return np.unique(np.concatenate(([0, n - 1], lo, hi)))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: en cada bucket elige el punto que forma el
+    triángulo de mayor área con el elegido antes y el promedio del bucket siguiente.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)   # n_out - 2 buckets interiores
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i] + 1, edges[i + 1])
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        nhi = max(nlo + 1, nhi)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return np.unique(out)
+
+
+def downsample(df: pd.DataFrame, x: str, columns: Sequence[str], width: int = DEFAULT_WIDTH,
+               method: str = "lttb") -> pd.DataFrame:
+    """
+    Reduce cada serie por separado a ~`width` puntos sobre el eje `x` y devuelve formato
+    largo (x, "serie", "valor"): el total es series x width, sin la unión de índices.
+    """
+    import pandas as pd
+    if method not in METHODS:
+        raise ValueError(f"método desconocido: {method!r} (opciones: {METHODS})")
+    xv = df[x].to_numpy()
+    xs = xv.astype(float)
+    parts: List[pd.DataFrame] = []
+    for c in columns:
+        y = df[c].to_numpy(dtype=float)
+        if len(y) <= width:
+            idx = np.arange(len(y))
+        else:
+            idx = lttb_indices(xs, y, width) if method == "lttb" else minmax_indices(y, max(1, width // 2))
+        parts.append(pd.DataFrame({x: xv[idx], "serie": c, "valor": y[idx]}))
+    if not parts:
+        return pd.DataFrame(columns=[x, "serie", "valor"])
+    return pd.concat(parts, ignore_index=True)
+
+
+# ---------- lectura por columnas / páginas ----------
+
+def _columns(result: Any, name: str) -> List[str]:
+    if hasattr(result, "columns") and callable(result.columns):
+        return result.columns(name)
+    return list(result[name].columns)
+
+
+def read_columns(result: Any, name: str, columns: Sequence[str]) -> pd.DataFrame:
+    """Solo las columnas pedidas (RunResult: lectura columnar mmap; dict: DataFrame en memoria)."""
+    if hasattr(result, "frame"):
+        return result.frame(name, list(columns))
+    return result[name][list(columns)]
+
+
+def num_rows(result: Any, name: str) -> int:
+    if hasattr(result, "table"):
+        return int(result.table(name).num_rows)
+    return len(result[name])
+
+
+def read_page(result: Any, name: str, page: int, page_size: int = 50,
+              columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Filas [page * page_size, (page + 1) * page_size) sin materializar el resto."""
+    start = max(0, int(page)) * int(page_size)
+    if hasattr(result, "table"):
+        tbl = result.table(name, columns).slice(start, page_size)
+        df = tbl.to_pandas()
+        df.index = range(start, start + len(df))
+        return df
+    df = result[name]
+    return (df[list(columns)] if columns is not None else df).iloc[start:start + page_size]
+
+
+def page_count(result: Any, name: str, page_size: int = 50) -> int:
+    return max(1, -(-num_rows(result, name) // int(page_size)))
+
+
+# ---------- caché de series reducidas por corrida ----------
+
+class ReducedCache:
+    """LRU de series ya reducidas: clave = (corrida, tabla, columnas, width, método)."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = int(max_entries)
+        self._data: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_key(df: pd.DataFrame) -> str:
+        """Digest del contenido (para resultados en memoria: los id() se reutilizan)."""
+        import hashlib
+        import pandas as pd
+        h = hashlib.sha1(repr(list(df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return h.hexdigest()
+
+    def series(self, result: Any, columns: Sequence[str], name: str = "history", x: str = "day",
+               width: int = DEFAULT_WIDTH, method: str = "lttb") -> pd.DataFrame:
+        # RunResult: su path identifica la corrida; un dict, el contenido de las columnas pedidas
+        path = getattr(result, "path", None)
+        df = None if path else read_columns(result, name, [x, *columns])
+        key = (path or self.content_key(df), name, tuple(columns), int(width), method)
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit
+        if df is None:
+            df = read_columns(result, name, [x, *columns])
+        out = downsample(df, x, columns, width, method)
+        with self._lock:
+            self.misses += 1
+            self._data[key] = out
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_CACHE = ReducedCache()
+
+
+def reduced_series(result: Any, columns: Sequence[str], name: str = "history", x: str = "day",
+                   width: int = DEFAULT_WIDTH, method: str = "lttb") -> pd.DataFrame:
+    return _CACHE.series(result, columns, name, x, width, method)
+
+
+def price_columns(result: Any) -> List[str]:
+    return [c for c in _columns(result, "history") if c.startswith("px_")]
+
+
+def var_columns(result: Any) -> List[str]:
+    """Columnas VaR/ES de la corrida (vacío si el motor de riesgo estaba apagado)."""
+    cols = set(_columns(result, "history"))
+    return [c for c in VAR_COLUMNS if c in cols]
@@ -1,7 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import List, Literal
+from typing import Dict, List, Literal, Optional
 
 AgentMode = Literal["rule", "llm"]
+FillModelName = Literal["fixed_bps", "sqrt", "linear"]
 
 class WasiConfig(BaseModel):
     # Simulación
@@ -12,15 +13,67 @@ class WasiConfig(BaseModel):
     cash0: float = 100_000.0
     max_position_per_symbol: int = 100
     max_gross_exposure: float = 1_000_000.0
+    # tope de sqrt(x' rho x) sobre los notionales (exposición ajustada por correlación); 0 = apagado
+    max_corr_exposure: float = 0.0
+    # VaR/ES a 1 día (core/riskengine.py): ventana histórica en días (0 = apagado),
+    # nivel de cola y presupuesto de VaR como fracción del equity (0 = solo se registra)
+    var_window: int = 250
+    var_alpha: float = 0.05
+    var_budget: float = 0.0
+
+    # Mercado: "lp" = LP virtual con modelo de fills (core/fills.py); "abm" = población
+    # de traders (core/population.py) y subasta diaria en el Book; el provider pasa a
+    # ser el valor fundamental y los precios salen de la subasta
+    market_mode: Literal["lp", "abm"] = "lp"
+    abm_agents: int = 1000
+    abm_mix: Dict[str, float] = Field(default_factory=lambda: {
+        "fundamental": 0.4, "macro": 0.2, "sentiment": 0.2, "noise": 0.2})
+    abm_cash: float = 10_000.0
+    abm_shares: int = 20
 
     fee_bps: float = 5.0
     slippage_bps: float = 10.0
 
+    # Ejecución contra el LP (ver core/fills.py)
+    fill_model: FillModelName = "fixed_bps"
+    adv_shares: float = 1_000_000.0          # ADV por defecto (acciones/día)
+    adv_by_symbol: Dict[str, float] = Field(default_factory=dict)
+    impact_coef: float = 0.1                 # sqrt: coef * sqrt(qty/ADV)
+    linear_temp_impact: float = 1.0          # linear: temp_coef * qty/ADV
+    linear_perm_impact: float = 0.5          # linear: perm_coef * qty/ADV
+
+    # Instrumentación (util/profiling.py): exporta artifacts/profile.*
+    profile: bool = False
+
+    # Event log estructurado del loop (util/logging.EventLog); None = apagado
+    event_log_path: Optional[str] = None
+    event_log_format: Literal["ndjson", "binary"] = "ndjson"
+    event_log_level: Literal["debug", "info", "warning", "error"] = "info"
+    event_log_sample: Dict[str, float] = Field(default_factory=dict)  # tipo -> fracción a conservar
+    event_log_rate: Dict[str, float] = Field(default_factory=dict)    # tipo -> máx eventos/seg
+
+    # Journal binario de órdenes, ajustes de riesgo y fills (core/journal.py); None = apagado
+    journal_path: Optional[str] = None
+
+    # Features desde el cubo precalculado (data/features.py) si el provider es un replay fijo
+    feature_cube: bool = True
+
+    # Features cross-section (core/crosssection.py): covarianza EWMA, ranks y z-scores
+    cs_halflife: float = 20.0   # vida media en días de la covarianza; 0 = apagado
+
     # Modos por agente
     fundamental_mode: AgentMode = "rule"
     macro_mode: AgentMode = "rule"
     sentiment_mode: AgentMode = "rule"
 
+    # Prompts LLM (agents/prompting.py)
+    llm_prompt_budget_tokens: int = 2000   # tope aprox. de tokens del prompt
+    llm_prompt_top_k: int = 0              # 0 = sin tope de símbolos
+    llm_prompt_min_change: float = 0.001   # cambio mínimo (fracción) para reenviar un símbolo
+    # Gating (agents/gating.py): se llama al LLM solo si hubo drift o la decisión está vieja
+    llm_gate_drift: float = 0.005          # 0 = llamar siempre
+    llm_gate_max_staleness: int = 5        # días máx. reutilizando la misma decisión (0 = sin tope)
+
     # ---- Tuning de reglas (fallbacks) ----
     # Fundamental (mean-reversion)
     fundamental_sma_window: int = 5
@@ -1,6 +1,29 @@
-import structlog
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
 
-def get_logger(name="wasi"):
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+_configured = False
+
+
+def _configure() -> None:
+    """Configura structlog (si está instalado) una sola vez por proceso."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    try:
+        import structlog
+    except ImportError:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        return
     structlog.configure(
         processors=[
             structlog.processors.add_log_level,
@@ -10,4 +33,192 @@ def get_logger(name="wasi"):
         wrapper_class=structlog.make_filtering_bound_logger(20),
         cache_logger_on_first_use=True
     )
+
+
+class _KVLogger:
+    """Adaptador para logging estándar con la API key=value de structlog."""
+
+    def __init__(self, name: str):
+        self._log = logging.getLogger(name)
+
+    def _fmt(self, event: str, kw: Dict[str, Any]) -> str:
+        return event + "".join(f" {k}={v!r}" for k, v in kw.items())
+
+    def debug(self, event: str, **kw: Any) -> None:
+        if self._log.isEnabledFor(logging.DEBUG):
+            self._log.debug(self._fmt(event, kw))
+
+    def info(self, event: str, **kw: Any) -> None:
+        if self._log.isEnabledFor(logging.INFO):
+            self._log.info(self._fmt(event, kw))
+
+    def warning(self, event: str, **kw: Any) -> None:
+        self._log.warning(self._fmt(event, kw))
+
+    def error(self, event: str, **kw: Any) -> None:
+        self._log.error(self._fmt(event, kw))
+
+
+def get_logger(name="wasi"):
+    _configure()
+    try:
+        import structlog
+    except ImportError:
+        return _KVLogger(name)
     return structlog.get_logger(name)
+
+
+# ---------- event log del hot path ----------
+#
+# Uso en el loop (sin allocations si el evento está apagado/muestreado):
+#     if ev.enabled("decision"):
+#         ev.emit("decision", day=d, symbol=s, action=a)
+#
+# Los registros van a una cola acotada y un thread de fondo los escribe en
+# NDJSON o en binario (cabecera MAGIC y registros u32 little-endian de largo +
+# JSON compacto [ts, evento, campos]; sin pickle: leer un log nunca ejecuta
+# código). Si la cola se llena, el evento se descarta y se cuenta en `dropped`:
+# nunca bloquea el loop.
+
+_LEN = struct.Struct("<I")
+MAGIC = b"WASIEVT2"
+_OLD_MAGIC = b"WASIEVT1"   # registros pickle: ya no se leen
+_STOP = object()
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: str,
+        fmt: str = "ndjson",
+        level: str = "info",
+        sample: Optional[Dict[str, float]] = None,
+        rate: Optional[Dict[str, float]] = None,
+        queue_size: int = 65_536,
+    ):
+        if fmt not in ("ndjson", "binary"):
+            raise ValueError(f"formato de event log desconocido: {fmt!r}")
+        self.path = path
+        self.fmt = fmt
+        self.level = LEVELS[level]
+        # muestreo: se conserva 1 de cada N eventos del tipo (N = round(1/tasa))
+        self._every = {k: max(1, round(1.0 / v)) for k, v in (sample or {}).items() if v > 0}
+        self._muted = {k for k, v in (sample or {}).items() if v <= 0}
+        self._seen: Dict[str, int] = {}
+        # rate limit: token bucket por tipo (eventos/seg)
+        self._rate = dict(rate or {})
+        self._tokens = {k: float(v) for k, v in self._rate.items()}
+        self._last = {k: time.monotonic() for k in self._rate}
+        self.dropped = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._fh = open(path, "ab" if fmt == "binary" else "a", encoding=None if fmt == "binary" else "utf-8")
+        if fmt == "binary":
+            if self._fh.tell() == 0:
+                self._fh.write(MAGIC)
+            else:
+                with open(path, "rb") as fh:
+                    if fh.read(len(MAGIC)) != MAGIC:
+                        self._fh.close()
+                        raise ValueError(f"{path} no es un event log binario de esta versión")
+        self._thread = threading.Thread(target=self._drain, name="wasi-eventlog", daemon=True)
+        self._thread.start()
+
+    # ---------- filtro (barato, sin allocations) ----------
+
+    def enabled(self, event: str, level: int = 20) -> bool:
+        if level < self.level or event in self._muted:
+            return False
+        every = self._every.get(event)
+        if every is not None:
+            n = self._seen.get(event, 0)
+            self._seen[event] = n + 1
+            if n % every:
+                return False
+        if event in self._rate:
+            now = time.monotonic()
+            r = self._rate[event]
+            tok = min(r, self._tokens[event] + (now - self._last[event]) * r)
+            self._last[event] = now
+            if tok < 1.0:
+                self._tokens[event] = tok
+                return False
+            self._tokens[event] = tok - 1.0
+        return True
+
+    def emit(self, event: str, **fields: Any) -> None:
+        try:
+            self._q.put_nowait((time.time(), event, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    # ---------- writer ----------
+
+    def _drain(self) -> None:
+        fh, binary = self._fh, self.fmt == "binary"
+        while True:
+            item = self._q.get()
+            batch = [item]
+            while True:  # vaciamos lo acumulado y escribimos de una
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for rec in batch:
+                if rec is _STOP:
+                    stop = True
+                    continue
+                ts, event, fields = rec
+                if binary:
+                    blob = json.dumps([ts, event, fields], separators=(",", ":"), default=str).encode("utf-8")
+                    fh.write(_LEN.pack(len(blob)) + blob)
+                else:
+                    fh.write(json.dumps({"ts": ts, "event": event, **fields}, default=str) + "\n")
+            fh.flush()
+            if stop:
+                return
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._q.put(_STOP)
+            self._thread.join()
+        self._fh.close()
+
+
+class NullEventLog:
+    """Event log apagado: enabled() siempre False."""
+    dropped = 0
+
+    def enabled(self, event: str, level: int = 20) -> bool:
+        return False
+
+    def emit(self, event: str, **fields: Any) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+NULL_EVENTS = NullEventLog()
+
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    """Lee un event log (NDJSON o binario; se detecta por la cabecera)."""
+    with open(path, "rb") as fh:
+        head = fh.read(len(MAGIC))
+        if head == _OLD_MAGIC:
+            raise ValueError(f"{path}: event log binario v1 (pickle), no soportado")
+        if head != MAGIC:
+            fh.seek(0)
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        while True:
+            hdr = fh.read(_LEN.size)
+            if len(hdr) < _LEN.size:
+                return
+            ts, event, fields = json.loads(fh.read(_LEN.unpack(hdr)[0]))
+            yield {"ts": ts, "event": event, **fields}
@@ -1,7 +1,10 @@
 from __future__ import annotations
 import math
+from typing import TYPE_CHECKING
 import numpy as np
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 ANNUALIZATION = 252  # días bursátiles aprox.
 
@@ -50,6 +53,7 @@ def equity_metrics(equity: pd.Series) -> dict:
     }
 
 def price_metrics_table(hist: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
     cols = [c for c in hist.columns if c.startswith("px_")]
     rows = []
     for c in cols:
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Instrumentación del hot path: timers por fase/agente con reloj monotónico,
+# contadores y high-water de memoria. Exporta resumen JSON, trace-events de
+# Chrome (chrome://tracing / Perfetto) y texto Prometheus.
+#
+# Desactivado se usa NULL_PROFILER: todos sus métodos son no-ops, así el costo
+# en la simulación es una llamada vacía por fase.
+
+_now = time.perf_counter_ns
+
+
+def _rss_peak_bytes() -> Optional[int]:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return None
+    # Linux reporta KB; macOS, bytes
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+class _Span:
+    __slots__ = ("_p", "_name", "_t0")
+
+    def __init__(self, prof: "Profiler", name: str):
+        self._p = prof
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = _now()
+        return self
+
+    def __exit__(self, *exc):
+        self._p._record(self._name, self._t0, _now())
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, max_events: int = 200_000):
+        self.max_events = max_events
+        self.timers: Dict[str, List[int]] = {}          # name -> [calls, total_ns, max_ns]
+        self.counters: Dict[str, int] = {}
+        self.events: List[Tuple[str, int, int, int]] = []  # (name, start_ns, dur_ns, tid)
+        self.rss_peak: Optional[int] = None
+        self._t_start = _now()
+        self._lap: Optional[str] = None
+        self._lap_t0 = 0
+
+    # ---------- medición ----------
+
+    def _record(self, name: str, t0: int, t1: int) -> None:
+        dur = t1 - t0
+        t = self.timers.get(name)
+        if t is None:
+            self.timers[name] = [1, dur, dur]
+        else:
+            t[0] += 1
+            t[1] += dur
+            if dur > t[2]:
+                t[2] = dur
+        if len(self.events) < self.max_events:
+            self.events.append((name, t0, dur, threading.get_ident()))
+
+    def span(self, name: str) -> _Span:
+        """Context manager: `with prof.span("agent:macro"): ...`"""
+        return _Span(self, name)
+
+    def lap(self, name: Optional[str]) -> None:
+        """Cierra la fase en curso y abre `name` (None solo cierra)."""
+        now = _now()
+        if self._lap is not None:
+            self._record(self._lap, self._lap_t0, now)
+        self._lap, self._lap_t0 = name, now
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample_memory(self) -> None:
+        rss = _rss_peak_bytes()
+        if rss is not None and (self.rss_peak is None or rss > self.rss_peak):
+            self.rss_peak = rss
+
+    # ---------- exportación ----------
+
+    def summary(self) -> Dict:
+        phases = {
+            name: {
+                "calls": c,
+                "total_ms": tot / 1e6,
+                "mean_ms": tot / c / 1e6,
+                "max_ms": mx / 1e6,
+            }
+            for name, (c, tot, mx) in sorted(self.timers.items(), key=lambda kv: -kv[1][1])
+        }
+        return {
+            "wall_ms": (_now() - self._t_start) / 1e6,
+            "phases": phases,
+            "counters": dict(self.counters),
+            "memory": {"rss_peak_bytes": self.rss_peak},
+        }
+
+    def chrome_trace(self) -> Dict:
+        pid = os.getpid()
+        ev = [
+            {"name": name, "cat": name.split(":")[0], "ph": "X",
+             "ts": (t0 - self._t_start) / 1e3, "dur": dur / 1e3, "pid": pid, "tid": tid}
+            for name, t0, dur, tid in self.events
+        ]
+        return {"traceEvents": ev, "displayTimeUnit": "ms", "otherData": {"counters": dict(self.counters)}}
+
+    def prometheus(self, prefix: str = "wasi") -> str:
+        lines = [
+            f"# TYPE {prefix}_phase_seconds_total counter",
+            *(f'{prefix}_phase_seconds_total{{phase="{n}"}} {t[1] / 1e9:.9f}' for n, t in self.timers.items()),
+            f"# TYPE {prefix}_phase_calls_total counter",
+            *(f'{prefix}_phase_calls_total{{phase="{n}"}} {t[0]}' for n, t in self.timers.items()),
+            f"# TYPE {prefix}_phase_max_seconds gauge",
+            *(f'{prefix}_phase_max_seconds{{phase="{n}"}} {t[2] / 1e9:.9f}' for n, t in self.timers.items()),
+            f"# TYPE {prefix}_events_total counter",
+            *(f'{prefix}_events_total{{name="{n}"}} {v}' for n, v in self.counters.items()),
+        ]
+        if self.rss_peak is not None:
+            lines += [f"# TYPE {prefix}_rss_peak_bytes gauge", f"{prefix}_rss_peak_bytes {self.rss_peak}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str, stem: str = "profile") -> Dict[str, str]:
+        """Escribe <stem>.json, <stem>.trace.json y <stem>.prom en `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            "json": os.path.join(directory, f"{stem}.json"),
+            "trace": os.path.join(directory, f"{stem}.trace.json"),
+            "prometheus": os.path.join(directory, f"{stem}.prom"),
+        }
+        with open(paths["json"], "w") as fh:
+            json.dump(self.summary(), fh, indent=2)
+        with open(paths["trace"], "w") as fh:
+            json.dump(self.chrome_trace(), fh)
+        with open(paths["prometheus"], "w") as fh:
+            fh.write(self.prometheus())
+        return paths
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullProfiler:
+    enabled = False
+
+    def span(self, name: str) -> _NullSpan:
+        return _NULL_SPAN
+
+    def lap(self, name: Optional[str]) -> None:
+        pass
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def sample_memory(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+_active = NULL_PROFILER
+
+
+def get_profiler():
+    """Profiler activo (el de la corrida en curso, o NULL_PROFILER)."""
+    return _active
+
+
+def activate(prof) -> object:
+    """Activa `prof` globalmente y devuelve el anterior (para restaurarlo)."""
+    global _active
+    prev, _active = _active, prof
+    return prev
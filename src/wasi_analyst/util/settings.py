@@ -1,9 +1,20 @@
 from __future__ import annotations
 import os
 from dataclasses import dataclass
-from dotenv import load_dotenv
 
-load_dotenv()
+_env_loaded = False
+
+def load_env() -> None:
+    """Carga `.env` una sola vez (y recién cuando se necesita, no al importar)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
 
 @dataclass
 class LLMSettings:
@@ -11,9 +22,36 @@ class LLMSettings:
     api_key: str | None
     model: str = "gpt-4o-mini"
     temperature: float = 0.2
+    base_url: str | None = None      # endpoint compatible con OpenAI (proxy, stub local, etc.)
+    timeout: float = 10.0            # segundos por request
+    # resiliencia (providers/resilience.py)
+    max_retries: int = 2
+    backoff: float = 0.5
+    rate_limit: float = 0.0          # requests/seg; 0 = sin límite
+    burst: int = 5
+    breaker_failures: int = 3
+    breaker_cooldown: float = 60.0
+    # backend (providers/backends.py): openai | mock | record | replay
+    backend: str = "openai"
+    record_path: str = "artifacts/llm_recordings.jsonl"
+    mock_latency_ms: float = 0.0
 
 def get_llm_settings() -> LLMSettings:
+    load_env()
     key = os.getenv("OPENAI_API_KEY")
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     temp = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
-    return LLMSettings(enabled=bool(key), api_key=key, model=model, temperature=temp)
+    return LLMSettings(
+        enabled=bool(key), api_key=key, model=model, temperature=temp,
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        timeout=float(os.getenv("OPENAI_TIMEOUT", "10")),
+        max_retries=int(os.getenv("WASI_LLM_RETRIES", "2")),
+        backoff=float(os.getenv("WASI_LLM_BACKOFF", "0.5")),
+        rate_limit=float(os.getenv("WASI_LLM_RPS", "0")),
+        burst=int(os.getenv("WASI_LLM_BURST", "5")),
+        breaker_failures=int(os.getenv("WASI_LLM_BREAKER_FAILURES", "3")),
+        breaker_cooldown=float(os.getenv("WASI_LLM_BREAKER_COOLDOWN", "60")),
+        backend=os.getenv("WASI_LLM_BACKEND", "openai").lower(),
+        record_path=os.getenv("WASI_LLM_RECORD_PATH", "artifacts/llm_recordings.jsonl"),
+        mock_latency_ms=float(os.getenv("WASI_LLM_MOCK_LATENCY_MS", "0")),
+    )
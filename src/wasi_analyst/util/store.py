@@ -1,6 +1,9 @@
 # Persistencia tolerante: si DuckDB no está instalado, no rompe el flujo.
-from typing import Optional
-import pandas as pd
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 class DuckDBStore:
     def __init__(self, path: str = "wasi.duckdb"):
@@ -19,6 +22,32 @@ class DuckDBStore:
         )
         self._db.execute(f"INSERT INTO {table} SELECT * FROM df")
 
+    def upsert(self, table: str, df: pd.DataFrame, keys: Sequence[str]):
+        """Reemplaza las filas con las mismas claves (idempotente ante reenvíos)."""
+        if self._db is None:
+            return  # no-op
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM df LIMIT 0"
+        )
+        on = " AND ".join(f't."{k}" = d."{k}"' for k in keys)
+        self._db.execute("BEGIN TRANSACTION")
+        try:
+            self._db.execute(f"DELETE FROM {table} t WHERE EXISTS (SELECT 1 FROM df d WHERE {on})")
+            self._db.execute(f"INSERT INTO {table} BY NAME SELECT * FROM df")
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def read(self, table: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        if self._db is None:
+            return None  # no-op
+        cols = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        try:
+            return self._db.execute(f"SELECT {cols} FROM {table}").df()
+        except Exception:
+            return None
+
     def close(self):
         if self._db is not None:
             self._db.close()
@@ -0,0 +1,55 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+ds = pytest.importorskip("pyarrow.dataset")
+
+from wasi_analyst.data.columnar import ColumnarReplay  # noqa: E402
+
+SYMBOLS = ["AAA", "BBB"]
+DATES = [dt.date(2024, 1, d) for d in range(1, 6)]
+
+
+def _write_by_symbol(path):
+    """Dataset hive particionado por símbolo: cada partición cubre todas las fechas."""
+    n = len(DATES)
+    t = pa.table({
+        "date": DATES * 2,
+        "symbol": ["AAA"] * n + ["BBB"] * n,
+        "open": [1.0] * 2 * n, "high": [1.0] * 2 * n, "low": [1.0] * 2 * n,
+        "close": [float(i) for i in range(2 * n)],
+        "volume": [1.0] * 2 * n,
+    })
+    ds.write_dataset(t, str(path), format="parquet", partitioning=["symbol"], partitioning_flavor="hive")
+
+
+def _closes(replay):
+    return [replay.next_prices(SYMBOLS, np.array([-1.0, -1.0]), d).tolist() for d in range(len(DATES))]
+
+
+@pytest.mark.parametrize("batch_rows", [65_536, 2])
+def test_symbol_partitions_are_merged_by_date(tmp_path, batch_rows):
+    _write_by_symbol(tmp_path / "hv")
+    replay = ColumnarReplay(str(tmp_path / "hv"), SYMBOLS, batch_rows=batch_rows)
+    assert _closes(replay) == [[float(i), float(i + 5)] for i in range(5)]
+
+
+def test_engines_agree_on_partitioned_dataset(tmp_path):
+    pytest.importorskip("duckdb")
+    _write_by_symbol(tmp_path / "hv")
+    a = _closes(ColumnarReplay(str(tmp_path / "hv"), SYMBOLS, engine="pyarrow"))
+    b = _closes(ColumnarReplay(str(tmp_path / "hv"), SYMBOLS, engine="duckdb"))
+    assert a == b
+
+
+def test_unsorted_file_is_rejected(tmp_path):
+    t = pa.table({
+        "date": [DATES[1], DATES[0]], "symbol": ["AAA", "AAA"],
+        "open": [1.0, 1.0], "high": [1.0, 1.0], "low": [1.0, 1.0], "close": [1.0, 2.0], "volume": [1.0, 1.0],
+    })
+    ds.write_dataset(t, str(tmp_path / "bad"), format="parquet")
+    replay = ColumnarReplay(str(tmp_path / "bad"), ["AAA"])
+    with pytest.raises(ValueError):
+        replay.next_prices(["AAA"], np.array([1.0]), 0)